@@ -1,20 +1,53 @@
+import os
+
 from flask import Flask
 from flask_restful import Api
 from flask_cors import CORS
 from app.routes import app_routes  
-from app.extensions import mysql  
+from app.extensions import (auth, cache, code_renderer, counters, events, leaderboards, metrics, mysql, passwords,
+                            profiler, revisions, search_index, similarity_index, tag_index)
+from app import explain, migrations, question_stats
+from app.rows import FastJSONProvider
 
 app = Flask(__name__)
+app.json = FastJSONProvider(app)
+if __name__ == "__main__":
+    # `python app.py` starts the debug server below; Flask only picks up FLASK_DEBUG by itself,
+    # so turn debug on before the settings and extensions that depend on it are read.
+    app.debug = True
 
 app.config['MYSQL_HOST'] = 'localhost'
 app.config['MYSQL_USER'] = 'root'
+app.config['MYSQL_DB'] = 'questionanswerplatform'
+app.config['MYSQL_POOL_SIZE'] = 10
+app.config['CORS_ORIGINS'] = ['http://localhost:3000']
+app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY')
+if not app.config['SECRET_KEY'] and app.debug:
+    # Local development only (FLASK_DEBUG=1 or `python app.py`); Auth.init_app refuses to start without a key otherwise.
+    app.config['SECRET_KEY'] = 'dev-secret-key'
 
 
 mysql.init_app(app)
+metrics.init_app(app, mysql, cache, auth)
+profiler.init_app(app, mysql)
+auth.init_app(app)
+passwords.init_app(app)
+search_index.init_app(app)
+cache.init_app(app)
+counters.init_app(app, mysql)
+leaderboards.init_app(app, mysql, counters)
+events.init_app(app)
+tag_index.init_app(app, mysql)
+code_renderer.init_app(app, mysql)
+revisions.init_app(app, cache)
+similarity_index.init_app(app, mysql)
+migrations.init_app(app, mysql)
+explain.init_app(app, mysql)
+question_stats.init_app(app, mysql)
 
 api = Api(app)
 
-CORS(app, resources={r"/api/*": {"origins": "http://localhost:3000"}})
+CORS(app, resources={r"/api/*": {"origins": app.config['CORS_ORIGINS']}})
 
 app.register_blueprint(app_routes)
 
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from app.db import PoolExhausted, PoolStats
+
+
+class AsyncMySQLPool:
+    """aiomysql connection pool for the ASGI entry point.
+
+    Reads the same ``MYSQL_*`` settings as MySQLPool, with its own
+    ``ASYNC_MYSQL_POOL_SIZE``. Connections run in autocommit mode because the
+    async routes only read; a waiting coroutine costs no thread, so the pool
+    size bounds concurrent queries rather than concurrent clients.
+    """
+
+    def __init__(self):
+        self.config = None
+        self.pool = None
+        self.timeout = 5.0
+        self.stats = PoolStats()
+
+    def init_app(self, app):
+        app.config.setdefault('ASYNC_MYSQL_POOL_SIZE', 50)
+        self.config = app.config
+        self.timeout = app.config.get('MYSQL_POOL_TIMEOUT', 5.0)
+
+    async def start(self):
+        import aiomysql
+
+        config = self.config
+        self.pool = await aiomysql.create_pool(
+            host=config['MYSQL_HOST'],
+            port=config['MYSQL_PORT'],
+            user=config['MYSQL_USER'],
+            password=config['MYSQL_PASSWORD'],
+            db=config['MYSQL_DB'],
+            charset=config['MYSQL_CHARSET'],
+            autocommit=True,
+            minsize=1,
+            maxsize=config['ASYNC_MYSQL_POOL_SIZE'],
+            pool_recycle=int(config['MYSQL_POOL_RECYCLE']),
+        )
+
+    async def close(self):
+        if self.pool is not None:
+            self.pool.close()
+            await self.pool.wait_closed()
+            self.pool = None
+
+    @asynccontextmanager
+    async def cursor(self):
+        started = time.monotonic()
+        try:
+            conn = await asyncio.wait_for(self.pool.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self.stats.incr("exhausted")
+            raise PoolExhausted("No database connection available within %.1fs" % self.timeout)
+        self.stats.record_checkout(time.monotonic() - started)
+        try:
+            async with conn.cursor() as cursor:
+                yield cursor
+        finally:
+            self.pool.release(conn)
+
+    async def fetchone(self, query, params=()):
+        async with self.cursor() as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchone()
+
+    async def fetchall(self, query, params=()):
+        async with self.cursor() as cursor:
+            await cursor.execute(query, params)
+            return await cursor.fetchall()
+
+    def status(self):
+        status = {"size": self.config['ASYNC_MYSQL_POOL_SIZE'] if self.config else 0}
+        if self.pool is not None:
+            status.update(open=self.pool.size, idle=self.pool.freesize, in_use=self.pool.size - self.pool.freesize)
+        status.update(self.stats.snapshot())
+        return status
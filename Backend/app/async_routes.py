@@ -0,0 +1,333 @@
+"""ASGI serving mode: hot read routes on an async MySQL pool, the rest via WSGI.
+
+The question listing, question details, comments and tags are served by
+coroutines on aiomysql, so a slow client or a long-poll holds no thread.
+Every other route, including all writes, is the unchanged Flask blueprint
+mounted behind an ASGI-to-WSGI adapter in a thread pool. Streamed listings
+(``?stream=`` or ``Accept: application/x-ndjson``) are handed to it too.
+
+``GET /api/questions/<id>?wait=<seconds>`` with ``If-None-Match`` is a long
+poll: if the client's copy is current, the request parks until a write
+invalidates the question (or the wait runs out, answering 304).
+
+``GET /api/questions/<id>/events`` is the Server-Sent Events stream of the
+question; each subscriber is one parked coroutine rather than a thread.
+"""
+import asyncio
+import time
+from contextlib import asynccontextmanager
+
+from asgiref.wsgi import WsgiToAsgi
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.cors import CORSMiddleware
+from starlette.responses import Response, StreamingResponse
+from starlette.routing import Mount, Route
+from werkzeug.http import http_date, parse_date, parse_etags
+
+from app.cache import ALL_TAGS_KEY, question_comments_key, question_key
+from app.conditional import as_utc, make_etag
+from app.events import SSE_HEADERS, SSE_MIMETYPE, parse_last_event_id
+from app.extensions import aio_mysql, cache, code_renderer, counters, events, leaderboards, mysql, tag_index
+from app.highlight import RENDER_MODES, renderings_query
+from app.models import (QUESTION_ANSWERS_QUERY, QUESTION_COMMENTS_QUERY, QUESTION_QUERY, QUESTION_VERSION_QUERY,
+                        QUESTIONS_VERSION_QUERY, TAGS_QUERY, build_question_tree, question_comments_from_rows,
+                        question_tree_comments_query, question_version_from_row, questions_version_from_row,
+                        tags_from_rows)
+from app.pagination import PaginationError
+from app.routes import QUESTIONS_FROM, TAGGED_QUESTIONS_FROM, question_paginator
+from app.streaming import NDJSON_MIMETYPE
+from app.tags import TagQueryError, parse_tag_query
+
+MAX_LONG_POLL_SECONDS = 60
+
+
+class ChangeWaiters:
+    """Lets coroutines wait for cache keys to be invalidated from any thread."""
+
+    def __init__(self):
+        self.loop = None
+        self._waiters = {}
+
+    def notify(self, keys):
+        if self.loop is not None:
+            self.loop.call_soon_threadsafe(self._wake, keys)
+
+    def _wake(self, keys):
+        for key in keys:
+            for future in self._waiters.pop(key, ()):
+                if not future.done():
+                    future.set_result(None)
+
+    def register(self, key):
+        future = self.loop.create_future()
+        self._waiters.setdefault(key, set()).add(future)
+        return future
+
+    def discard(self, key, future):
+        waiters = self._waiters.get(key)
+        if waiters is not None:
+            waiters.discard(future)
+            if not waiters:
+                del self._waiters[key]
+
+    def __len__(self):
+        return sum(len(waiters) for waiters in self._waiters.values())
+
+
+waiters = ChangeWaiters()
+
+
+class AsyncRoutes:
+    """Coroutine versions of the hot read routes, rendering JSON like the Flask app."""
+
+    def __init__(self, flask_app):
+        self.json = flask_app.json
+        self.wsgi = WsgiToAsgi(flask_app)
+
+    def delegate(self):
+        """A response that lets the Flask app answer the request instead."""
+        async def respond(scope, receive, send):
+            await self.wsgi(scope, receive, send)
+        return respond
+
+    def respond(self, data, status=200, headers=None):
+        return Response(self.json.dumps(data), status, headers, media_type="application/json")
+
+    def error(self, message, status):
+        return self.respond({"error": message}, status)
+
+    @staticmethod
+    def _validators(request, parts, last_modified):
+        """Returns ``(headers, fresh)`` as the conditional decorator computes them."""
+        full_path = "%s?%s" % (request.url.path, request.url.query)
+        etag = make_etag(full_path, *parts)
+        last_modified = as_utc(last_modified)
+
+        if_none_match = request.headers.get("if-none-match")
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_none_match:
+            fresh = parse_etags(if_none_match).contains_weak(etag)
+        elif if_modified_since and last_modified is not None:
+            since = parse_date(if_modified_since)
+            fresh = since is not None and last_modified <= since
+        else:
+            fresh = False
+
+        headers = {"ETag": 'W/"%s"' % etag, "Cache-Control": "no-cache"}
+        if last_modified is not None:
+            headers["Last-Modified"] = http_date(last_modified)
+        return headers, fresh
+
+    async def list_questions(self, request):
+        if request.query_params.get("tags"):
+            return await self.list_questions_by_tags(request)
+        if "stream" in request.query_params or NDJSON_MIMETYPE in request.headers.get("accept", ""):
+            # The Flask route streams from an unbuffered cursor in the thread pool.
+            return self.delegate()
+        tag_name = request.query_params.get("tag")
+        try:
+            page = question_paginator.parse(request.query_params)
+            headers = {}
+            if not tag_name:
+                row = await aio_mysql.fetchone(QUESTIONS_VERSION_QUERY)
+                headers, fresh = self._validators(request, *questions_version_from_row(row))
+                if fresh:
+                    return Response(status_code=304, headers=headers)
+                query, params = question_paginator.build(QUESTIONS_FROM, page)
+            else:
+                query, params = question_paginator.build(
+                    TAGGED_QUESTIONS_FROM, page, where="t.tag_name = %s", params=(tag_name,))
+
+            questions, next_cursor = question_paginator.paginate(page, await aio_mysql.fetchall(query, params))
+            if tag_name and not questions and page.after is None:
+                return self.respond({"message": "No questions found for this tag"}, 404)
+            return self.respond({"questions": questions, "next_cursor": next_cursor}, 200, headers)
+
+        except PaginationError as e:
+            return self.error(str(e), 400)
+        except Exception as e:
+            return self.error(str(e), 500)
+
+    async def list_questions_by_tags(self, request):
+        try:
+            if request.query_params.get("stream"):
+                return self.error("stream is not supported with tags", 400)
+            names, mode = parse_tag_query(request.query_params)
+            page = question_paginator.parse(request.query_params)
+
+            if tag_index.reloader.due():
+                await asyncio.to_thread(tag_index.ensure_built, mysql)
+            matches = tag_index.match(names, mode)
+            where = matches.where("q.question_id")
+            if where is not None:
+                query, params = question_paginator.build(QUESTIONS_FROM, page, *where)
+                rows = await aio_mysql.fetchall(query, params)
+            else:
+                scan = question_paginator.scan(QUESTIONS_FROM, page, lambda row: row[-1] in matches)
+                try:
+                    query = next(scan)
+                    while True:
+                        query = scan.send(await aio_mysql.fetchall(*query))
+                except StopIteration as done:
+                    rows = done.value
+
+            questions, next_cursor = question_paginator.paginate(page, rows)
+            if not questions and page.after is None:
+                return self.respond({"message": "No questions found for these tags"}, 404)
+            return self.respond({"questions": questions, "next_cursor": next_cursor, "total": len(matches)})
+
+        except (PaginationError, TagQueryError) as e:
+            return self.error(str(e), 400)
+        except Exception as e:
+            return self.error(str(e), 500)
+
+    async def _load_question_tree(self, question_id):
+        async with aio_mysql.cursor() as cursor:
+            await cursor.execute(QUESTION_QUERY, (question_id,))
+            row = await cursor.fetchone()
+            if not row:
+                return None
+            await cursor.execute(QUESTION_ANSWERS_QUERY, (question_id,))
+            answer_rows = await cursor.fetchall()
+            await cursor.execute(question_tree_comments_query(len(answer_rows)),
+                                 [question_id, *[a[0] for a in answer_rows]])
+            comment_rows = await cursor.fetchall()
+        return build_question_tree(row, answer_rows, comment_rows)
+
+    async def _question_version(self, question_id):
+        return question_version_from_row(await aio_mysql.fetchone(QUESTION_VERSION_QUERY, (question_id,) * 4))
+
+    async def question_details(self, request):
+        question_id = request.path_params["question_id"]
+        try:
+            wait = min(float(request.query_params.get("wait", 0)), MAX_LONG_POLL_SECONDS)
+        except ValueError:
+            return self.error("wait must be a number of seconds", 400)
+        render = request.query_params.get("render")
+        if render is not None and render not in RENDER_MODES:
+            return self.error("render must be one of: %s" % ", ".join(RENDER_MODES), 400)
+
+        try:
+            key = question_key(question_id)
+            headers = {}
+            deadline = time.monotonic() + wait
+            while True:
+                # Register before reading the version so a write in between still wakes us.
+                changed = waiters.register(key)
+                try:
+                    version = await self._question_version(question_id)
+                    if version is None:
+                        break
+                    headers, fresh = self._validators(request, *version)
+                    remaining = deadline - time.monotonic()
+                    if not fresh:
+                        break
+                    if remaining <= 0:
+                        # A plain revalidation is a page view; a long poll that times out is not.
+                        if not wait:
+                            counters.record_view(question_id)
+                            leaderboards.record(question_id, views=1)
+                        return Response(status_code=304, headers=headers)
+                    try:
+                        await asyncio.wait_for(changed, remaining)
+                    except asyncio.TimeoutError:
+                        return Response(status_code=304, headers=headers)
+                finally:
+                    waiters.discard(key, changed)
+
+            tree = await cache.get_or_set_async(key, lambda: self._load_question_tree(question_id))
+            if tree is None:
+                return self.error("Question not found", 404)
+
+            counters.record_view(question_id)
+            leaderboards.record(question_id, views=1)
+            tree = counters.apply_to_tree(tree)
+            if render:
+                renderings, missing = code_renderer.cached(code_renderer.tree_digests(tree))
+                if missing:
+                    renderings.update(code_renderer.load_rows(await aio_mysql.fetchall(*renderings_query(missing))))
+                tree = code_renderer.with_renderings(tree, renderings, render)
+            return self.respond(tree, 200, headers)
+
+        except Exception as e:
+            return self.error(str(e), 500)
+
+    async def question_events(self, request):
+        question_id = request.path_params["question_id"]
+        try:
+            if await aio_mysql.fetchone("SELECT 1 FROM questions WHERE question_id = %s", (question_id,)) is None:
+                return self.error("Question not found", 404)
+        except Exception as e:
+            return self.error(str(e), 500)
+
+        after = parse_last_event_id(request.headers, request.query_params)
+        return StreamingResponse(events.stream_async(question_id, after), media_type=SSE_MIMETYPE,
+                                 headers=SSE_HEADERS)
+
+    async def question_comments(self, request):
+        question_id = request.path_params["question_id"]
+        try:
+            async def load():
+                return question_comments_from_rows(await aio_mysql.fetchall(QUESTION_COMMENTS_QUERY, (question_id,)))
+
+            comments = await cache.get_or_set_async(question_comments_key(question_id), load)
+            if not comments:
+                return self.respond({"message": "No comments found for this question"}, 404)
+            return self.respond({"comments": comments})
+
+        except Exception as e:
+            return self.error(str(e), 500)
+
+    async def tags(self, request):
+        try:
+            async def load():
+                return tags_from_rows(await aio_mysql.fetchall(TAGS_QUERY))
+
+            tags = await cache.get_or_set_async(ALL_TAGS_KEY, load)
+            if not tags:
+                return self.respond({"message": "No tags found"}, 404)
+            return self.respond({"tags": tags})
+
+        except Exception as e:
+            return self.error(str(e), 500)
+
+    async def pool_status(self, request):
+        status = aio_mysql.status()
+        status["long_polls"] = len(waiters)
+        status["event_streams"] = events.stats()["async_subscribers"]
+        return self.respond(status)
+
+
+def create_asgi_app(flask_app):
+    """Wraps the configured Flask app in an ASGI app with the async read routes in front."""
+    aio_mysql.init_app(flask_app)
+    routes = AsyncRoutes(flask_app)
+    cache.on_invalidate(waiters.notify)
+
+    @asynccontextmanager
+    async def lifespan(app):
+        waiters.loop = events.loop = asyncio.get_running_loop()
+        await aio_mysql.start()
+        try:
+            yield
+        finally:
+            await aio_mysql.close()
+
+    endpoints = [
+        Route("/api/questions", routes.list_questions, methods=["GET"]),
+        Route("/api/questions/{question_id:int}", routes.question_details, methods=["GET"]),
+        Route("/api/questions/{question_id:int}/comments", routes.question_comments, methods=["GET"]),
+        Route("/api/questions/{question_id:int}/events", routes.question_events, methods=["GET"]),
+        Route("/api/tags", routes.tags, methods=["GET"]),
+    ]
+    if flask_app.debug:
+        endpoints.append(Route("/api/_debug/async-pool", routes.pool_status, methods=["GET"]))
+    endpoints.append(Mount("/", app=routes.wsgi))
+
+    return Starlette(
+        routes=endpoints,
+        middleware=[Middleware(CORSMiddleware, allow_origins=flask_app.config['CORS_ORIGINS'],
+                               allow_methods=["*"], allow_headers=["*"])],
+        lifespan=lifespan,
+    )
@@ -0,0 +1,188 @@
+import base64
+import binascii
+import datetime
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+
+import jwt
+from flask import g, jsonify, request
+
+JWT_ALGORITHM = "HS256"
+MISSING_TOKEN = "Authorization header missing or invalid"
+EXPIRED_TOKEN = "Token has expired"
+INVALID_TOKEN = "Invalid token"
+
+
+class TokenCache:
+    """LRU of verified tokens keyed by signature, each entry dropped at its ``exp``.
+
+    The signing input is stored alongside the claims so a cached signature
+    paired with a different header or payload is treated as a miss.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, signature, signing_input, now):
+        with self._lock:
+            entry = self._data.get(signature)
+            if entry is None or entry[0] != signing_input:
+                return None
+            if entry[2] <= now:
+                del self._data[signature]
+                return None
+            self._data.move_to_end(signature)
+            return entry[1]
+
+    def set(self, signature, signing_input, claims, expires_at):
+        with self._lock:
+            self._data[signature] = (signing_input, claims, expires_at)
+            self._data.move_to_end(signature)
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+def _split_token(token):
+    """Returns ``(signing_input, signature)`` if the token is shaped like a JWS, else None."""
+    parts = token.split(".")
+    if len(parts) != 3 or not all(parts):
+        return None
+    try:
+        header = json.loads(base64.urlsafe_b64decode(parts[0] + "=" * (-len(parts[0]) % 4)))
+    except (ValueError, binascii.Error):
+        return None
+    if not isinstance(header, dict) or header.get("alg") != JWT_ALGORITHM:
+        return None
+    return parts[0] + "." + parts[1], parts[2]
+
+
+class Auth:
+    """Decodes the bearer token once per request and keeps the identity on ``g``.
+
+    Verified tokens are remembered until they expire, so repeat requests with
+    the same token skip the HMAC check and claim parsing. Malformed or
+    expired tokens are rejected by ``login_required`` before the view runs,
+    so they never check out a database connection.
+    """
+
+    def __init__(self):
+        self.secret_key = None
+        self.token_ttl = 3600
+        self.tokens = TokenCache()
+        self.hits = 0
+        self.misses = 0
+        self._stats_lock = threading.Lock()
+        self._user_loader = None
+
+    def init_app(self, app):
+        app.config.setdefault('JWT_SECRET_KEY', app.config.get('SECRET_KEY'))
+        app.config.setdefault('JWT_EXPIRATION_SECONDS', 3600)
+        app.config.setdefault('AUTH_TOKEN_CACHE_SIZE', 10000)
+        if not app.config['JWT_SECRET_KEY']:
+            raise RuntimeError("SECRET_KEY or JWT_SECRET_KEY must be configured")
+
+        self.secret_key = app.config['JWT_SECRET_KEY']
+        self.token_ttl = app.config['JWT_EXPIRATION_SECONDS']
+        self.tokens = TokenCache(app.config['AUTH_TOKEN_CACHE_SIZE'])
+        app.before_request(self._authenticate)
+        app.extensions['auth'] = self
+
+    def user_loader(self, loader):
+        """Registers ``loader(user_ids)`` returning ``{user_id: user}`` for load_users."""
+        self._user_loader = loader
+        return loader
+
+    def generate_token(self, user_id):
+        expiration_time = datetime.datetime.utcnow() + datetime.timedelta(seconds=self.token_ttl)
+        payload = {'user_id': user_id, 'exp': expiration_time}
+        return jwt.encode(payload, self.secret_key, algorithm=JWT_ALGORITHM)
+
+    def verify(self, token):
+        """Returns ``(claims, error)`` for a raw token, using the verified-token cache."""
+        parts = _split_token(token)
+        if parts is None:
+            return None, INVALID_TOKEN
+        signing_input, signature = parts
+
+        now = time.time()
+        claims = self.tokens.get(signature, signing_input, now)
+        if claims is not None:
+            with self._stats_lock:
+                self.hits += 1
+            return claims, None
+
+        with self._stats_lock:
+            self.misses += 1
+        try:
+            claims = jwt.decode(token, self.secret_key, algorithms=[JWT_ALGORITHM])
+        except jwt.ExpiredSignatureError:
+            return None, EXPIRED_TOKEN
+        except jwt.InvalidTokenError:
+            return None, INVALID_TOKEN
+        if not isinstance(claims.get('user_id'), int):
+            return None, INVALID_TOKEN
+
+        if 'exp' in claims:
+            self.tokens.set(signature, signing_input, claims, claims['exp'])
+        return claims, None
+
+    def _authenticate(self):
+        g.identity = None
+        g.auth_error = MISSING_TOKEN
+        auth_header = request.headers.get("Authorization")
+        if not auth_header or not auth_header.startswith("Bearer "):
+            return
+        g.identity, g.auth_error = self.verify(auth_header[len("Bearer "):].strip())
+
+    def load_users(self, user_ids):
+        """Returns ``{user_id: user}``, fetching only ids not yet loaded in this request."""
+        loaded = g.setdefault('loaded_users', {})
+        missing = [uid for uid in set(user_ids) if uid not in loaded]
+        if missing:
+            found = self._user_loader(missing)
+            for uid in missing:
+                loaded[uid] = found.get(uid)
+        return {uid: loaded[uid] for uid in user_ids if loaded.get(uid) is not None}
+
+    def stats(self):
+        with self._stats_lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0.0,
+            "entries": len(self.tokens),
+        }
+
+
+def current_identity():
+    """The verified token claims for this request, or None."""
+    return g.get('identity')
+
+
+def current_user_id():
+    identity = g.get('identity')
+    return identity['user_id'] if identity else None
+
+
+def login_required(view):
+    """Answers 401 before the view runs unless the request carries a valid token."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if g.get('identity') is None:
+            return jsonify({"error": g.get('auth_error') or MISSING_TOKEN}), 401
+        return view(*args, **kwargs)
+    return wrapper
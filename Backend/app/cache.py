@@ -0,0 +1,246 @@
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+MISSING = object()
+
+ALL_TAGS_KEY = "tags:all"
+
+# How long an invalidation is remembered to stop a load that started before it
+# from storing its result; a load that takes longer than this is not stored.
+INVALIDATION_WINDOW = 30.0
+
+
+def question_key(question_id):
+    return "question:%d" % question_id
+
+
+def question_comments_key(question_id):
+    return "question:%d:comments" % question_id
+
+
+def question_keys(question_id):
+    """Every key holding data derived from one question."""
+    return [question_key(question_id), question_comments_key(question_id)]
+
+
+class LocalCache:
+    """In-process cache with a per-entry TTL and an LRU bound on entry count."""
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self._data = OrderedDict()
+        self._invalidated = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def clock():
+        return time.monotonic()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                return MISSING
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return MISSING
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._set(key, value, ttl)
+
+    def _set(self, key, value, ttl):
+        self._data[key] = (value, time.monotonic() + ttl)
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def set_unless_invalidated(self, key, value, ttl, since):
+        """Stores ``value`` unless ``key`` was invalidated at or after ``since``; returns whether it did."""
+        with self._lock:
+            now = time.monotonic()
+            invalidated_at = self._invalidated.get(key)
+            if now - since > INVALIDATION_WINDOW or (invalidated_at is not None and invalidated_at >= since):
+                return False
+            self._set(key, value, ttl)
+            return True
+
+    def delete(self, *keys):
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def invalidate(self, *keys):
+        """Deletes ``keys`` and remembers when, for set_unless_invalidated()."""
+        with self._lock:
+            now = time.monotonic()
+            for key in keys:
+                self._data.pop(key, None)
+                self._invalidated[key] = now
+                self._invalidated.move_to_end(key)
+            while self._invalidated and next(iter(self._invalidated.values())) < now - INVALIDATION_WINDOW:
+                self._invalidated.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
+class RedisCache:
+    """Shared cache on a Redis-compatible client.
+
+    Values are pickled; expiry is delegated to the server and the LRU bound to
+    its ``maxmemory-policy``. Any object with ``get``, ``set(..., px=)``,
+    ``delete`` and ``scan_iter`` can be passed as the client.
+    """
+
+    def __init__(self, client, prefix="qa:"):
+        self.client = client
+        self.prefix = prefix
+        # Outside ``prefix`` so clear() and len() only see cached values.
+        self.invalidated_prefix = prefix.rstrip(":") + "-invalidated:"
+
+    @staticmethod
+    def clock():
+        # Compared across processes, so wall-clock time.
+        return time.time()
+
+    def get(self, key):
+        data = self.client.get(self.prefix + key)
+        return MISSING if data is None else pickle.loads(data)
+
+    def set(self, key, value, ttl):
+        self.client.set(self.prefix + key, pickle.dumps(value), px=int(ttl * 1000))
+
+    def set_unless_invalidated(self, key, value, ttl, since):
+        """Stores ``value`` unless any process invalidated ``key`` at or after ``since``."""
+        if time.time() - since > INVALIDATION_WINDOW:
+            return False
+        invalidated_at = self.client.get(self.invalidated_prefix + key)
+        if invalidated_at is not None and float(invalidated_at) >= since:
+            return False
+        self.set(key, value, ttl)
+        return True
+
+    def delete(self, *keys):
+        if keys:
+            self.client.delete(*[self.prefix + key for key in keys])
+
+    def invalidate(self, *keys):
+        now = repr(time.time())
+        for key in keys:
+            self.client.set(self.invalidated_prefix + key, now, px=int(INVALIDATION_WINDOW * 1000))
+        self.delete(*keys)
+
+    def clear(self):
+        keys = list(self.client.scan_iter(match=self.prefix + "*"))
+        if keys:
+            self.client.delete(*keys)
+
+    def __len__(self):
+        return sum(1 for _ in self.client.scan_iter(match=self.prefix + "*"))
+
+
+class Cache:
+    """Read-through cache for hot read paths, invalidated by the write routes.
+
+    ``CACHE_BACKEND`` selects ``local`` (default) or ``redis``; the latter
+    needs the ``redis`` package and ``CACHE_REDIS_URL``.
+
+    A read that misses loads the value and then stores it, unless the key
+    was invalidated after the load started: a write committed during the
+    load may have changed what it read, and storing it would serve the old
+    value for the whole TTL.
+    """
+
+    def __init__(self, app=None):
+        self.backend = LocalCache()
+        self.default_ttl = 60
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale_loads = 0
+        self._invalidation_listeners = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CACHE_BACKEND', 'local')
+        app.config.setdefault('CACHE_DEFAULT_TTL', 60)
+        app.config.setdefault('CACHE_MAX_ENTRIES', 10000)
+        app.config.setdefault('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+        self.default_ttl = app.config['CACHE_DEFAULT_TTL']
+        if app.config['CACHE_BACKEND'] == 'redis':
+            import redis
+            self.backend = RedisCache(redis.Redis.from_url(app.config['CACHE_REDIS_URL']))
+        else:
+            self.backend = LocalCache(app.config['CACHE_MAX_ENTRIES'])
+        app.extensions['cache'] = self
+
+    def get_or_set(self, key, loader, ttl=None):
+        """Returns the cached value for ``key``, calling ``loader`` on a miss.
+
+        A loader result of None is returned but not cached.
+        """
+        value = self._lookup(key)
+        if value is MISSING:
+            started = self.backend.clock()
+            value = loader()
+            self._store(key, value, ttl, started)
+        return value
+
+    async def get_or_set_async(self, key, loader, ttl=None):
+        """get_or_set() for a coroutine function ``loader``."""
+        value = self._lookup(key)
+        if value is MISSING:
+            started = self.backend.clock()
+            value = await loader()
+            self._store(key, value, ttl, started)
+        return value
+
+    def _lookup(self, key):
+        value = self.backend.get(key)
+        with self._lock:
+            if value is MISSING:
+                self.misses += 1
+            else:
+                self.hits += 1
+        return value
+
+    def _store(self, key, value, ttl, started):
+        if value is None:
+            return
+        if not self.backend.set_unless_invalidated(key, value, self.default_ttl if ttl is None else ttl, started):
+            with self._lock:
+                self.stale_loads += 1
+
+    def on_invalidate(self, callback):
+        """Registers ``callback(keys)`` to run after keys are invalidated."""
+        self._invalidation_listeners.append(callback)
+        return callback
+
+    def invalidate(self, *keys):
+        self.backend.invalidate(*keys)
+        for callback in self._invalidation_listeners:
+            callback(keys)
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        return {
+            "hits": hits,
+            "misses": misses,
+            "hit_ratio": hits / total if total else 0.0,
+            "stale_loads": self.stale_loads,
+            "entries": len(self.backend),
+        }
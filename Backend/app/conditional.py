@@ -0,0 +1,71 @@
+import hashlib
+from datetime import timezone
+from functools import wraps
+
+from flask import make_response, request
+
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def as_utc(value):
+    if value is None:
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.replace(microsecond=0)
+
+
+def conditional(version_loader, on_not_modified=None):
+    """Adds ETag/Last-Modified validators to a GET view and answers 304s.
+
+    ``version_loader`` is called with the view arguments and returns
+    ``(parts, last_modified)`` describing the current version of the
+    resource, or None to skip conditional handling. It should be much
+    cheaper than the view: when the client's ``If-None-Match`` or
+    ``If-Modified-Since`` still matches, the view is never called.
+
+    ``on_not_modified`` is called with the view arguments before a 304 is
+    sent, for side effects the view would otherwise have had, such as
+    counting a page view.
+
+    ETags are weak because ``updated_at`` has one-second resolution.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            try:
+                version = version_loader(*args, **kwargs)
+            except Exception:
+                version = None
+            if version is None:
+                return view(*args, **kwargs)
+
+            parts, last_modified = version
+            etag = make_etag(request.full_path, *parts)
+            last_modified = as_utc(last_modified)
+
+            if request.if_none_match:
+                fresh = request.if_none_match.contains_weak(etag)
+            elif request.if_modified_since and last_modified is not None:
+                fresh = last_modified <= request.if_modified_since
+            else:
+                fresh = False
+
+            if fresh:
+                if on_not_modified is not None:
+                    on_not_modified(*args, **kwargs)
+                response = make_response("", 304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.headers['Cache-Control'] = 'no-cache'
+            return response
+        return wrapper
+    return decorator
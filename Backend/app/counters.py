@@ -0,0 +1,185 @@
+import atexit
+import logging
+import threading
+
+FLUSH_BATCH_SIZE = 500
+
+logger = logging.getLogger(__name__)
+
+
+class CounterService:
+    """Write-behind accumulator for question views and question/answer votes.
+
+    Page views and vote deltas are summed in memory and written to MySQL by
+    a background thread every ``COUNTER_FLUSH_INTERVAL`` seconds, as a few
+    multi-row UPDATEs instead of one row-locking UPDATE per event. Deltas
+    that have not reached the database yet are exposed through ``pending()``
+    so reads can merge them in.
+    """
+
+    def __init__(self):
+        self.flush_interval = 5.0
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._views = {}
+        self._question_votes = {}
+        self._answer_votes = {}
+        self._answer_questions = {}
+        self._inflight = ({}, {}, {})
+        self._thread = None
+        self._stop = threading.Event()
+        self._pool = None
+        self._on_flush = []
+
+    def init_app(self, app, pool):
+        app.config.setdefault('COUNTER_FLUSH_INTERVAL', 5.0)
+        self.flush_interval = app.config['COUNTER_FLUSH_INTERVAL']
+        self._pool = pool
+        app.extensions['counters'] = self
+        atexit.register(self.stop)
+
+    def on_flush(self, callback):
+        """Registers ``callback(question_ids)`` to run after each successful flush."""
+        self._on_flush.append(callback)
+        return callback
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._stop.clear()
+                    self._thread = threading.Thread(target=self._run, name="counter-flush", daemon=True)
+                    self._thread.start()
+
+    def _run(self):
+        while not self._stop.wait(self.flush_interval):
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Counter flush failed")
+
+    def stop(self):
+        self._stop.set()
+        try:
+            self.flush()
+        except Exception:
+            logger.exception("Counter flush failed")
+
+    def record_view(self, question_id):
+        with self._lock:
+            self._views[question_id] = self._views.get(question_id, 0) + 1
+        self._ensure_thread()
+
+    def record_vote(self, target_type, target_id, delta, question_id=None):
+        if not delta:
+            return
+        with self._lock:
+            if target_type == 'answer':
+                self._answer_votes[target_id] = self._answer_votes.get(target_id, 0) + delta
+                self._answer_questions[target_id] = question_id
+            else:
+                self._question_votes[target_id] = self._question_votes.get(target_id, 0) + delta
+        self._ensure_thread()
+
+    def pending(self):
+        """Returns ``(views, question_votes, answer_votes)`` not yet visible in MySQL."""
+        with self._lock:
+            merged = []
+            for current, inflight in zip((self._views, self._question_votes, self._answer_votes), self._inflight):
+                combined = dict(inflight)
+                for key, value in current.items():
+                    combined[key] = combined.get(key, 0) + value
+                merged.append(combined)
+            return tuple(merged)
+
+    def apply_to_tree(self, tree):
+        """Returns a copy of a get_question_tree() result with pending deltas added."""
+        views, votes, answer_votes = self.pending()
+        answers = []
+        for answer in tree["answers"]:
+            delta = answer_votes.get(answer["answer_id"])
+            answers.append(dict(answer, upvotes=(answer["upvotes"] or 0) + delta) if delta else answer)
+        return dict(tree, question=_with_deltas(tree["question"], views, votes), answers=answers)
+
+    def flush(self):
+        """Writes accumulated deltas to MySQL and returns the affected question ids."""
+        with self._flush_lock:
+            with self._lock:
+                views, question_votes, answer_votes = self._views, self._question_votes, self._answer_votes
+                answer_questions = self._answer_questions
+                if not (views or question_votes or answer_votes):
+                    return set()
+                self._views, self._question_votes, self._answer_votes = {}, {}, {}
+                self._answer_questions = {}
+                self._inflight = (views, question_votes, answer_votes)
+
+            try:
+                with self._pool.checkout() as conn:
+                    with conn.cursor() as cursor:
+                        question_ids = sorted(set(views) | set(question_votes))
+                        for start in range(0, len(question_ids), FLUSH_BATCH_SIZE):
+                            chunk = question_ids[start:start + FLUSH_BATCH_SIZE]
+                            rows = [(qid, views.get(qid, 0), question_votes.get(qid, 0)) for qid in chunk]
+                            cursor.execute(
+                                """
+                                UPDATE questions q
+                                JOIN ({}) d ON q.question_id = d.id
+                                SET q.views = COALESCE(q.views, 0) + d.views,
+                                    q.upvotes = COALESCE(q.upvotes, 0) + d.votes,
+                                    q.updated_at = q.updated_at
+                                """.format(_values_table(len(rows), ("id", "views", "votes"))),
+                                [value for row in rows for value in row],
+                            )
+
+                        answer_ids = sorted(answer_votes)
+                        for start in range(0, len(answer_ids), FLUSH_BATCH_SIZE):
+                            chunk = answer_ids[start:start + FLUSH_BATCH_SIZE]
+                            rows = [(aid, answer_votes[aid]) for aid in chunk]
+                            cursor.execute(
+                                """
+                                UPDATE answers a
+                                JOIN ({}) d ON a.answer_id = d.id
+                                SET a.upvotes = COALESCE(a.upvotes, 0) + d.votes,
+                                    a.updated_at = a.updated_at
+                                """.format(_values_table(len(rows), ("id", "votes"))),
+                                [value for row in rows for value in row],
+                            )
+                    conn.commit()
+            except Exception:
+                with self._lock:
+                    for current, failed in zip((self._views, self._question_votes, self._answer_votes),
+                                               (views, question_votes, answer_votes)):
+                        for key, value in failed.items():
+                            current[key] = current.get(key, 0) + value
+                    for key, value in answer_questions.items():
+                        self._answer_questions.setdefault(key, value)
+                    self._inflight = ({}, {}, {})
+                raise
+
+            with self._lock:
+                self._inflight = ({}, {}, {})
+
+        affected = set(views) | set(question_votes)
+        affected.update(qid for qid in answer_questions.values() if qid is not None)
+        for callback in self._on_flush:
+            callback(affected)
+        return affected
+
+
+def _with_deltas(question, views, votes):
+    question_id = question["question_id"]
+    if question_id not in views and question_id not in votes:
+        return question
+    question = dict(question)
+    if "views" in question:
+        question["views"] = (question["views"] or 0) + views.get(question_id, 0)
+    if "upvotes" in question:
+        question["upvotes"] = (question["upvotes"] or 0) + votes.get(question_id, 0)
+    return question
+
+
+def _values_table(count, names):
+    """Builds a derived table of ``count`` parameterised rows with the given column names."""
+    first = "SELECT " + ", ".join("%s AS " + name for name in names)
+    rest = "SELECT " + ", ".join(["%s"] * len(names))
+    return " UNION ALL ".join([first] + [rest] * (count - 1))
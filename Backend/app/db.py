@@ -0,0 +1,298 @@
+import threading
+import time
+from contextlib import contextmanager
+
+import pymysql
+from flask import g
+
+
+class PoolExhausted(Exception):
+    """Raised when no connection becomes free within the checkout timeout."""
+
+
+class PoolStats:
+    """Counters describing how the pool is being used."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.created = 0
+        self.discarded = 0
+        self.exhausted = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def record_checkout(self, waited):
+        with self._lock:
+            self.checkouts += 1
+            self.wait_time_total += waited
+            if waited > self.wait_time_max:
+                self.wait_time_max = waited
+
+    def incr(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "created": self.created,
+                "discarded": self.discarded,
+                "exhausted": self.exhausted,
+                "wait_time_total": self.wait_time_total,
+                "wait_time_max": self.wait_time_max,
+                "wait_time_avg": self.wait_time_total / self.checkouts if self.checkouts else 0.0,
+            }
+
+
+class ConnectionPool:
+    """A bounded pool of MySQL connections bound to a single database.
+
+    Connections are opened lazily up to ``size``. Idle connections older than
+    ``ping_interval`` seconds are pinged before being handed out, and
+    connections older than ``recycle`` seconds are replaced.
+    """
+
+    def __init__(self, connect_kwargs, size=10, timeout=5.0, ping_interval=30.0, recycle=3600.0,
+                 connect=pymysql.connect):
+        self.connect_kwargs = connect_kwargs
+        self.size = size
+        self.timeout = timeout
+        self.ping_interval = ping_interval
+        self.recycle = recycle
+        self.stats = PoolStats()
+        self._connect = connect
+        self._idle = []
+        self._opened = 0
+        self._in_use = 0
+        self._cond = threading.Condition()
+
+    def _new_connection(self):
+        conn = self._connect(**self.connect_kwargs)
+        self.stats.incr("created")
+        return conn, time.monotonic(), time.monotonic()
+
+    def _healthy(self, entry):
+        conn, created_at, last_used = entry
+        now = time.monotonic()
+        if now - created_at > self.recycle:
+            return False
+        if now - last_used > self.ping_interval:
+            try:
+                conn.ping(reconnect=False)
+            except Exception:
+                return False
+        return True
+
+    def _discard(self, conn):
+        self.stats.incr("discarded")
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def acquire(self):
+        started = time.monotonic()
+        deadline = started + self.timeout
+        with self._cond:
+            while not self._idle and self._opened >= self.size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats.incr("exhausted")
+                    raise PoolExhausted("No database connection available within %.1fs" % self.timeout)
+                self._cond.wait(remaining)
+            entry = self._idle.pop() if self._idle else None
+            if entry is None:
+                self._opened += 1
+            self._in_use += 1
+
+        try:
+            while entry is not None and not self._healthy(entry):
+                self._discard(entry[0])
+                with self._cond:
+                    if self._idle:
+                        # The discarded connection's slot is given up; the
+                        # popped one is already counted in _opened.
+                        entry = self._idle.pop()
+                        self._opened -= 1
+                    else:
+                        entry = None
+            if entry is None:
+                entry = self._new_connection()
+        except Exception:
+            with self._cond:
+                self._opened -= 1
+                self._in_use -= 1
+                self._cond.notify()
+            raise
+
+        self.stats.record_checkout(time.monotonic() - started)
+        return entry[0], entry[1]
+
+    def release(self, conn, created_at, broken=False):
+        if not broken:
+            try:
+                conn.rollback()
+            except Exception:
+                broken = True
+        if broken:
+            self._discard(conn)
+        with self._cond:
+            self._in_use -= 1
+            if broken:
+                self._opened -= 1
+            else:
+                self._idle.append((conn, created_at, time.monotonic()))
+            self._cond.notify()
+
+    def status(self):
+        with self._cond:
+            status = {"size": self.size, "open": self._opened, "in_use": self._in_use, "idle": len(self._idle)}
+        status.update(self.stats.snapshot())
+        return status
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._opened -= len(idle)
+        for conn, _, _ in idle:
+            conn.close()
+
+
+class RowChunks:
+    """Iterates an unbuffered cursor in lists of ``chunk_size`` rows.
+
+    The connection goes back to the pool once the rows are exhausted. If the
+    iterator is closed early, the connection is closed instead of draining
+    the unread rows, which could be most of a large result.
+    """
+
+    def __init__(self, pool, conn, created_at, cursor, chunk_size):
+        self._pool = pool
+        self._conn = conn
+        self._created_at = created_at
+        self._cursor = cursor
+        self.chunk_size = chunk_size
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self._conn is None:
+            raise StopIteration
+        try:
+            rows = self._cursor.fetchmany(self.chunk_size)
+        except Exception:
+            self.close()
+            raise
+        if not rows:
+            self._cursor.close()
+            self._release(broken=False)
+            raise StopIteration
+        return rows
+
+    def _release(self, broken):
+        conn, self._conn = self._conn, None
+        self._pool.release(conn, self._created_at, broken=broken)
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._release(broken=True)
+
+
+class MySQLPool:
+    """Flask extension handing out one pooled connection per application context.
+
+    The connection is checked out on first use of ``connection`` or ``cursor()``
+    and returned to the pool on teardown, rolling back anything left uncommitted.
+    """
+
+    def __init__(self, app=None):
+        self.pool = None
+        self.stream_cursor_class = pymysql.cursors.SSCursor
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MYSQL_HOST', 'localhost')
+        app.config.setdefault('MYSQL_PORT', 3306)
+        app.config.setdefault('MYSQL_USER', 'root')
+        app.config.setdefault('MYSQL_PASSWORD', '')
+        app.config.setdefault('MYSQL_DB', 'questionanswerplatform')
+        app.config.setdefault('MYSQL_CHARSET', 'utf8mb4')
+        app.config.setdefault('MYSQL_POOL_SIZE', 10)
+        app.config.setdefault('MYSQL_POOL_TIMEOUT', 5.0)
+        app.config.setdefault('MYSQL_POOL_PING_INTERVAL', 30.0)
+        app.config.setdefault('MYSQL_POOL_RECYCLE', 3600.0)
+
+        self.pool = ConnectionPool(
+            {
+                "host": app.config['MYSQL_HOST'],
+                "port": app.config['MYSQL_PORT'],
+                "user": app.config['MYSQL_USER'],
+                "password": app.config['MYSQL_PASSWORD'],
+                "database": app.config['MYSQL_DB'],
+                "charset": app.config['MYSQL_CHARSET'],
+                "autocommit": False,
+            },
+            size=app.config['MYSQL_POOL_SIZE'],
+            timeout=app.config['MYSQL_POOL_TIMEOUT'],
+            ping_interval=app.config['MYSQL_POOL_PING_INTERVAL'],
+            recycle=app.config['MYSQL_POOL_RECYCLE'],
+        )
+        app.extensions['mysql_pool'] = self
+        app.teardown_appcontext(self.teardown)
+
+    @property
+    def connection(self):
+        if 'mysql_conn' not in g:
+            g.mysql_conn = self.pool.acquire()
+        return g.mysql_conn[0]
+
+    @contextmanager
+    def checkout(self):
+        """Borrows a connection outside of a request, e.g. from a background thread."""
+        conn, created_at = self.pool.acquire()
+        try:
+            yield conn
+        finally:
+            self.pool.release(conn, created_at, broken=not conn.open)
+
+    @contextmanager
+    def cursor(self, cursor_class=None):
+        cursor = self.connection.cursor(cursor_class)
+        try:
+            yield cursor
+        finally:
+            cursor.close()
+
+    def iter_chunks(self, query, params=(), chunk_size=500):
+        """Runs ``query`` on an unbuffered server-side cursor and returns a RowChunks iterator.
+
+        The query is executed before returning, so errors surface to the
+        caller; rows are then read from the socket as the iterator is
+        consumed, on a connection held independently of the request context.
+        """
+        conn, created_at = self.pool.acquire()
+        try:
+            cursor = conn.cursor(self.stream_cursor_class)
+            cursor.execute(query, params)
+        except Exception:
+            self.pool.release(conn, created_at, broken=True)
+            raise
+        return RowChunks(self.pool, conn, created_at, cursor, chunk_size)
+
+    def release(self):
+        """Returns the request's connection to the pool early; later use checks out another."""
+        self.teardown(None)
+
+    def teardown(self, exception):
+        entry = g.pop('mysql_conn', None)
+        if entry is not None:
+            conn, created_at = entry
+            self.pool.release(conn, created_at, broken=not conn.open)
+
+    def status(self):
+        return self.pool.status()
@@ -0,0 +1,216 @@
+import itertools
+import json
+import threading
+from collections import OrderedDict, deque
+
+SSE_MIMETYPE = "text/event-stream"
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+HEARTBEAT_FRAME = b": keepalive\n\n"
+RETRY_FRAME = b"retry: 3000\n\n"
+
+
+class _Topic:
+    __slots__ = ("events", "evicted")
+
+    def __init__(self, size):
+        self.events = deque(maxlen=size)
+        self.evicted = 0
+
+
+class EventBus:
+    """In-process pub/sub for per-question change events, served as Server-Sent Events.
+
+    Write routes ``publish()`` after they commit. Each question keeps its
+    last ``EVENTS_BUFFER_SIZE`` events in a ring buffer, already encoded as
+    SSE frames, so a reconnecting client can resume from ``Last-Event-ID``
+    and every subscriber shares the same bytes. Event ids come from one
+    process-wide counter and only ever increase.
+
+    Subscribers hold no per-connection buffers, only the id of the last
+    event they sent: ``stream_async()`` parks a coroutine on one future per
+    wake-up, which is what lets a process hold tens of thousands of idle
+    connections under ASGI. ``stream()`` is the WSGI fallback and ties up a
+    thread per connection.
+    """
+
+    def __init__(self):
+        self.buffer_size = 100
+        self.max_topics = 10000
+        self.heartbeat = 15.0
+        self.loop = None
+        self._ids = itertools.count(1)
+        self._last_id = 0
+        self._topics = OrderedDict()
+        self._dropped = 0
+        self._lock = threading.Lock()
+        self._cond = threading.Condition(self._lock)
+        self._async_waiters = {}
+        self.published = 0
+        self.dumps = json.dumps
+
+    def init_app(self, app):
+        app.config.setdefault('EVENTS_BUFFER_SIZE', 100)
+        app.config.setdefault('EVENTS_MAX_TOPICS', 10000)
+        app.config.setdefault('EVENTS_HEARTBEAT_SECONDS', 15.0)
+        self.buffer_size = app.config['EVENTS_BUFFER_SIZE']
+        self.max_topics = app.config['EVENTS_MAX_TOPICS']
+        self.heartbeat = app.config['EVENTS_HEARTBEAT_SECONDS']
+        self.dumps = app.json.dumps
+        app.extensions['events'] = self
+
+    def publish(self, topic, event, data):
+        """Appends an event for ``topic`` and wakes its subscribers; safe from any thread."""
+        payload = self.dumps(data)
+        with self._lock:
+            event_id = next(self._ids)
+            frame = ("id: %d\nevent: %s\ndata: %s\n\n" % (event_id, event, payload)).encode()
+            entry = self._topics.get(topic)
+            if entry is None:
+                # A topic may have been dropped before; resuming it from an older id needs a reset.
+                entry = self._topics[topic] = _Topic(self.buffer_size)
+                entry.evicted = self._dropped
+                if len(self._topics) > self.max_topics:
+                    _, dropped = self._topics.popitem(last=False)
+                    if dropped.events:
+                        self._dropped = max(self._dropped, dropped.events[-1][0])
+            else:
+                self._topics.move_to_end(topic)
+            if len(entry.events) == entry.events.maxlen:
+                entry.evicted = entry.events[0][0]
+            entry.events.append((event_id, frame))
+            self._last_id = event_id
+            self.published += 1
+            self._cond.notify_all()
+        if self.loop is not None and topic in self._async_waiters:
+            self.loop.call_soon_threadsafe(self._wake, topic)
+        return event_id
+
+    def last_id(self):
+        return self._last_id
+
+    def since(self, topic, after):
+        """Returns ``(frames, last_id, complete)`` for events on ``topic`` newer than ``after``.
+
+        ``complete`` is False when events after ``after`` were already
+        evicted from the ring buffer (or the topic was dropped), so the
+        client has to reload instead of applying deltas. So is an ``after``
+        newer than anything published here: ids restart with the process and
+        differ between workers, so such an id came from another event stream.
+        """
+        with self._lock:
+            if after > self._last_id:
+                return [], after, False
+            entry = self._topics.get(topic)
+            if entry is None:
+                return [], after, after >= self._dropped
+            complete = after >= entry.evicted
+            frames = [frame for event_id, frame in entry.events if event_id > after]
+            last = entry.events[-1][0] if frames else after
+        return frames, last, complete
+
+    def wait(self, topic, after, timeout):
+        """Blocks the calling thread until ``topic`` has events newer than ``after`` or ``timeout`` passes."""
+        with self._cond:
+            return self._cond.wait_for(lambda: self._newest(topic) > after, timeout)
+
+    def _newest(self, topic):
+        entry = self._topics.get(topic)
+        return entry.events[-1][0] if entry is not None and entry.events else 0
+
+    async def wait_async(self, topic, after, timeout):
+        """Coroutine form of wait() for the ASGI app; needs ``loop`` to be set."""
+        import asyncio
+
+        future = self.loop.create_future()
+        self._async_waiters.setdefault(topic, set()).add(future)
+        try:
+            if self._newest(topic) > after:
+                return True
+            try:
+                await asyncio.wait_for(future, timeout)
+                return True
+            except asyncio.TimeoutError:
+                return False
+        finally:
+            waiters = self._async_waiters.get(topic)
+            if waiters is not None:
+                waiters.discard(future)
+                if not waiters:
+                    del self._async_waiters[topic]
+
+    def _wake(self, topic):
+        for future in self._async_waiters.pop(topic, ()):
+            if not future.done():
+                future.set_result(None)
+
+    def _catch_up(self, topic, after):
+        """Returns the bytes to send a subscriber at ``after`` and its new position."""
+        frames, last, complete = self.since(topic, after)
+        if not complete:
+            last = self._last_id
+            return reset_frame(last), last
+        return b"".join(frames), last
+
+    def stream(self, topic, after):
+        """Yields SSE bytes for ``topic`` forever; ``after=None`` starts from the newest event.
+
+        The starting point is fixed here, at subscribe time, rather than when
+        the response is first iterated, so nothing published in between is lost.
+        """
+        return self._stream(topic, self._last_id if after is None else after, after is not None)
+
+    def _stream(self, topic, after, resume):
+        yield RETRY_FRAME
+        if resume:
+            data, after = self._catch_up(topic, after)
+            if data:
+                yield data
+        while True:
+            if not self.wait(topic, after, self.heartbeat):
+                yield HEARTBEAT_FRAME
+                continue
+            data, after = self._catch_up(topic, after)
+            yield data
+
+    def stream_async(self, topic, after):
+        """Async generator form of stream() for the ASGI app."""
+        return self._stream_async(topic, self._last_id if after is None else after, after is not None)
+
+    async def _stream_async(self, topic, after, resume):
+        yield RETRY_FRAME
+        if resume:
+            data, after = self._catch_up(topic, after)
+            if data:
+                yield data
+        while True:
+            if not await self.wait_async(topic, after, self.heartbeat):
+                yield HEARTBEAT_FRAME
+                continue
+            data, after = self._catch_up(topic, after)
+            yield data
+
+    def stats(self):
+        with self._lock:
+            return {
+                "topics": len(self._topics),
+                "buffered": sum(len(entry.events) for entry in self._topics.values()),
+                "published": self.published,
+                "last_id": self._last_id,
+                "async_subscribers": sum(len(waiters) for waiters in self._async_waiters.values()),
+            }
+
+
+def parse_last_event_id(headers, args):
+    """Reads the resume point from ``Last-Event-ID`` or ``?last_event_id=``; None means start from now."""
+    value = headers.get("Last-Event-ID") or args.get("last_event_id")
+    if value is None:
+        return None
+    try:
+        return max(int(value), 0)
+    except ValueError:
+        return None
+
+
+def reset_frame(last_id):
+    """Tells the client its copy is too old to patch; it should refetch the question."""
+    return ("id: %d\nevent: reset\ndata: {}\n\n" % last_id).encode()
@@ -0,0 +1,164 @@
+"""EXPLAIN checks for the queries issued by the API routes.
+
+``flask db-explain`` runs EXPLAIN on each query below with parameters taken
+from the live database and reports every table read with a full scan
+(``type = ALL``). On near-empty tables the optimizer may prefer a scan over
+an index, so run it against a realistically sized dataset.
+"""
+import click
+
+from app import highlight, models, question_stats, revisions, similarity, tags
+from app.pagination import DEFAULT_PAGE_SIZE, Page
+
+
+def _sample(cursor, query, default):
+    cursor.execute(query)
+    row = cursor.fetchone()
+    return row[0] if row and row[0] is not None else default
+
+
+def route_queries(cursor):
+    """Yields ``(label, query, params)`` for the queries the routes and indexes issue.
+
+    The SQL comes from the constants and builders the code itself executes,
+    so the check cannot drift from what runs. Index rebuilds that read a
+    whole table by design are listed in WHOLE_TABLE_READS.
+    """
+    from app import routes
+
+    question_id = _sample(cursor, "SELECT MAX(question_id) FROM questions", 1)
+    user_id = _sample(cursor, "SELECT MAX(user_id) FROM users", 1)
+    email = _sample(cursor, "SELECT email FROM users LIMIT 1", "user@example.com")
+    tag_name = _sample(cursor, "SELECT tag_name FROM tags LIMIT 1", "python")
+    answer_id = _sample(cursor, "SELECT MAX(answer_id) FROM answers", 1)
+    comment_id = _sample(cursor, "SELECT MAX(comment_id) FROM comments", 1)
+    created_at = _sample(cursor, "SELECT MAX(created_at) FROM questions", "2024-01-01 00:00:00")
+    digest = b"\0" * 32
+
+    listings = [
+        ("get_all_questions", routes.question_paginator, routes.QUESTIONS_FROM, None, ()),
+        ("get_questions_by_tag", routes.question_paginator, routes.TAGGED_QUESTIONS_FROM,
+         "t.tag_name = %s", (tag_name,)),
+        ("get_user_questions", routes.user_question_paginator, routes.QUESTIONS_FROM,
+         "q.user_id = %s", (user_id,)),
+        ("get_answered_questions", routes.answered_question_paginator, routes.ANSWERED_QUESTIONS_FROM,
+         "a.user_id = %s", (user_id,)),
+    ]
+    for name, paginator, from_clause, where, params in listings:
+        for sort, keys in paginator.sorts.items():
+            first = Page(paginator.default_fields, sort, DEFAULT_PAGE_SIZE, None)
+            yield ("%s sort=%s" % (name, sort),) + paginator.build(from_clause, first, where, params)
+            after = [created_at if "created_at" in key else question_id for key in keys]
+            next_page = Page(paginator.default_fields, sort, DEFAULT_PAGE_SIZE, after)
+            yield ("%s sort=%s cursor" % (name, sort),) + paginator.build(from_clause, next_page, where, params)
+
+    # Reads in app.models
+    yield "get_question_tree question", models.QUESTION_QUERY, (question_id,)
+    yield "get_question_tree answers", models.QUESTION_ANSWERS_QUERY, (question_id,)
+    yield "get_question_tree comments", models.question_tree_comments_query(3), (question_id, 1, 2, 3)
+    yield "get_question_comments", models.QUESTION_COMMENTS_QUERY, (question_id,)
+    yield "get_question_version", models.QUESTION_VERSION_QUERY, (question_id,) * 4
+    yield "get_questions_version", models.QUESTIONS_VERSION_QUERY, ()
+    yield "get_tags", models.TAGS_QUERY, ()
+    yield "get_tags_version", models.TAGS_VERSION_QUERY, ()
+    yield "get_user_by_email", models.USER_BY_EMAIL_QUERY, (email,)
+    yield "get_user_by_id", models.USER_BY_ID_QUERY, (user_id,)
+    yield "get_users_by_ids", models.users_by_ids_query(3), (user_id, 1, 2)
+    yield "get_questions_by_ids", models.questions_by_ids_query(3), (question_id, 1, 2)
+    yield "find_parents", models.find_parents_query(2, 2), (question_id, 1, answer_id, 1)
+    yield "get_question_tag_ids", models.QUESTION_TAG_IDS_QUERY, (question_id,)
+    yield "link_question_tags", models.tags_by_name_query(2), (tag_name, "python")
+    for target_type, query in models.VOTE_TARGET_QUERIES.items():
+        yield "cast_vote %s" % target_type, query, (answer_id if target_type == "answer" else question_id,)
+    yield "cast_vote previous", models.VOTE_FOR_UPDATE_QUERY, (user_id, "question", question_id)
+    yield "cast_vote delete", models.DELETE_VOTE_QUERY, (user_id, "question", question_id)
+
+    # Write routes in app.routes
+    yield "delete_question", routes.DELETE_QUESTION_QUERY, (question_id,)
+    yield "updatequestion ownership", routes.QUESTION_FOR_UPDATE_QUERY, (question_id,)
+    yield "updatequestion", routes.UPDATE_QUESTION_QUERY, ("", "", question_id)
+    yield "updateanswer ownership", routes.ANSWER_FOR_UPDATE_QUERY, (answer_id,)
+    yield "updateanswer", routes.UPDATE_ANSWER_QUERY, ("", "", answer_id)
+    yield "updatecomment ownership", routes.COMMENT_OWNER_QUERY, (comment_id,)
+    yield "updatecomment", routes.UPDATE_COMMENT_QUERY, ("", comment_id)
+
+    # Revision history in app.revisions
+    yield "revisions latest", revisions.LATEST_REVISIONS_QUERY, ("question", question_id)
+    yield "revisions delete_question", revisions.DELETE_QUESTION_REVISIONS_QUERY, (question_id, question_id)
+    yield "revisions history", revisions.HISTORY_QUERY, ("question", question_id)
+    yield "revisions reconstruct", revisions.RECONSTRUCT_QUERY, ("question", question_id, 1) * 2
+    for target_type in revisions.REVISION_TARGETS:
+        target_id = answer_id if target_type == "answer" else question_id
+        yield ("revisions first %s" % target_type, revisions.target_query(revisions.FIRST_REVISION_QUERY, target_type),
+               (target_type, target_id, b"", target_id))
+        yield ("revisions unedited history %s" % target_type,
+               revisions.target_query(revisions.UNEDITED_HISTORY_QUERY, target_type), (target_id,))
+        yield ("revisions latest %s" % target_type,
+               revisions.target_query(revisions.LATEST_REVISION_QUERY, target_type),
+               (target_type, target_id, target_id))
+        yield ("revisions unedited content %s" % target_type,
+               revisions.target_query(revisions.UNEDITED_CONTENT_QUERY, target_type), (target_id, target_type))
+
+    # Code renderings in app.highlight
+    yield "code_renderings ensure", highlight.RENDERER_VERSION_QUERY, (digest,)
+    yield ("code_renderings fetch",) + highlight.renderings_query([digest, digest])
+    yield ("code_renderings current",) + highlight.renderings_query(
+        [digest, digest], columns="code_hash", min_version=highlight.RENDERER_VERSION)
+    for table, key in highlight.BACKFILL_TABLES:
+        yield "render-code %s" % table, highlight.backfill_query(table, key), (0, highlight.BACKFILL_BATCH_SIZE)
+
+    # Tag and similarity indexes
+    yield "tag index tags", tags.REBUILD_TAGS_QUERY, ()
+    yield "tag index postings", tags.REBUILD_POSTINGS_QUERY, ()
+    yield "similarity load", similarity.LOAD_QUERY, (similarity.SIGNATURE_VERSION,)
+    yield "similarity rebuild", similarity.REBUILD_BATCH_QUERY, (0, similarity.REBUILD_BATCH_SIZE)
+    yield "similarity delete", similarity.DELETE_SIGNATURE_QUERY, (question_id,)
+
+    yield "reconcile-question-stats", question_stats.EXPECTED_STATS_QUERY, (1, question_id)
+
+
+def explain(cursor, query, params):
+    """Returns EXPLAIN rows as dicts."""
+    cursor.execute("EXPLAIN " + query, params)
+    names = [d[0] for d in cursor.description]
+    return [dict(zip(names, row)) for row in cursor.fetchall()]
+
+
+# Loads that read every row on purpose; a full scan there is expected.
+WHOLE_TABLE_READS = {"get_tags", "tag index tags", "similarity load"}
+
+
+def full_scans(plan):
+    """Returns the plan rows that read a base table without an index."""
+    return [row for row in plan if row.get("type") == "ALL" and not str(row.get("table", "")).startswith("<")]
+
+
+def check_route_queries(cursor, echo=print):
+    """Explains every route query and returns ``(label, scans)`` for those with full scans."""
+    problems = []
+    for label, query, params in route_queries(cursor):
+        plan = explain(cursor, query, params)
+        scans = full_scans(plan)
+        if scans and label in WHOLE_TABLE_READS:
+            echo("ok (load)  %-45s %s" % (label, ", ".join(row["table"] for row in scans)))
+        elif scans:
+            problems.append((label, scans))
+            tables = ", ".join("%s (~%s rows)" % (row["table"], row.get("rows")) for row in scans)
+            echo("FULL SCAN  %-45s %s" % (label, tables))
+        else:
+            keys = ", ".join("%s:%s" % (row.get("table"), row.get("key")) for row in plan if row.get("key"))
+            echo("ok         %-45s %s" % (label, keys))
+    return problems
+
+
+def init_app(app, pool):
+    @app.cli.command('db-explain')
+    @click.option('--strict', is_flag=True, help='Exit non-zero if any query does a full table scan.')
+    def db_explain(strict):
+        """Runs EXPLAIN on every route query and reports full table scans."""
+        with pool.checkout() as conn:
+            with conn.cursor() as cursor:
+                problems = check_route_queries(cursor, echo=click.echo)
+        click.echo("%d quer%s with full table scans" % (len(problems), "y" if len(problems) == 1 else "ies"))
+        if problems and strict:
+            raise SystemExit(1)
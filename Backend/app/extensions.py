@@ -1,3 +1,31 @@
-from flask_mysqldb import MySQL
+from app.aiodb import AsyncMySQLPool
+from app.auth import Auth
+from app.cache import Cache
+from app.counters import CounterService
+from app.db import MySQLPool
+from app.events import EventBus
+from app.highlight import CodeRenderer
+from app.leaderboard import Leaderboards
+from app.metrics import Metrics
+from app.passwords import PasswordHasher
+from app.profiler import QueryProfiler
+from app.revisions import RevisionStore
+from app.search import SearchIndex
+from app.similarity import SimilarityIndex
+from app.tags import TagIndex
 
-mysql = MySQL()
+mysql = MySQLPool()
+aio_mysql = AsyncMySQLPool()
+profiler = QueryProfiler()
+metrics = Metrics()
+auth = Auth()
+passwords = PasswordHasher()
+search_index = SearchIndex()
+cache = Cache()
+counters = CounterService()
+leaderboards = Leaderboards()
+events = EventBus()
+tag_index = TagIndex()
+code_renderer = CodeRenderer()
+revisions = RevisionStore()
+similarity_index = SimilarityIndex()
@@ -0,0 +1,338 @@
+import hashlib
+import io
+import json
+import multiprocessing
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+from pygments.formatters import HtmlFormatter
+from pygments.lexers import TextLexer, get_lexer_by_name
+from pygments.token import STANDARD_TYPES
+from pygments.util import ClassNotFound
+
+# Bump when render() output changes; `flask render-code` redoes older rows.
+RENDERER_VERSION = 1
+RENDER_MODES = ("html", "tokens", "all")
+DETECT_CHARS = 4096
+STORE_BATCH_ROWS = 50
+BACKFILL_BATCH_SIZE = 500
+BACKFILL_TABLES = (("questions", "question_id"), ("answers", "answer_id"))
+
+HTML_FORMATTER = HtmlFormatter(cssclass="highlight")
+
+# Telltale patterns per language, scored by how many match. Pygments'
+# guess_lexer() loads every lexer it has and picks obscure ones for short
+# snippets, so detection is limited to the languages people post.
+LANGUAGE_PATTERNS = [(name, [re.compile(p, re.M) for p in patterns]) for name, patterns in (
+    ("python", [r"^[ \t]*def \w+\(.*\)\s*(->.*)?:[ \t]*$", r"^[ \t]*(from [\w.]+ )?import \w+", r"^[ \t]*class \w+(\(.*\))?:",
+                r"\bself\.", r"\bprint\(", r"^[ \t]*(elif|except|with) .*:[ \t]*$", r"\b(None|True|False)\b"]),
+    ("javascript", [r"\bfunction\b", r"\b(const|let|var) \w+ =", r"=>", r"console\.log", r"\brequire\(",
+                    r"\bdocument\.", r"===", r"\bexport default\b"]),
+    ("typescript", [r"\b(const|let|function) \w+\s*(\(.*\))?:\s*(string|number|boolean|void)\b",
+                    r"\binterface \w+ \{", r"\bexport (type|interface)\b"]),
+    ("java", [r"\bpublic (static )?(final )?(class|void|int|String)\b", r"System\.out\.print", r"@Override",
+              r"\bimport java\."]),
+    ("c", [r"#include\s*<\w+\.h>", r"\bprintf\(", r"\bint main\(", r"\bmalloc\("]),
+    ("cpp", [r"#include\s*<\w+>", r"\bstd::", r"\bcout\b", r"\btemplate\s*<", r"\bint main\("]),
+    ("csharp", [r"^[ \t]*using System", r"Console\.Write", r"\bnamespace \w+", r"\bpublic (async )?Task\b"]),
+    ("go", [r"^package \w+", r"\bfunc \w*\(", r":=", r"\bfmt\."]),
+    ("rust", [r"\bfn \w+\(", r"\blet mut\b", r"\b\w+!\(", r"\bimpl\b", r"^[ \t]*use \w+::"]),
+    ("ruby", [r"^[ \t]*def \w+[^:\n]*$", r"^[ \t]*end[ \t]*$", r"\bputs\b", r"\.each do\b"]),
+    ("php", [r"<\?php", r"\$\w+\s*=", r"\becho\b"]),
+    ("sql", [r"(?i)\bselect\b.+\bfrom\b", r"(?i)\binsert into\b", r"(?i)\bcreate (table|index)\b",
+             r"(?i)^[ \t]*where\b", r"(?i)\bjoin\b.+\bon\b"]),
+    ("html", [r"<(html|div|span|body|head|p|a|ul|li)\b[^>]*>", r"</\w+>"]),
+    ("css", [r"^[ \t]*[.#]?[\w-][^{};\n]*\{[ \t]*$", r"^[ \t]*[\w-]+[ \t]*:[^;\n]+;[ \t]*$"]),
+    ("bash", [r"^#!/(usr/)?bin/(env )?(ba)?sh", r"^[ \t]*(sudo|apt(-get)?|pip|npm|cd|ls|echo|export|curl) ",
+              r"\$\{?\w+\}?"]),
+    ("json", [r"\A\s*[\{\[]", r"^[ \t]*\"[^\"]+\"\s*:"]),
+)]
+_CSS_CLASSES = {}
+
+
+def code_hash(code):
+    """The content address of a snippet: SHA-256 of its UTF-8 bytes."""
+    return hashlib.sha256(code.encode("utf-8")).digest()
+
+
+def _css_class(ttype):
+    css = _CSS_CLASSES.get(ttype)
+    if css is None:
+        base = ttype
+        while base not in STANDARD_TYPES:
+            base = base.parent
+        css = _CSS_CLASSES[ttype] = STANDARD_TYPES[base]
+    return css
+
+
+def detect_language(code):
+    """Names the Pygments lexer for the best-scoring language, or ``text``."""
+    sample = code[:DETECT_CHARS]
+    best, best_score = "text", 0
+    for name, patterns in LANGUAGE_PATTERNS:
+        score = sum(1 for pattern in patterns if pattern.search(sample))
+        if score > best_score:
+            best, best_score = name, score
+    return best
+
+
+def render(code):
+    """Returns ``(language, html, lines)`` for a snippet.
+
+    The language comes from detect_language(). ``lines``
+    has one entry per source line, each a list of ``[css_class, text]``
+    spans using the same short classes as the HTML. A plain function so the
+    backfill can run it in worker processes.
+    """
+    language = detect_language(code)
+    try:
+        lexer = get_lexer_by_name(language, stripnl=False)
+    except ClassNotFound:
+        language, lexer = "text", TextLexer(stripnl=False)
+    tokens = list(lexer.get_tokens(code))
+
+    out = io.StringIO()
+    HTML_FORMATTER.format(tokens, out)
+
+    lines = [[]]
+    for ttype, value in tokens:
+        css = _css_class(ttype)
+        for i, part in enumerate(value.split("\n")):
+            if i:
+                lines.append([])
+            if part:
+                line = lines[-1]
+                if line and line[-1][0] == css:
+                    line[-1][1] += part
+                else:
+                    line.append([css, part])
+    # The lexer ends the text with a newline, which leaves an empty last line.
+    if len(lines) > 1 and not lines[-1]:
+        lines.pop()
+    return language, out.getvalue(), lines
+
+
+class CodeRenderer:
+    """Highlights code snippets once, when they are written, and serves the results by content hash.
+
+    Renderings live in ``code_renderings`` keyed by the SHA-256 of the code,
+    so a snippet pasted into many posts is highlighted and stored once, and
+    a write whose code is already known skips Pygments entirely. Reads look
+    renderings up by hash through an in-process LRU of
+    ``CODE_RENDER_CACHE_SIZE`` entries. Snippets over
+    ``CODE_RENDER_MAX_CHARS`` are left unrendered.
+    """
+
+    def __init__(self):
+        self.max_chars = 65536
+        self.cache_size = 2048
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.rendered = 0
+        self.reused = 0
+        self.hits = 0
+        self.misses = 0
+
+    def init_app(self, app, pool):
+        app.config.setdefault('CODE_RENDER_MAX_CHARS', 65536)
+        app.config.setdefault('CODE_RENDER_CACHE_SIZE', 2048)
+        self.max_chars = app.config['CODE_RENDER_MAX_CHARS']
+        self.cache_size = app.config['CODE_RENDER_CACHE_SIZE']
+        app.extensions['code_renderer'] = self
+
+        @app.cli.command('render-code')
+        @click.option('--workers', type=int, default=os.cpu_count(), show_default=True,
+                      help='Worker processes running Pygments.')
+        @click.option('--batch-size', type=int, default=BACKFILL_BATCH_SIZE, show_default=True)
+        def render_code(workers, batch_size):
+            """Renders every question and answer snippet that has no current rendering."""
+            self.backfill(pool, workers, batch_size, click.echo)
+
+    def renderable(self, code):
+        return bool(code) and len(code) <= self.max_chars
+
+    # In-process cache
+
+    def _remember(self, digest, rendering):
+        with self._lock:
+            self._cache[digest] = rendering
+            self._cache.move_to_end(digest)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def cached(self, digests):
+        """Returns ``(found, missing)``: renderings held in process, and the digests that were not."""
+        found, missing = {}, []
+        with self._lock:
+            for digest in digests:
+                rendering = self._cache.get(digest)
+                if rendering is None:
+                    missing.append(digest)
+                else:
+                    self._cache.move_to_end(digest)
+                    found[digest] = rendering
+            self.hits += len(found)
+            self.misses += len(missing)
+        return found, missing
+
+    def load_rows(self, rows):
+        """Turns rows of renderings_query() into ``{digest: rendering}`` and caches them."""
+        found = {}
+        for digest, language, html, tokens in rows:
+            digest = bytes(digest)
+            rendering = found[digest] = {"language": language, "html": html, "lines": json.loads(tokens)}
+            self._remember(digest, rendering)
+        return found
+
+    # Writes
+
+    @staticmethod
+    def _store(cursor, renderings):
+        """Upserts ``[(digest, (language, html, lines))]`` into code_renderings."""
+        for start in range(0, len(renderings), STORE_BATCH_ROWS):
+            chunk = renderings[start:start + STORE_BATCH_ROWS]
+            cursor.execute("""
+                INSERT INTO code_renderings (code_hash, renderer_version, language, html, tokens)
+                VALUES {}
+                ON DUPLICATE KEY UPDATE
+                    renderer_version = VALUES(renderer_version),
+                    language = VALUES(language),
+                    html = VALUES(html),
+                    tokens = VALUES(tokens)
+            """.format(", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk))),
+                [value for digest, (language, html, lines) in chunk
+                 for value in (digest, RENDERER_VERSION, language, html,
+                               json.dumps(lines, separators=(",", ":")))])
+
+    def ensure(self, cursor, code):
+        """Makes sure ``code`` has a current rendering, rendering it on the caller's cursor if not.
+
+        Returns the digest, or None for code that is empty or too long to
+        render. The caller commits.
+        """
+        if not self.renderable(code):
+            return None
+        digest = code_hash(code)
+        with self._lock:
+            if digest in self._cache:
+                self.reused += 1
+                return digest
+        cursor.execute(RENDERER_VERSION_QUERY, (digest,))
+        row = cursor.fetchone()
+        if row is not None and row[0] >= RENDERER_VERSION:
+            with self._lock:
+                self.reused += 1
+            return digest
+        language, html, lines = render(code)
+        self._store(cursor, [(digest, (language, html, lines))])
+        self._remember(digest, {"language": language, "html": html, "lines": lines})
+        with self._lock:
+            self.rendered += 1
+        return digest
+
+    # Reads
+
+    def tree_digests(self, tree):
+        """Digests of the renderable snippets in a question tree."""
+        return {code_hash(item["code"]) for item in [tree["question"], *tree["answers"]]
+                if self.renderable(item.get("code"))}
+
+    def fetch(self, cursor, digests):
+        """Returns ``{digest: rendering}`` for ``digests``, reading MySQL only for those not cached."""
+        found, missing = self.cached(digests)
+        if missing:
+            cursor.execute(*renderings_query(missing))
+            found.update(self.load_rows(cursor.fetchall()))
+        return found
+
+    def with_renderings(self, tree, renderings, mode):
+        """Returns a copy of a question tree with ``code_language`` and ``code_html``
+        and/or ``code_lines`` on every item whose snippet has a rendering."""
+        def render_item(item):
+            if not self.renderable(item.get("code")):
+                return item
+            rendering = renderings.get(code_hash(item["code"]))
+            if rendering is None:
+                return item
+            item = dict(item, code_language=rendering["language"])
+            if mode in ("html", "all"):
+                item["code_html"] = rendering["html"]
+            if mode in ("tokens", "all"):
+                item["code_lines"] = rendering["lines"]
+            return item
+
+        return dict(tree, question=render_item(tree["question"]),
+                    answers=[render_item(answer) for answer in tree["answers"]])
+
+    # Backfill
+
+    def backfill(self, pool, workers, batch_size, echo):
+        """Renders stored snippets lacking a current rendering, ``workers`` processes at a time."""
+        started = time.perf_counter()
+        total = rendered = 0
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            for table, key in BACKFILL_TABLES:
+                after = 0
+                while True:
+                    with pool.checkout() as conn:
+                        with conn.cursor() as cursor:
+                            cursor.execute(backfill_query(table, key), (after, batch_size))
+                            rows = cursor.fetchall()
+                            if not rows:
+                                break
+                            after = rows[-1][0]
+                            snippets = {code_hash(code): code for _, code in rows if self.renderable(code)}
+                            current = set()
+                            if snippets:
+                                cursor.execute(*renderings_query(list(snippets), columns="code_hash",
+                                                                 min_version=RENDERER_VERSION))
+                                current = {bytes(row[0]) for row in cursor.fetchall()}
+                    todo = [(digest, code) for digest, code in snippets.items() if digest not in current]
+                    results = list(executor.map(render, [code for _, code in todo], chunksize=8))
+                    if results:
+                        with pool.checkout() as conn:
+                            with conn.cursor() as cursor:
+                                self._store(cursor, [(digest, result) for (digest, _), result in zip(todo, results)])
+                            conn.commit()
+                    total += len(rows)
+                    rendered += len(results)
+                    echo("%s: checked %d snippets, rendered %d (%.0f snippets/s)" % (
+                        table, total, rendered, total / (time.perf_counter() - started)))
+        echo("Rendered %d of %d snippets in %.1f s" % (rendered, total, time.perf_counter() - started))
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "rendered": self.rendered,
+                "reused": self.reused,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._cache),
+            }
+
+
+RENDERER_VERSION_QUERY = "SELECT renderer_version FROM code_renderings WHERE code_hash = %s"
+
+
+def backfill_query(table, key):
+    """Builds the query reading one batch of stored snippets for `flask render-code`."""
+    return ("SELECT {0}, code FROM {1} WHERE {0} > %s AND code IS NOT NULL AND code <> '' "
+            "ORDER BY {0} LIMIT %s".format(key, table))
+
+
+def renderings_query(digests, columns="code_hash, language, html, tokens", min_version=None):
+    """Builds the query fetching renderings by digest, for the sync and async read paths."""
+    query = "SELECT {} FROM code_renderings WHERE code_hash IN ({})".format(
+        columns, ", ".join(["%s"] * len(digests)))
+    params = list(digests)
+    if min_version is not None:
+        query += " AND renderer_version >= %s"
+        params.append(min_version)
+    return query, params
@@ -0,0 +1,259 @@
+import math
+import threading
+import time
+from bisect import bisect_left, insort
+
+import click
+
+from app.reload import DEFAULT_RELOAD_INTERVAL, Reloader
+
+# Trending scores add one order of magnitude of score per DECAY_SECONDS of
+# age, so newer posts need exponentially fewer votes to rank equally and
+# existing scores never have to be recomputed as time passes.
+TRENDING_EPOCH = 1704067200  # 2024-01-01T00:00:00Z
+TRENDING_DECAY_SECONDS = 45000
+VIEWS_PER_VOTE = 50
+
+
+def trending_score(upvotes, views, created_at):
+    score = upvotes + views / VIEWS_PER_VOTE
+    order = math.log10(max(abs(score), 1))
+    sign = 1 if score > 0 else -1 if score < 0 else 0
+    return round(sign * order + (created_at - TRENDING_EPOCH) / TRENDING_DECAY_SECONDS, 7)
+
+
+class SortedKeys:
+    """A sorted collection of unique keys stored as a list of bounded chunks.
+
+    Inserts and removals touch one chunk, so they stay cheap with millions of
+    keys, and the smallest ``k`` keys are read in O(k).
+    """
+
+    def __init__(self, load=512):
+        self.load = load
+        self._chunks = []
+        self._maxes = []
+        self._len = 0
+
+    def __len__(self):
+        return self._len
+
+    def load_sorted(self, keys):
+        self._chunks = [keys[i:i + self.load] for i in range(0, len(keys), self.load)]
+        self._maxes = [chunk[-1] for chunk in self._chunks]
+        self._len = len(keys)
+
+    def add(self, key):
+        if not self._chunks:
+            self._chunks.append([key])
+            self._maxes.append(key)
+        else:
+            i = bisect_left(self._maxes, key)
+            if i == len(self._maxes):
+                i -= 1
+                chunk = self._chunks[i]
+                chunk.append(key)
+                self._maxes[i] = key
+            else:
+                chunk = self._chunks[i]
+                insort(chunk, key)
+            if len(chunk) > 2 * self.load:
+                self._chunks[i:i + 1] = [chunk[:self.load], chunk[self.load:]]
+                self._maxes[i:i + 1] = [chunk[self.load - 1], chunk[-1]]
+        self._len += 1
+
+    def remove(self, key):
+        i = bisect_left(self._maxes, key)
+        if i == len(self._maxes):
+            raise KeyError(key)
+        chunk = self._chunks[i]
+        j = bisect_left(chunk, key)
+        if j == len(chunk) or chunk[j] != key:
+            raise KeyError(key)
+        del chunk[j]
+        if chunk:
+            self._maxes[i] = chunk[-1]
+        else:
+            del self._chunks[i]
+            del self._maxes[i]
+        self._len -= 1
+
+    def first(self, k):
+        result = []
+        for chunk in self._chunks:
+            result.extend(chunk[:k - len(result)])
+            if len(result) >= k:
+                break
+        return result
+
+
+class _Entry:
+    __slots__ = ("upvotes", "views", "created_at", "tags")
+
+    def __init__(self, upvotes, views, created_at, tags):
+        self.upvotes = upvotes
+        self.views = views
+        self.created_at = created_at
+        self.tags = tuple(tags)
+
+
+class Leaderboards:
+    """All-time, trending and per-tag question rankings kept in memory.
+
+    Every change to a question's votes or views moves its keys in each board
+    it belongs to, so reading the top ``k`` never scans the questions table.
+    ``ensure_built()`` reloads the boards every ``INDEX_RELOAD_INTERVAL``
+    seconds to pick up other workers' changes.
+    """
+
+    def __init__(self):
+        self.built = False
+        self.reloader = Reloader()
+        self._lock = threading.Lock()
+        self._entries = {}
+        self._all_time = SortedKeys()
+        self._trending = SortedKeys()
+        self._by_tag = {}
+
+    def init_app(self, app, pool, counters):
+        app.config.setdefault('INDEX_RELOAD_INTERVAL', DEFAULT_RELOAD_INTERVAL)
+        self.reloader.interval = app.config['INDEX_RELOAD_INTERVAL']
+        app.extensions['leaderboards'] = self
+
+        @app.cli.command('rebuild-leaderboards')
+        def rebuild_leaderboards():
+            """Rebuilds the question leaderboards from MySQL."""
+            with pool.checkout() as conn:
+                with conn.cursor() as cursor:
+                    count = self.rebuild(cursor, counters.pending())
+            click.echo("Ranked %d questions" % count)
+
+    @staticmethod
+    def _all_time_key(question_id, entry):
+        return (-entry.upvotes, -entry.views, -question_id)
+
+    @staticmethod
+    def _trending_key(question_id, entry):
+        return (-trending_score(entry.upvotes, entry.views, entry.created_at), -question_id)
+
+    def ensure_built(self, cursor, pending):
+        """Builds the boards if due, with ``pending()`` returning the counter deltas not yet flushed."""
+        self.reloader.ensure(lambda: self.rebuild(cursor, pending()))
+
+    def rebuild(self, cursor, pending=None):
+        """Reloads every board from MySQL, adding ``(views, votes, _)`` not yet flushed."""
+        cursor.execute("""
+            SELECT question_id, COALESCE(upvotes, 0), COALESCE(views, 0), UNIX_TIMESTAMP(created_at)
+            FROM questions
+        """)
+        entries = {row[0]: _Entry(row[1], row[2], float(row[3] or 0), ()) for row in cursor.fetchall()}
+
+        cursor.execute("""
+            SELECT qt.question_id, t.tag_name
+            FROM question_tags qt
+            JOIN tags t ON qt.tag_id = t.tag_id
+        """)
+        for question_id, tag_name in cursor.fetchall():
+            entry = entries.get(question_id)
+            if entry is not None:
+                entry.tags += (tag_name,)
+
+        if pending:
+            views, votes = pending[0], pending[1]
+            for question_id, entry in entries.items():
+                entry.views += views.get(question_id, 0)
+                entry.upvotes += votes.get(question_id, 0)
+
+        all_time = SortedKeys()
+        all_time.load_sorted(sorted(self._all_time_key(qid, e) for qid, e in entries.items()))
+        trending = SortedKeys()
+        trending.load_sorted(sorted(self._trending_key(qid, e) for qid, e in entries.items()))
+        tagged = {}
+        for question_id, entry in entries.items():
+            for tag in entry.tags:
+                tagged.setdefault(tag, []).append(self._all_time_key(question_id, entry))
+        by_tag = {}
+        for tag, keys in tagged.items():
+            by_tag[tag] = SortedKeys()
+            by_tag[tag].load_sorted(sorted(keys))
+
+        with self._lock:
+            self._entries = entries
+            self._all_time = all_time
+            self._trending = trending
+            self._by_tag = by_tag
+            self.built = True
+        return len(entries)
+
+    def _unlink(self, question_id, entry):
+        self._all_time.remove(self._all_time_key(question_id, entry))
+        self._trending.remove(self._trending_key(question_id, entry))
+        for tag in entry.tags:
+            board = self._by_tag[tag]
+            board.remove(self._all_time_key(question_id, entry))
+            if not board:
+                del self._by_tag[tag]
+
+    def _link(self, question_id, entry):
+        self._all_time.add(self._all_time_key(question_id, entry))
+        self._trending.add(self._trending_key(question_id, entry))
+        for tag in entry.tags:
+            self._by_tag.setdefault(tag, SortedKeys()).add(self._all_time_key(question_id, entry))
+
+    def add_question(self, question_id, created_at=None, tags=()):
+        with self._lock:
+            if question_id in self._entries:
+                return
+            entry = _Entry(0, 0, time.time() if created_at is None else created_at, tags)
+            self._entries[question_id] = entry
+            self._link(question_id, entry)
+
+    def remove_question(self, question_id):
+        with self._lock:
+            entry = self._entries.pop(question_id, None)
+            if entry is not None:
+                self._unlink(question_id, entry)
+
+    def set_tags(self, question_id, tags):
+        with self._lock:
+            entry = self._entries.get(question_id)
+            if entry is not None:
+                self._unlink(question_id, entry)
+                entry.tags = tuple(tags)
+                self._link(question_id, entry)
+
+    def record(self, question_id, votes=0, views=0):
+        """Applies a vote and/or view delta to a question."""
+        with self._lock:
+            entry = self._entries.get(question_id)
+            if entry is None:
+                return
+            self._unlink(question_id, entry)
+            entry.upvotes += votes
+            entry.views += views
+            self._link(question_id, entry)
+
+    def _rows(self, keys, id_index):
+        rows = []
+        for key in keys:
+            question_id = -key[id_index]
+            entry = self._entries[question_id]
+            rows.append({"question_id": question_id, "upvotes": entry.upvotes, "views": entry.views})
+        return rows
+
+    def top(self, k):
+        with self._lock:
+            return self._rows(self._all_time.first(k), 2)
+
+    def trending(self, k):
+        with self._lock:
+            rows = self._rows(self._trending.first(k), 1)
+            for row in rows:
+                entry = self._entries[row["question_id"]]
+                row["score"] = trending_score(entry.upvotes, entry.views, entry.created_at)
+            return rows
+
+    def top_for_tag(self, tag, k):
+        with self._lock:
+            board = self._by_tag.get(tag)
+            return self._rows(board.first(k), 2) if board else []
@@ -0,0 +1,235 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, request
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+JSON_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25)
+SHARD_COUNT = 16
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _histogram(buckets):
+    # One count per bucket, one for +Inf, then the running sum.
+    return [0] * (len(buckets) + 1) + [0.0]
+
+
+class _Shard:
+    """One stripe of the request metrics; threads are spread over the stripes by native id."""
+
+    __slots__ = ("lock", "requests", "latency", "in_flight", "json")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = {}
+        self.latency = {}
+        self.in_flight = {}
+        self.json = _histogram(JSON_BUCKETS)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(names, values):
+    if not names:
+        return ""
+    return "{%s}" % ",".join('%s="%s"' % (name, _escape(value)) for name, value in zip(names, values))
+
+
+def _format_value(value):
+    if isinstance(value, float):
+        return repr(value) if value == value else "NaN"
+    return str(value)
+
+
+class Metrics:
+    """Prometheus text-format metrics for the Flask app, served at ``METRICS_PATH``.
+
+    Request counters, latency histograms, in-flight gauges and JSON encoding
+    time are kept in ``SHARD_COUNT`` stripes, each with its own lock, so
+    concurrent requests almost never wait on each other; a scrape sums the
+    stripes. Pool and cache figures are read from their own stats when
+    scraped, so they cost nothing per request.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self._shards = [_Shard() for _ in range(SHARD_COUNT)]
+        self._collectors = []
+
+    def init_app(self, app, mysql=None, cache=None, auth=None):
+        app.config.setdefault('METRICS_ENABLED', True)
+        app.config.setdefault('METRICS_PATH', '/metrics')
+        app.extensions['metrics'] = self
+        self.enabled = app.config['METRICS_ENABLED']
+        if not self.enabled:
+            return
+
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._teardown)
+        app.add_url_rule(app.config['METRICS_PATH'], 'metrics', self.render_response)
+        if hasattr(app.json, 'timer'):
+            app.json.timer = self.observe_json
+
+        if mysql is not None:
+            self.collector(lambda: self._pool_samples(mysql.status()))
+        if cache is not None:
+            self.collector(lambda: self._cache_samples("cache", "Response cache", cache.stats()))
+        if auth is not None:
+            self.collector(lambda: self._cache_samples("auth_token_cache", "Verified token cache", auth.stats()))
+
+    def collector(self, fn):
+        """Registers ``fn() -> [(name, type, help, labelnames, [(labelvalues, value)])]``, called per scrape."""
+        self._collectors.append(fn)
+        return fn
+
+    def _shard(self):
+        return self._shards[threading.get_native_id() % SHARD_COUNT]
+
+    # Request hooks
+
+    def _start(self):
+        # The request proxy is resolved once per hook; its attributes are then plain lookups.
+        req = request._get_current_object()
+        route = req.endpoint or "<unmatched>"
+        shard = self._shard()
+        with shard.lock:
+            shard.in_flight[route] = shard.in_flight.get(route, 0) + 1
+        req.environ['metrics.request'] = (shard, route, time.perf_counter())
+
+    def _finish(self, response):
+        req = request._get_current_object()
+        started = req.environ.get('metrics.request')
+        if started is None:
+            return response
+        shard, route, began = started
+        elapsed = time.perf_counter() - began
+        key = (route, req.method, response.status_code)
+        index = bisect_left(LATENCY_BUCKETS, elapsed)
+        with shard.lock:
+            shard.requests[key] = shard.requests.get(key, 0) + 1
+            histogram = shard.latency.get(key[:2])
+            if histogram is None:
+                histogram = shard.latency[key[:2]] = _histogram(LATENCY_BUCKETS)
+            histogram[index] += 1
+            histogram[-1] += elapsed
+        return response
+
+    def _teardown(self, exception):
+        started = request.environ.pop('metrics.request', None)
+        if started is not None:
+            shard, route, _ = started
+            with shard.lock:
+                shard.in_flight[route] -= 1
+
+    def observe_json(self, seconds):
+        index = bisect_left(JSON_BUCKETS, seconds)
+        shard = self._shard()
+        with shard.lock:
+            shard.json[index] += 1
+            shard.json[-1] += seconds
+
+    # Exposition
+
+    def _merged(self):
+        requests, latency, in_flight = {}, {}, {}
+        json_histogram = _histogram(JSON_BUCKETS)
+        for shard in self._shards:
+            with shard.lock:
+                for key, count in shard.requests.items():
+                    requests[key] = requests.get(key, 0) + count
+                for key, histogram in shard.latency.items():
+                    total = latency.setdefault(key, _histogram(LATENCY_BUCKETS))
+                    for i, value in enumerate(histogram):
+                        total[i] += value
+                for route, count in shard.in_flight.items():
+                    in_flight[route] = in_flight.get(route, 0) + count
+                for i, value in enumerate(shard.json):
+                    json_histogram[i] += value
+        return requests, latency, in_flight, json_histogram
+
+    @staticmethod
+    def _pool_samples(status):
+        return [
+            ("db_pool_size", "gauge", "Maximum connections in the MySQL pool.", (), [((), status["size"])]),
+            ("db_pool_connections", "gauge", "MySQL pool connections by state.", ("state",),
+             [(("open",), status["open"]), (("in_use",), status["in_use"]), (("idle",), status["idle"])]),
+            ("db_pool_checkouts_total", "counter", "Connections handed out by the pool.", (),
+             [((), status["checkouts"])]),
+            ("db_pool_connections_created_total", "counter", "Connections opened by the pool.", (),
+             [((), status["created"])]),
+            ("db_pool_connections_discarded_total", "counter", "Connections closed as broken or stale.", (),
+             [((), status["discarded"])]),
+            ("db_pool_exhausted_total", "counter", "Checkouts that timed out waiting for a connection.", (),
+             [((), status["exhausted"])]),
+            ("db_pool_wait_seconds_total", "counter", "Time spent waiting for a pool connection.", (),
+             [((), status["wait_time_total"])]),
+        ]
+
+    @staticmethod
+    def _cache_samples(prefix, description, stats):
+        return [
+            ("%s_requests_total" % prefix, "counter", "%s lookups by result." % description, ("result",),
+             [(("hit",), stats["hits"]), (("miss",), stats["misses"])]),
+            ("%s_hit_ratio" % prefix, "gauge", "%s hits over lookups since start." % description, (),
+             [((), stats["hit_ratio"])]),
+            ("%s_entries" % prefix, "gauge", "Entries held in the %s." % description.lower(), (),
+             [((), stats["entries"])]),
+        ]
+
+    @staticmethod
+    def _histogram_lines(name, buckets, labelnames, labelvalues, histogram):
+        lines = []
+        cumulative = 0
+        for bound, count in zip(buckets + (float("inf"),), histogram):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(bound)
+            lines.append("%s_bucket%s %d" % (name, _labels(labelnames + ("le",), labelvalues + (le,)), cumulative))
+        lines.append("%s_sum%s %s" % (name, _labels(labelnames, labelvalues), repr(histogram[-1])))
+        lines.append("%s_count%s %d" % (name, _labels(labelnames, labelvalues), cumulative))
+        return lines
+
+    def render(self):
+        requests, latency, in_flight, json_histogram = self._merged()
+        lines = [
+            "# HELP http_requests_total Requests handled, by route, method and status.",
+            "# TYPE http_requests_total counter",
+        ]
+        for (route, method, status), count in sorted(requests.items()):
+            lines.append("http_requests_total%s %d" % (
+                _labels(("route", "method", "status"), (route, method, status)), count))
+
+        lines += [
+            "# HELP http_request_duration_seconds Time from routing to the response leaving the app.",
+            "# TYPE http_request_duration_seconds histogram",
+        ]
+        for (route, method), histogram in sorted(latency.items()):
+            lines += self._histogram_lines("http_request_duration_seconds", LATENCY_BUCKETS,
+                                           ("route", "method"), (route, method), histogram)
+
+        lines += [
+            "# HELP http_requests_in_flight Requests currently being handled, by route.",
+            "# TYPE http_requests_in_flight gauge",
+        ]
+        for route, count in sorted(in_flight.items()):
+            lines.append("http_requests_in_flight%s %d" % (_labels(("route",), (route,)), count))
+
+        lines += [
+            "# HELP json_serialization_seconds Time spent encoding JSON responses.",
+            "# TYPE json_serialization_seconds histogram",
+        ]
+        lines += self._histogram_lines("json_serialization_seconds", JSON_BUCKETS, (), (), json_histogram)
+
+        for collect in self._collectors:
+            for name, kind, description, labelnames, samples in collect():
+                lines.append("# HELP %s %s" % (name, description))
+                lines.append("# TYPE %s %s" % (name, kind))
+                for labelvalues, value in samples:
+                    lines.append("%s%s %s" % (name, _labels(labelnames, labelvalues), _format_value(value)))
+        return "\n".join(lines) + "\n"
+
+    def render_response(self):
+        return Response(self.render(), content_type=CONTENT_TYPE)
@@ -0,0 +1,153 @@
+import hashlib
+import os
+import re
+
+import click
+
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "migrations")
+MIGRATION_FILE_RE = re.compile(r"^(\d+)_(\w+)\.sql$")
+
+
+class MigrationError(Exception):
+    """Raised when applied migrations do not match the files on disk."""
+
+
+class Migration:
+    __slots__ = ("version", "name", "path", "sql", "checksum")
+
+    def __init__(self, version, name, path):
+        self.version = version
+        self.name = name
+        self.path = path
+        with open(path) as f:
+            self.sql = f.read()
+        self.checksum = hashlib.sha256(self.sql.encode()).hexdigest()
+
+    def statements(self):
+        """Splits the file into statements on semicolons that end a line."""
+        lines = [line for line in self.sql.splitlines() if not line.lstrip().startswith("--")]
+        return [s.strip() for s in re.split(r";\s*$", "\n".join(lines), flags=re.M) if s.strip()]
+
+
+def discover(directory=MIGRATIONS_DIR):
+    migrations = []
+    for filename in sorted(os.listdir(directory)):
+        match = MIGRATION_FILE_RE.match(filename)
+        if match:
+            migrations.append(Migration(int(match.group(1)), match.group(2), os.path.join(directory, filename)))
+    versions = [m.version for m in migrations]
+    if len(versions) != len(set(versions)):
+        raise MigrationError("Duplicate migration versions in %s" % directory)
+    return migrations
+
+
+class MigrationRunner:
+    """Applies the numbered SQL files in ``Backend/migrations`` in order.
+
+    Applied versions are recorded in ``schema_migrations`` together with a
+    checksum of the file, so an edited migration is reported instead of
+    silently diverging. MySQL commits DDL implicitly, so a migration that
+    fails part-way must be repaired by hand before re-running.
+
+    A database created from "DB Project/DB Schema and Sample data.sql"
+    already has the tables; ``baseline()`` records the migrations that file
+    includes as applied without running them.
+    """
+
+    def __init__(self, conn, directory=MIGRATIONS_DIR):
+        self.conn = conn
+        self.directory = directory
+
+    def _ensure_table(self, cursor):
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INT PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                checksum CHAR(64) NOT NULL,
+                applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+
+    def applied(self):
+        with self.conn.cursor() as cursor:
+            self._ensure_table(cursor)
+            cursor.execute("SELECT version, checksum FROM schema_migrations ORDER BY version")
+            return dict(cursor.fetchall())
+
+    def status(self):
+        """Returns ``(migration, state)`` pairs, state being applied, pending or modified."""
+        applied = self.applied()
+        result = []
+        for migration in discover(self.directory):
+            if migration.version not in applied:
+                state = "pending"
+            elif applied[migration.version] != migration.checksum:
+                state = "modified"
+            else:
+                state = "applied"
+            result.append((migration, state))
+        return result
+
+    def migrate(self, target=None, echo=print):
+        """Applies pending migrations up to ``target`` and returns how many ran."""
+        status = self.status()
+        modified = [m.version for m, state in status if state == "modified"]
+        if modified:
+            raise MigrationError("Applied migrations changed on disk: %s" % ", ".join(map(str, modified)))
+
+        count = 0
+        for migration, state in status:
+            if state != "pending" or (target is not None and migration.version > target):
+                continue
+            echo("Applying %04d_%s" % (migration.version, migration.name))
+            with self.conn.cursor() as cursor:
+                for statement in migration.statements():
+                    cursor.execute(statement)
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (migration.version, migration.name, migration.checksum),
+                )
+            self.conn.commit()
+            count += 1
+        return count
+
+
+    def baseline(self, version, echo=print):
+        """Records pending migrations up to ``version`` as applied without running them."""
+        count = 0
+        for migration, state in self.status():
+            if state != "pending" or migration.version > version:
+                continue
+            echo("Baselining %04d_%s" % (migration.version, migration.name))
+            with self.conn.cursor() as cursor:
+                cursor.execute(
+                    "INSERT INTO schema_migrations (version, name, checksum) VALUES (%s, %s, %s)",
+                    (migration.version, migration.name, migration.checksum),
+                )
+            count += 1
+        self.conn.commit()
+        return count
+
+
+def init_app(app, pool):
+    @app.cli.command('db-migrate')
+    @click.option('--target', type=int, default=None, help='Stop after this version.')
+    @click.option('--baseline', type=int, default=None,
+                  help='Mark migrations up to this version as applied without running them, '
+                       'for a database created from the DB Project schema file.')
+    def db_migrate(target, baseline):
+        """Applies pending schema migrations."""
+        with pool.checkout() as conn:
+            runner = MigrationRunner(conn)
+            if baseline is not None:
+                click.echo("Baselined %d migration(s)" % runner.baseline(baseline, echo=click.echo))
+            count = runner.migrate(target, echo=click.echo)
+        click.echo("Applied %d migration(s)" % count)
+
+    @app.cli.command('db-status')
+    def db_status():
+        """Lists schema migrations and whether they are applied."""
+        with pool.checkout() as conn:
+            for migration, state in MigrationRunner(conn).status():
+                click.echo("%04d_%-30s %s" % (migration.version, migration.name, state))
+
@@ -1,65 +1,401 @@
+from app import question_stats
 from app.extensions import mysql
-from werkzeug.security import generate_password_hash
+from app.rows import RowMapper
 from datetime import datetime
 
+TOP_QUESTIONS_LIMIT = 10
+
+USER_CREDENTIALS_ROW = RowMapper(("user_id", "username", "email", "password_hash"))
+USER_ROW = RowMapper(("user_id", "username", "email", "created_at"), dates=("created_at",))
+QUESTION_SUMMARY_ROW = RowMapper(("question_id", "title", "body", "views", "upvotes", "author"))
+QUESTION_ROW = RowMapper(("question_id", "title", "body", "code", "created_at", "updated_at",
+                          "views", "upvotes", "asked_by"), dates=("created_at", "updated_at"))
+ANSWER_ROW = RowMapper(("answer_id", "body", "code", "created_at", "updated_at", "upvotes", "asked_by"),
+                       dates=("created_at", "updated_at"))
+COMMENT_ROW = RowMapper(("comment_id", "parent_type", "parent_id", "body", "created_at", "updated_at",
+                         "posted_by"), dates=("created_at", "updated_at"))
+QUESTION_COMMENT_ROW = RowMapper(("comment_id", "parent_type", "parent_id", "body", "created_at", "updated_at",
+                                  "commented_by"), dates=("created_at", "updated_at"))
+TAG_ROW = RowMapper(("tag_id", "tag_name"))
+
 def register_user(username, email, password_hash):
     """Registers a new user in the database."""
-    cursor = mysql.connection.cursor()
-    cursor.execute("USE questionanswerplatform") 
-
-    
     created_at = datetime.utcnow().isoformat()
 
     query = """
         INSERT INTO users (username, email, password_hash, created_at)
         VALUES (%s, %s, %s, %s)
     """
-    cursor.execute(query, (username, email, password_hash, created_at))
-    mysql.connection.commit()
-    user_id = cursor.lastrowid  
-    cursor.close()
-    
+    with mysql.cursor() as cursor:
+        cursor.execute(query, (username, email, password_hash, created_at))
+        mysql.connection.commit()
+        user_id = cursor.lastrowid
+
     return user_id
 
+USER_BY_EMAIL_QUERY = "SELECT user_id, username, email, password_hash FROM users WHERE email = %s"
+USER_BY_ID_QUERY = "SELECT user_id, username, email, created_at FROM users WHERE user_id = %s"
+
+def users_by_ids_query(count):
+    return "SELECT user_id, username, email, created_at FROM users WHERE user_id IN ({})".format(
+        ", ".join(["%s"] * count))
+
 def get_user_by_email(email):
     """Fetches user details by email."""
-    cursor = mysql.connection.cursor()
-    cursor.execute("USE questionanswerplatform")  
+    with mysql.cursor() as cursor:
+        cursor.execute(USER_BY_EMAIL_QUERY, (email,))
+        user = cursor.fetchone()
+    return USER_CREDENTIALS_ROW(user) if user else None
 
-    query = "SELECT user_id, username, email, password_hash FROM users WHERE email = %s"
-    cursor.execute(query, (email,))
-    user = cursor.fetchone()
-    cursor.close()
-    return user
+def update_password_hash(user_id, password_hash):
+    """Replaces a user's stored password hash."""
+    with mysql.cursor() as cursor:
+        cursor.execute("UPDATE users SET password_hash = %s WHERE user_id = %s", (password_hash, user_id))
+        mysql.connection.commit()
 
 def get_user_by_id(user_id):
     """Fetches user details by ID."""
-    cursor = mysql.connection.cursor()
-    cursor.execute("USE questionanswerplatform")  
+    with mysql.cursor() as cursor:
+        cursor.execute(USER_BY_ID_QUERY, (user_id,))
+        user = cursor.fetchone()
+    return USER_ROW(user) if user else None
 
-    query = "SELECT user_id, username, email FROM users WHERE user_id = %s"
-    cursor.execute(query, (user_id,))
-    user = cursor.fetchone()
-    cursor.close()
-    return {"user_id": user[0], "username": user[1], "email": user[2]} if user else None
+def get_users_by_ids(user_ids):
+    """Fetches several users in one query, keyed by user_id."""
+    if not user_ids:
+        return {}
+    with mysql.cursor() as cursor:
+        cursor.execute(users_by_ids_query(len(user_ids)), list(user_ids))
+        users = cursor.fetchall()
+    return {u[0]: USER_ROW(u) for u in users}
 
-def get_top_questions():
-    """Fetches the top questions based on views and upvotes."""
-    cursor = mysql.connection.cursor()
-    cursor.execute("USE questionanswerplatform") 
+QUESTION_QUERY = """
+    SELECT q.question_id, q.title, q.body, q.code, q.created_at, q.updated_at,
+           q.views, q.upvotes, u.username
+    FROM questions q
+    LEFT JOIN users u ON q.user_id = u.user_id
+    WHERE q.question_id = %s
+"""
 
+QUESTION_ANSWERS_QUERY = """
+    SELECT a.answer_id, a.body, a.code, a.created_at, a.updated_at, a.upvotes, u.username
+    FROM answers a
+    LEFT JOIN users u ON a.user_id = u.user_id
+    WHERE a.question_id = %s
+    ORDER BY a.answer_id
+"""
+
+def question_tree_comments_query(answer_count):
+    """Builds the query for comments on a question and on ``answer_count`` of its answers."""
     query = """
+        SELECT c.comment_id, c.parent_type, c.parent_id, c.body, c.created_at, c.updated_at, u.username
+        FROM comments c
+        LEFT JOIN users u ON c.user_id = u.user_id
+        WHERE (c.parent_type = 'question' AND c.parent_id = %s)
+    """
+    if answer_count:
+        query += " OR (c.parent_type = 'answer' AND c.parent_id IN ({}))".format(", ".join(["%s"] * answer_count))
+    return query + " ORDER BY c.comment_id"
+
+def get_question_tree(question_id):
+    """Fetches a question with its answers and comments using three flat queries.
+
+    Returns None if the question does not exist. Comments on the question and
+    on every answer are loaded in one query and attached by parent id.
+    """
+    with mysql.cursor() as cursor:
+        cursor.execute(QUESTION_QUERY, (question_id,))
+        row = cursor.fetchone()
+        if not row:
+            return None
+
+        cursor.execute(QUESTION_ANSWERS_QUERY, (question_id,))
+        answer_rows = cursor.fetchall()
+        cursor.execute(question_tree_comments_query(len(answer_rows)), [question_id, *[a[0] for a in answer_rows]])
+        comment_rows = cursor.fetchall()
+
+    return build_question_tree(row, answer_rows, comment_rows)
+
+def build_question_tree(row, answer_rows, comment_rows):
+    """Assembles the rows of the three question tree queries into one document."""
+    question = QUESTION_ROW(row)
+
+    answers = {}
+    for row in answer_rows:
+        answer = answers[row[0]] = ANSWER_ROW(row)
+        answer["comments"] = []
+
+    comments = []
+    for row in comment_rows:
+        comment = COMMENT_ROW(row)
+        if row[1] == 'answer':
+            answers[row[2]]["comments"].append(comment)
+        else:
+            comments.append(comment)
+
+    return {"question": question, "answers": list(answers.values()), "comments": comments}
+
+TAGS_QUERY = "SELECT tag_id, tag_name FROM tags"
+
+def list_tags():
+    """Fetches every tag."""
+    with mysql.cursor() as cursor:
+        cursor.execute(TAGS_QUERY)
+        results = cursor.fetchall()
+    return tags_from_rows(results)
+
+def tags_from_rows(rows):
+    return TAG_ROW.many(rows)
+
+QUESTION_COMMENTS_QUERY = """
+    SELECT c.comment_id, c.parent_type, c.parent_id, c.body, c.created_at, c.updated_at,
+           u.username AS commented_by
+    FROM comments c
+    JOIN users u ON c.user_id = u.user_id
+    WHERE c.parent_type = 'question' AND c.parent_id = %s
+"""
+
+def get_question_comments(question_id):
+    """Fetches the comments posted directly on a question."""
+    with mysql.cursor() as cursor:
+        cursor.execute(QUESTION_COMMENTS_QUERY, (question_id,))
+        results = cursor.fetchall()
+    return question_comments_from_rows(results)
+
+def question_comments_from_rows(rows):
+    return QUESTION_COMMENT_ROW.many(rows)
+
+QUESTION_VERSION_QUERY = """
+    SELECT q.updated_at, a.n, a.last_updated, c.n, c.last_updated, q.upvotes, a.votes
+    FROM questions q
+    CROSS JOIN (
+        SELECT COUNT(*) AS n, MAX(updated_at) AS last_updated, SUM(upvotes) AS votes
+        FROM answers WHERE question_id = %s
+    ) a
+    CROSS JOIN (
+        SELECT COUNT(*) AS n, MAX(updated_at) AS last_updated
+        FROM (
+            SELECT updated_at FROM comments
+            WHERE parent_type = 'question' AND parent_id = %s
+            UNION ALL
+            SELECT c.updated_at FROM comments c
+            JOIN answers ans ON c.parent_type = 'answer' AND c.parent_id = ans.answer_id
+            WHERE ans.question_id = %s
+        ) t
+    ) c
+    WHERE q.question_id = %s
+"""
+
+def get_question_version(question_id):
+    """Fetches counts and the latest updated_at across a question, its answers and comments,
+    plus the vote counts, which change without touching updated_at. Views are
+    left out: counting a view would otherwise change the ETag it was served with.
+
+    Returns ``(parts, last_modified)`` for conditional GETs, or None if the
+    question does not exist.
+    """
+    with mysql.cursor() as cursor:
+        cursor.execute(QUESTION_VERSION_QUERY, (question_id,) * 4)
+        row = cursor.fetchone()
+    return question_version_from_row(row)
+
+def question_version_from_row(row):
+    if not row:
+        return None
+    last_modified = max(value for value in (row[0], row[2], row[4]) if value is not None)
+    return row, last_modified
+
+QUESTIONS_VERSION_QUERY = """
+    SELECT COUNT(*), MAX(question_id), MAX(updated_at),
+           -- Its own scan, of idx_questions_top, so the outer one stays on idx_questions_updated.
+           (SELECT SUM(upvotes) FROM questions),
+           (SELECT MAX(last_activity_at) FROM question_stats)
+    FROM questions
+"""
+
+def get_questions_version():
+    """Fetches the row count, highest id, latest updated_at and total upvotes of the
+    questions table, plus the latest activity in question_stats, which list rows also show.
+
+    Vote flushes leave updated_at alone, so the upvote total stands in for them;
+    views are left out like in get_question_version()."""
+    with mysql.cursor() as cursor:
+        cursor.execute(QUESTIONS_VERSION_QUERY)
+        row = cursor.fetchone()
+    return questions_version_from_row(row)
+
+def questions_version_from_row(row):
+    return row, max((value for value in (row[2], row[4]) if value is not None), default=None)
+
+TAGS_VERSION_QUERY = "SELECT COUNT(*), MAX(tag_id) FROM tags"
+
+def get_tags_version():
+    """Fetches the row count and highest id of the tags table."""
+    with mysql.cursor() as cursor:
+        cursor.execute(TAGS_VERSION_QUERY)
+        row = cursor.fetchone()
+    return row, None
+
+def questions_by_ids_query(count):
+    return """
     SELECT Q.question_id, Q.title, Q.body, Q.views, Q.upvotes, U.username AS author
     FROM questions Q
     JOIN users U ON Q.user_id = U.user_id
-    ORDER BY Q.upvotes DESC, Q.views DESC
-    LIMIT 10
+    WHERE Q.question_id IN ({})
+    """.format(", ".join(["%s"] * count))
+
+def get_questions_by_ids(question_ids):
+    """Fetches question summaries (QUESTION_SUMMARY_ROW) for leaderboard ids."""
+    if not question_ids:
+        return []
+    with mysql.cursor() as cursor:
+        cursor.execute(questions_by_ids_query(len(question_ids)), list(question_ids))
+        questions = cursor.fetchall()
+    return QUESTION_SUMMARY_ROW.many(questions)
+
+VOTE_TARGET_QUERIES = {
+    'question': "SELECT question_id FROM questions WHERE question_id = %s",
+    'answer': "SELECT question_id FROM answers WHERE answer_id = %s",
+}
+
+VOTE_FOR_UPDATE_QUERY = """
+    SELECT value FROM votes
+    WHERE user_id = %s AND target_type = %s AND target_id = %s
+    FOR UPDATE
+"""
+
+DELETE_VOTE_QUERY = "DELETE FROM votes WHERE user_id = %s AND target_type = %s AND target_id = %s"
+
+def cast_vote(user_id, target_type, target_id, value):
+    """Records a user's vote on a question or answer, replacing any earlier vote.
+
+    Returns ``(delta, question_id)`` where delta is the change to the target's
+    score, or None if the target does not exist. The score itself is updated
+    later by the counter service.
     """
-    cursor.execute(query)
-    questions = cursor.fetchall()
-    cursor.close()
-    return [
-        {"question_id": q[0], "title": q[1], "body": q[2], "views": q[3], "upvotes": q[4], "author": q[5]}
-        for q in questions
-    ]
+    with mysql.cursor() as cursor:
+        cursor.execute(VOTE_TARGET_QUERIES['answer' if target_type == 'answer' else 'question'], (target_id,))
+        target = cursor.fetchone()
+        if not target:
+            return None
+
+        cursor.execute(VOTE_FOR_UPDATE_QUERY, (user_id, target_type, target_id))
+        row = cursor.fetchone()
+        previous = row[0] if row else 0
+
+        if value == 0:
+            cursor.execute(DELETE_VOTE_QUERY, (user_id, target_type, target_id))
+        elif value != previous:
+            cursor.execute("""
+                INSERT INTO votes (user_id, target_type, target_id, value)
+                VALUES (%s, %s, %s, %s)
+                ON DUPLICATE KEY UPDATE value = VALUES(value)
+            """, (user_id, target_type, target_id, value))
+        mysql.connection.commit()
+
+    return value - previous, target[0]
 
+MAX_QUESTION_TAGS = 5
+MAX_TAG_LENGTH = 50
+
+def tags_by_name_query(count):
+    return "SELECT tag_id, tag_name FROM tags WHERE tag_name IN ({}) ORDER BY tag_name".format(
+        ", ".join(["%s"] * count))
+
+def link_question_tags(cursor, question_id, names):
+    """Tags a question on the caller's cursor, creating tags that do not exist yet.
+
+    Returns ``[(tag_id, tag_name)]`` ordered by name, with names as stored.
+    """
+    if not names:
+        return []
+    cursor.execute("INSERT IGNORE INTO tags (tag_name) VALUES {}".format(
+        ", ".join(["(%s)"] * len(names))), list(names))
+    cursor.execute(tags_by_name_query(len(names)), list(names))
+    tags = [tuple(row) for row in cursor.fetchall()]
+    cursor.execute("INSERT IGNORE INTO question_tags (question_id, tag_id) VALUES {}".format(
+        ", ".join(["(%s, %s)"] * len(tags))), [value for tag_id, _ in tags for value in (question_id, tag_id)])
+    return tags
+
+QUESTION_TAG_IDS_QUERY = "SELECT tag_id FROM question_tags WHERE question_id = %s"
+
+def get_question_tag_ids(cursor, question_id):
+    cursor.execute(QUESTION_TAG_IDS_QUERY, (question_id,))
+    return [row[0] for row in cursor.fetchall()]
+
+BATCH_INSERT_ROWS = 500
+
+def find_parents_query(question_count, answer_count):
+    """Builds the find_parents() query, or returns None if there is nothing to look up."""
+    parts = []
+    if question_count:
+        parts.append("SELECT 'question', question_id, question_id FROM questions WHERE question_id IN ({})"
+                     .format(", ".join(["%s"] * question_count)))
+    if answer_count:
+        parts.append("SELECT 'answer', answer_id, question_id FROM answers WHERE answer_id IN ({})"
+                     .format(", ".join(["%s"] * answer_count)))
+    return " UNION ALL ".join(parts) or None
+
+def find_parents(question_ids, answer_ids):
+    """Checks which questions and answers exist in one query.
+
+    Returns ``(questions, answers)``: the set of existing question ids and a
+    dict mapping each existing answer id to its question id.
+    """
+    query = find_parents_query(len(question_ids), len(answer_ids))
+    questions, answers = set(), {}
+    if query is None:
+        return questions, answers
+    with mysql.cursor() as cursor:
+        cursor.execute(query, [*question_ids, *answer_ids])
+        for parent_type, parent_id, question_id in cursor.fetchall():
+            if parent_type == 'question':
+                questions.add(parent_id)
+            else:
+                answers[parent_id] = question_id
+    return questions, answers
+
+def _insert_rows(cursor, table, columns, rows):
+    """Inserts rows with multi-row INSERTs and returns their new ids in order.
+
+    A multi-row INSERT with a known row count is a "simple insert" to
+    InnoDB, which reserves consecutive auto-increment values for it, so the
+    ids of a statement are ``lastrowid`` (its first id) onwards.
+    """
+    placeholders = "(%s, NOW())" % ", ".join(["%s"] * len(columns))
+    ids = []
+    for start in range(0, len(rows), BATCH_INSERT_ROWS):
+        chunk = rows[start:start + BATCH_INSERT_ROWS]
+        cursor.execute("INSERT INTO {} ({}, created_at) VALUES {}".format(
+            table, ", ".join(columns), ", ".join([placeholders] * len(chunk))),
+            [value for row in chunk for value in row])
+        ids.extend(range(cursor.lastrowid, cursor.lastrowid + len(chunk)))
+    return ids
+
+def _count_by_question(question_ids, answers, comments):
+    deltas = {}
+    for question_id in question_ids:
+        counted = deltas.get(question_id, (0, 0))
+        deltas[question_id] = (counted[0] + answers, counted[1] + comments)
+    return deltas
+
+def insert_answers(rows):
+    """Inserts ``(question_id, user_id, body, code)`` rows and their question_stats
+    updates in one transaction; returns the new answer ids."""
+    with mysql.cursor() as cursor:
+        ids = _insert_rows(cursor, "answers", ("question_id", "user_id", "body", "code"), rows)
+        question_stats.bump(cursor, _count_by_question([row[0] for row in rows], 1, 0))
+        mysql.connection.commit()
+    return ids
+
+def insert_comments(rows, question_ids):
+    """Inserts ``(parent_type, parent_id, user_id, body)`` rows in one transaction.
+
+    ``question_ids`` gives the question each comment belongs to, for the
+    question_stats update committed with them. Returns the new comment ids.
+    """
+    with mysql.cursor() as cursor:
+        ids = _insert_rows(cursor, "comments", ("parent_type", "parent_id", "user_id", "body"), rows)
+        question_stats.bump(cursor, _count_by_question(question_ids, 0, 1))
+        mysql.connection.commit()
+    return ids
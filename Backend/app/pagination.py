@@ -0,0 +1,186 @@
+import base64
+import json
+from datetime import datetime
+
+from app.rows import RowMapper
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+MAX_SCAN_BATCH = 5000
+EXCERPT_LENGTH = 200
+
+
+class PaginationError(ValueError):
+    """Raised for malformed limit, sort, fields or cursor parameters."""
+
+
+def encode_cursor(sort, values):
+    """Packs the sort key of the last row on a page into an opaque token."""
+    values = [v.isoformat(sep=' ') if isinstance(v, datetime) else v for v in values]
+    data = json.dumps([sort, values], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(data).decode().rstrip("=")
+
+
+def decode_cursor(token, sort, size):
+    """Unpacks a token produced by encode_cursor for the given sort."""
+    try:
+        data = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4))
+        name, values = json.loads(data)
+    except (ValueError, TypeError):
+        raise PaginationError("Invalid cursor")
+    if name != sort or not isinstance(values, list) or len(values) != size:
+        raise PaginationError("Cursor does not match the requested sort")
+    return values
+
+
+class Page:
+    """A parsed page request."""
+
+    __slots__ = ("fields", "sort", "limit", "after")
+
+    def __init__(self, fields, sort, limit, after):
+        self.fields = fields
+        self.sort = sort
+        self.limit = limit
+        self.after = after
+
+
+class KeysetPaginator:
+    """Keyset (seek) pagination with field projection for listing queries.
+
+    ``columns`` maps public field names to SQL expressions. ``sorts`` maps a
+    sort name to the SQL expressions making up its key, most significant
+    first; the last expression must be unique so the order is total. Every
+    key is ordered descending, so the next page starts strictly below the
+    last row seen and costs an index range scan rather than an OFFSET.
+
+    Fields named in ``dates`` are formatted as HTTP dates when rows are mapped,
+    and fields in ``lists`` are split from comma-separated strings.
+    """
+
+    def __init__(self, columns, sorts, default_fields, required_fields=(), default_sort=None, dates=(), lists=()):
+        self.columns = columns
+        self.sorts = sorts
+        self.default_fields = tuple(default_fields)
+        self.required_fields = tuple(required_fields)
+        self.default_sort = default_sort or next(iter(sorts))
+        self.dates = tuple(dates)
+        self.lists = tuple(lists)
+        self._mappers = {}
+
+    def parse(self, args, streaming=False):
+        """Builds a Page from ``limit``, ``sort``, ``fields`` and ``cursor`` arguments.
+
+        A streaming page has no default limit and no upper bound on it.
+        """
+        if streaming and not args.get('limit'):
+            limit = None
+        else:
+            try:
+                limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+            except ValueError:
+                raise PaginationError("limit must be an integer")
+            if limit < 1 or (not streaming and limit > MAX_PAGE_SIZE):
+                raise PaginationError("limit must be between 1 and %d" % MAX_PAGE_SIZE)
+
+        sort = args.get('sort', self.default_sort)
+        if sort not in self.sorts:
+            raise PaginationError("sort must be one of: %s" % ", ".join(self.sorts))
+
+        if args.get('fields'):
+            fields = [f.strip() for f in args['fields'].split(",") if f.strip()]
+            unknown = [f for f in fields if f not in self.columns]
+            if unknown:
+                raise PaginationError("Unknown fields: %s" % ", ".join(unknown))
+        else:
+            fields = list(self.default_fields)
+        for field in reversed(self.required_fields):
+            if field not in fields:
+                fields.insert(0, field)
+
+        after = None
+        if args.get('cursor'):
+            after = decode_cursor(args['cursor'], sort, len(self.sorts[sort]))
+
+        return Page(tuple(fields), sort, limit, after)
+
+    def build(self, from_clause, page, where=None, params=()):
+        """Returns the ``(query, params)`` that fetch() runs for a page."""
+        keys = self.sorts[page.sort]
+        select = [self.columns[f] for f in page.fields] + list(keys)
+        conditions = [where] if where else []
+        params = list(params)
+
+        if page.after is not None:
+            # a < x OR (a = x AND (b < y OR (b = y AND c < z)))
+            clause = "{} < %s".format(keys[-1])
+            clause_params = [page.after[-1]]
+            for key, value in zip(reversed(keys[:-1]), reversed(page.after[:-1])):
+                clause = "{0} < %s OR ({0} = %s AND ({1}))".format(key, clause)
+                clause_params = [value, value] + clause_params
+            conditions.append("(" + clause + ")")
+            params.extend(clause_params)
+
+        query = "SELECT {} FROM {}".format(", ".join(select), from_clause)
+        if conditions:
+            query += " WHERE " + " AND ".join(conditions)
+        query += " ORDER BY {}".format(", ".join(k + " DESC" for k in keys))
+        if page.limit is not None:
+            query += " LIMIT %s"
+            params.append(page.limit + 1)
+        return query, params
+
+    def fetch(self, cursor, from_clause, page, where=None, params=()):
+        """Runs one page of the listing and returns ``(items, next_cursor)``."""
+        cursor.execute(*self.build(from_clause, page, where, params))
+        return self.paginate(page, cursor.fetchall())
+
+    def scan(self, from_clause, page, keep, where=None, params=()):
+        """Generator for a page whose rows are filtered by ``keep(row)`` in Python.
+
+        Yields ``(query, params)`` for successive batches in sort order and
+        expects each batch's rows to be sent back; it returns the kept rows
+        ready for paginate(). Batches start at the page size and double, so a
+        filter that keeps most rows costs about one query. fetch_filtered()
+        drives it with a cursor; the async routes drive it with aiomysql.
+        """
+        width = len(page.fields)
+        wanted = page.limit + 1
+        batch = Page(page.fields, page.sort, wanted, page.after)
+        kept = []
+        while len(kept) < wanted:
+            rows = yield self.build(from_clause, batch, where, params)
+            more = len(rows) > batch.limit
+            rows = rows[:batch.limit]
+            kept.extend(row for row in rows if keep(row))
+            if not more:
+                break
+            batch = Page(page.fields, page.sort, min(batch.limit * 2, MAX_SCAN_BATCH), list(rows[-1][width:]))
+        return kept[:wanted]
+
+    def fetch_filtered(self, cursor, from_clause, page, keep, where=None, params=()):
+        """Like fetch(), keeping only rows for which ``keep(row)`` is true."""
+        scan = self.scan(from_clause, page, keep, where, params)
+        try:
+            query = next(scan)
+            while True:
+                cursor.execute(*query)
+                query = scan.send(cursor.fetchall())
+        except StopIteration as done:
+            return self.paginate(page, done.value)
+
+    def row_mapper(self, page):
+        """Returns the RowMapper for the page's field list, compiled on first use."""
+        mapper = self._mappers.get(page.fields)
+        if mapper is None:
+            mapper = self._mappers[page.fields] = RowMapper(page.fields, self.dates, self.lists)
+        return mapper
+
+    def paginate(self, page, rows):
+        """Turns the rows of a built query into ``(items, next_cursor)``."""
+        width = len(page.fields)
+        next_cursor = None
+        if len(rows) > page.limit:
+            rows = rows[:page.limit]
+            next_cursor = encode_cursor(page.sort, rows[-1][width:])
+        return self.row_mapper(page).many(rows), next_cursor
@@ -0,0 +1,125 @@
+import atexit
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from werkzeug.security import check_password_hash, generate_password_hash
+
+DEFAULT_HASH_METHOD = "scrypt:32768:8:1"
+
+
+class HashingBusy(Exception):
+    """Raised when the hashing queue is full or a job times out; the caller should answer 503."""
+
+
+def _method_of(password_hash):
+    return password_hash.split("$", 1)[0]
+
+
+class PasswordHasher:
+    """Runs password hashing and verification in a pool of worker processes.
+
+    Key derivation is deliberately CPU-bound, so doing it on the request
+    thread stalls everything else that worker serves. At most
+    ``PASSWORD_HASH_QUEUE_LIMIT`` jobs may be queued or running; beyond that
+    calls fail fast with HashingBusy instead of piling up, as do calls
+    still waiting after ``PASSWORD_HASH_TIMEOUT`` seconds. With
+    ``PASSWORD_HASH_WORKERS = 0`` hashing runs inline.
+
+    ``PASSWORD_HASH_METHOD`` is a werkzeug method string such as
+    ``scrypt:32768:8:1`` or ``pbkdf2:sha256:600000``. Hashes made with other
+    parameters still verify and are reported by needs_rehash().
+    """
+
+    def __init__(self):
+        self.method = DEFAULT_HASH_METHOD
+        self.workers = 0
+        self.queue_limit = 0
+        self.timeout = None
+        self._executor = None
+        self._lock = threading.Lock()
+        self._queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', DEFAULT_HASH_METHOD)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', os.cpu_count() or 1)
+        app.config.setdefault('PASSWORD_HASH_QUEUE_LIMIT', 4 * app.config['PASSWORD_HASH_WORKERS'] or 1)
+        app.config.setdefault('PASSWORD_HASH_TIMEOUT', 10.0)
+        self.configure(app.config['PASSWORD_HASH_METHOD'], app.config['PASSWORD_HASH_WORKERS'],
+                       app.config['PASSWORD_HASH_QUEUE_LIMIT'], app.config['PASSWORD_HASH_TIMEOUT'])
+        app.extensions['passwords'] = self
+        atexit.register(self.shutdown)
+
+    def configure(self, method, workers, queue_limit, timeout=None):
+        self.shutdown()
+        # Normalise short forms ("scrypt", "pbkdf2:sha256") to the full
+        # parameter string werkzeug writes into the hash, for needs_rehash().
+        self.method = _method_of(generate_password_hash("", method))
+        self.workers = workers
+        self.queue_limit = queue_limit
+        self.timeout = timeout
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # spawn rather than fork: the app has pool and flush threads running
+                    self._executor = ProcessPoolExecutor(
+                        self.workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        with self._lock:
+            if self._queued >= self.queue_limit:
+                self.rejected += 1
+                raise HashingBusy("Too many password operations in progress")
+            self._queued += 1
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+        # Released when the job finishes, not when the caller stops waiting on it.
+        future.add_done_callback(self._release)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            with self._lock:
+                self.timed_out += 1
+            raise HashingBusy("Password operation timed out")
+
+    def _release(self, future=None):
+        with self._lock:
+            self._queued -= 1
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, password_hash, password):
+        return self._run(check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the hash was made with a different method or cost than configured."""
+        return _method_of(password_hash) != self.method
+
+    def status(self):
+        with self._lock:
+            return {
+                "method": self.method,
+                "workers": self.workers,
+                "queue_limit": self.queue_limit,
+                "queued": self._queued,
+                "rejected": self.rejected,
+                "timed_out": self.timed_out,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,231 @@
+import json
+import re
+import threading
+import time
+from collections import deque
+from functools import lru_cache
+
+import pymysql
+from flask import g, has_app_context, has_request_context, request
+
+_COMMENTS = re.compile(r"/\*.*?\*/|--[^\n]*", re.S)
+_STRINGS = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"")
+_PLACEHOLDERS = re.compile(r"%s|%\(\w+\)s")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_LISTS = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROWS = re.compile(r"\(\.\.\.\)(?:\s*,\s*\(\.\.\.\))+")
+_SPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql):
+    """Normalizes a statement so that every execution of the same query shares one key.
+
+    Literals and placeholders become ``?``, value lists such as ``IN (%s, %s)``
+    or multi-row VALUES become ``(...)``, and whitespace is collapsed.
+    """
+    sql = _COMMENTS.sub(" ", sql)
+    sql = _STRINGS.sub("?", sql)
+    sql = _PLACEHOLDERS.sub("?", sql)
+    sql = _NUMBERS.sub("?", sql)
+    sql = _LISTS.sub("(...)", sql)
+    sql = _ROWS.sub("(...)", sql)
+    return _SPACE.sub(" ", sql).strip().rstrip(";").strip()
+
+
+class RequestProfile:
+    """The queries of one request, grouped by fingerprint."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.duration = 0.0
+        self.statements = {}
+
+    def add(self, key, duration, rows):
+        self.queries += 1
+        self.duration += duration
+        entry = self.statements.get(key)
+        if entry is None:
+            self.statements[key] = [1, duration, duration, rows or 0]
+        else:
+            entry[0] += 1
+            entry[1] += duration
+            if duration > entry[2]:
+                entry[2] = duration
+            entry[3] += rows or 0
+
+    def repeated(self, threshold):
+        """Fingerprints of reads run at least ``threshold`` times, the signature of an N+1 loop."""
+        return sorted(((key, entry[0]) for key, entry in self.statements.items()
+                       if entry[0] >= threshold and key[:6].lower() == "select"),
+                      key=lambda item: -item[1])
+
+
+class QueryProfiler:
+    """Times every statement run through the MySQL pool and attributes it to a route.
+
+    Per-request totals go out in a ``Server-Timing`` header when
+    ``SQL_SERVER_TIMING`` is set, since they name tables and columns. Statements
+    slower than ``SQL_SLOW_QUERY_MS`` and reads repeated at least
+    ``SQL_N_PLUS_ONE_THRESHOLD`` times in one request are logged as JSON
+    lines, and per-route aggregates and recent requests are kept for
+    ``/api/_debug/queries``. The per-query work is a timer and a dict
+    update on the request's own profile; shared state is only touched once
+    per request. ``SQL_PROFILING`` and ``SQL_SERVER_TIMING`` default to
+    ``app.debug`` as it is when the extension is set up; ``/api/_debug/queries``
+    is only served when profiling was switched on then.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.slow_threshold = 0.2
+        self.n_plus_one_threshold = 5
+        self.server_timing = False
+        self.logger = None
+        self._lock = threading.Lock()
+        self._routes = {}
+        self._recent = deque(maxlen=50)
+        self._n_plus_one = 0
+        self._slow = 0
+
+    def init_app(self, app, mysql):
+        app.config.setdefault('SQL_PROFILING', app.debug)
+        app.config.setdefault('SQL_SERVER_TIMING', app.debug)
+        app.config.setdefault('SQL_SLOW_QUERY_MS', 200)
+        app.config.setdefault('SQL_N_PLUS_ONE_THRESHOLD', 5)
+        app.config.setdefault('SQL_PROFILE_HISTORY', 50)
+        app.extensions['sql_profiler'] = self
+
+        self.enabled = app.config['SQL_PROFILING']
+        self.server_timing = app.config['SQL_SERVER_TIMING']
+        self.slow_threshold = app.config['SQL_SLOW_QUERY_MS'] / 1000.0
+        self.n_plus_one_threshold = app.config['SQL_N_PLUS_ONE_THRESHOLD']
+        self._recent = deque(maxlen=app.config['SQL_PROFILE_HISTORY'])
+        self.logger = app.logger
+        if not self.enabled:
+            return
+
+        mysql.pool.connect_kwargs["cursorclass"] = self.cursor_class(pymysql.cursors.Cursor)
+        mysql.stream_cursor_class = self.cursor_class(pymysql.cursors.SSCursor)
+        app.before_request(self._start)
+        app.after_request(self._finish)
+
+    def cursor_class(self, base):
+        """Returns a subclass of the pymysql cursor ``base`` that reports to this profiler."""
+        profiler = self
+        unbuffered = issubclass(base, pymysql.cursors.SSCursor)
+
+        class ProfiledCursor(base):
+            def execute(self, query, args=None):
+                started = time.perf_counter()
+                try:
+                    return super().execute(query, args)
+                finally:
+                    rows = None if unbuffered else self.rowcount
+                    profiler.record(query, time.perf_counter() - started, rows)
+
+        ProfiledCursor.__name__ = "Profiled" + base.__name__
+        return ProfiledCursor
+
+    def record(self, query, duration, rows):
+        if isinstance(query, bytes):
+            query = query.decode("utf-8", "replace")
+        key = fingerprint(query)
+        profile = g.get('query_profile') if has_app_context() else None
+        if profile is not None:
+            profile.add(key, duration, rows)
+        if duration >= self.slow_threshold:
+            with self._lock:
+                self._slow += 1
+            self._log("slow_query", fingerprint=key, duration_ms=round(duration * 1000, 2), rows=rows)
+
+    def _log(self, event, **fields):
+        if has_request_context():
+            fields = dict(route=request.endpoint, method=request.method, path=request.path, **fields)
+        self.logger.warning(json.dumps(dict(event=event, **fields), default=str))
+
+    def _start(self):
+        g.query_profile = RequestProfile()
+
+    def _finish(self, response):
+        profile = g.pop('query_profile', None)
+        if profile is None:
+            return response
+        total = time.perf_counter() - profile.started
+        route = request.endpoint or "<unmatched>"
+        repeated = profile.repeated(self.n_plus_one_threshold)
+
+        timing = ['db;dur=%.2f;desc="%d queries"' % (profile.duration * 1000, profile.queries),
+                  'app;dur=%.2f' % (total * 1000)]
+        if repeated:
+            timing.append('n-plus-one;desc="%dx %s"' % (
+                repeated[0][1], repeated[0][0][:80].replace('\\', '\\\\').replace('"', '\\"')))
+            for key, count in repeated:
+                self._log("n_plus_one", fingerprint=key, count=count)
+        if self.server_timing:
+            response.headers.add('Server-Timing', ", ".join(timing))
+
+        with self._lock:
+            self._n_plus_one += len(repeated)
+            routes = self._routes.setdefault(route, {"requests": 0, "queries": 0, "statements": {}})
+            routes["requests"] += 1
+            routes["queries"] += profile.queries
+            for key, (count, duration, longest, rows) in profile.statements.items():
+                entry = routes["statements"].get(key)
+                if entry is None:
+                    routes["statements"][key] = [count, duration, longest, rows]
+                else:
+                    entry[0] += count
+                    entry[1] += duration
+                    entry[2] = max(entry[2], longest)
+                    entry[3] += rows
+            self._recent.append({
+                "route": route,
+                "method": request.method,
+                "path": request.path,
+                "status": response.status_code,
+                "queries": profile.queries,
+                "db_ms": round(profile.duration * 1000, 2),
+                "total_ms": round(total * 1000, 2),
+                "n_plus_one": [{"fingerprint": key, "count": count} for key, count in repeated],
+            })
+        return response
+
+    def snapshot(self):
+        with self._lock:
+            routes = {
+                route: {
+                    "requests": data["requests"],
+                    "queries_per_request": data["queries"] / data["requests"],
+                    "statements": sorted((
+                        {
+                            "fingerprint": key,
+                            "count": count,
+                            "per_request": count / data["requests"],
+                            "total_ms": round(duration * 1000, 2),
+                            "mean_ms": round(duration * 1000 / count, 3),
+                            "max_ms": round(longest * 1000, 2),
+                            "rows": rows,
+                        }
+                        for key, (count, duration, longest, rows) in data["statements"].items()
+                    ), key=lambda s: -s["total_ms"]),
+                }
+                for route, data in self._routes.items()
+            }
+            return {
+                "enabled": self.enabled,
+                "slow_query_ms": self.slow_threshold * 1000,
+                "slow_queries": self._slow,
+                "n_plus_one_threshold": self.n_plus_one_threshold,
+                "n_plus_one_detected": self._n_plus_one,
+                "routes": routes,
+                "recent": list(self._recent),
+            }
+
+    def reset(self):
+        with self._lock:
+            self._routes.clear()
+            self._recent.clear()
+            self._n_plus_one = 0
+            self._slow = 0
@@ -0,0 +1,127 @@
+import time
+
+import click
+
+RECONCILE_BATCH_SIZE = 1000
+
+# The true stats of questions in an id range, computed from the base tables.
+# Mirrors the backfill in migrations/0004_question_stats.sql.
+EXPECTED_STATS_QUERY = """
+SELECT q.question_id,
+    (SELECT COUNT(*) FROM answers a WHERE a.question_id = q.question_id),
+    (SELECT COUNT(*) FROM comments c WHERE c.parent_type = 'question' AND c.parent_id = q.question_id)
+        + (SELECT COUNT(*) FROM answers a JOIN comments c ON c.parent_type = 'answer' AND c.parent_id = a.answer_id
+           WHERE a.question_id = q.question_id),
+    GREATEST(
+        q.updated_at,
+        COALESCE((SELECT MAX(a.updated_at) FROM answers a WHERE a.question_id = q.question_id), q.updated_at),
+        COALESCE((SELECT MAX(c.updated_at) FROM comments c
+                  WHERE c.parent_type = 'question' AND c.parent_id = q.question_id), q.updated_at),
+        COALESCE((SELECT MAX(c.updated_at) FROM answers a JOIN comments c
+                  ON c.parent_type = 'answer' AND c.parent_id = a.answer_id
+                  WHERE a.question_id = q.question_id), q.updated_at)),
+    COALESCE((SELECT GROUP_CONCAT(t.tag_name ORDER BY t.tag_name SEPARATOR ',')
+              FROM question_tags qt JOIN tags t ON t.tag_id = qt.tag_id
+              WHERE qt.question_id = q.question_id), '')
+FROM questions q
+WHERE q.question_id BETWEEN %s AND %s
+"""
+
+
+def bump(cursor, deltas):
+    """Adds ``{question_id: (answers, comments)}`` to question_stats and marks the questions active.
+
+    Runs on the caller's cursor so it commits or rolls back together with
+    the write that caused it. Missing rows are created; the reconciliation
+    job fills in anything they were missing.
+    """
+    if not deltas:
+        return
+    rows = sorted(deltas.items())
+    cursor.execute("""
+        INSERT INTO question_stats (question_id, answer_count, comment_count, last_activity_at)
+        VALUES {}
+        ON DUPLICATE KEY UPDATE
+            answer_count = answer_count + VALUES(answer_count),
+            comment_count = comment_count + VALUES(comment_count),
+            last_activity_at = NOW()
+    """.format(", ".join(["(%s, %s, %s, NOW())"] * len(rows))),
+        [value for question_id, (answers, comments) in rows for value in (question_id, answers, comments)])
+
+
+def touch(cursor, question_id):
+    """Marks a question active after an edit to it or one of its answers or comments."""
+    bump(cursor, {question_id: (0, 0)})
+
+
+def set_tags(cursor, question_id, tags):
+    """Stores a question's tag names the way the reconciliation job writes them."""
+    cursor.execute("""
+        INSERT INTO question_stats (question_id, tags) VALUES (%s, %s)
+        ON DUPLICATE KEY UPDATE tags = VALUES(tags)
+    """, (question_id, ",".join(sorted(tags, key=str.lower))))
+
+
+def reconcile_batch(cursor, after, batch_size):
+    """Recomputes the stats of the next ``batch_size`` questions with ids above ``after``.
+
+    Returns ``(last_id, checked, repaired)``, last_id being None when no
+    questions are left. The stats rows of the range are locked first, so
+    writes racing with the batch wait for it instead of being overwritten.
+    """
+    cursor.execute("SELECT question_id FROM questions WHERE question_id > %s ORDER BY question_id LIMIT %s",
+                   (after, batch_size))
+    ids = [row[0] for row in cursor.fetchall()]
+    if not ids:
+        return None, 0, 0
+    low, high = ids[0], ids[-1]
+
+    cursor.execute("""
+        SELECT question_id, answer_count, comment_count, last_activity_at, tags
+        FROM question_stats WHERE question_id BETWEEN %s AND %s FOR UPDATE
+    """, (low, high))
+    current = {row[0]: row for row in cursor.fetchall()}
+    cursor.execute(EXPECTED_STATS_QUERY, (low, high))
+    drifted = [row for row in cursor.fetchall() if current.get(row[0]) != tuple(row)]
+
+    if drifted:
+        cursor.execute("""
+            INSERT INTO question_stats (question_id, answer_count, comment_count, last_activity_at, tags)
+            VALUES {}
+            ON DUPLICATE KEY UPDATE
+                answer_count = VALUES(answer_count),
+                comment_count = VALUES(comment_count),
+                last_activity_at = VALUES(last_activity_at),
+                tags = VALUES(tags)
+        """.format(", ".join(["(%s, %s, %s, %s, %s)"] * len(drifted))),
+            [value for row in drifted for value in row])
+    return high, len(ids), len(drifted)
+
+
+def reconcile(conn, batch_size=RECONCILE_BATCH_SIZE, echo=None):
+    """Repairs question_stats for every question, one committed batch at a time."""
+    after = checked = repaired = 0
+    started = time.perf_counter()
+    while True:
+        with conn.cursor() as cursor:
+            last_id, count, fixed = reconcile_batch(cursor, after, batch_size)
+        conn.commit()
+        if last_id is None:
+            break
+        after = last_id
+        checked += count
+        repaired += fixed
+        if echo is not None and fixed:
+            echo("questions up to %d: repaired %d of %d" % (last_id, fixed, count))
+    if echo is not None:
+        echo("Checked %d questions in %.1f s, repaired %d" % (checked, time.perf_counter() - started, repaired))
+    return checked, repaired
+
+
+def init_app(app, pool):
+    @app.cli.command('reconcile-question-stats')
+    @click.option('--batch-size', type=int, default=RECONCILE_BATCH_SIZE, help='Questions per transaction.')
+    def reconcile_question_stats(batch_size):
+        """Recomputes question_stats from the base tables and repairs drift."""
+        with pool.checkout() as conn:
+            reconcile(conn, batch_size, echo=click.echo)
@@ -0,0 +1,54 @@
+import threading
+import time
+
+DEFAULT_RELOAD_INTERVAL = 300
+
+
+class Reloader:
+    """Builds an in-process index on first use and reloads it every ``interval`` seconds.
+
+    The search, tag, similarity and leaderboard indexes live in each worker
+    process and the write routes only update the copy in the process that
+    handled the write. With several workers, each one therefore reloads its
+    indexes from MySQL every ``INDEX_RELOAD_INTERVAL`` seconds, which bounds
+    how long another worker's writes stay invisible; 0 turns reloading off
+    for single-worker deployments. The first build blocks its callers; a
+    reload runs on the one request that finds it due while the others keep
+    reading the current contents.
+    """
+
+    def __init__(self, interval=DEFAULT_RELOAD_INTERVAL):
+        self.interval = interval
+        self.built_at = None
+        self.reloads = 0
+        self.lock = threading.Lock()
+
+    def due(self):
+        """True if the index was never built or is older than ``interval``."""
+        if self.built_at is None:
+            return True
+        return bool(self.interval) and time.monotonic() - self.built_at >= self.interval
+
+    def ensure(self, build):
+        """Calls ``build()`` if the index is due, unless another thread is already reloading it."""
+        if self.built_at is None:
+            with self.lock:
+                if self.built_at is None:
+                    self._build(build)
+        elif self.due() and self.lock.acquire(blocking=False):
+            try:
+                if self.due():
+                    self._build(build)
+                    self.reloads += 1
+            finally:
+                self.lock.release()
+
+    def rebuild(self, build):
+        """Calls ``build()`` now, after any build in progress, and returns its result."""
+        with self.lock:
+            return self._build(build)
+
+    def _build(self, build):
+        result = build()
+        self.built_at = time.monotonic()
+        return result
@@ -0,0 +1,341 @@
+import difflib
+import json
+import threading
+import zlib
+from itertools import zip_longest
+
+REVISION_FIELDS = ("body", "code")
+REVISION_TARGETS = {
+    "question": ("questions", "question_id"),
+    "answer": ("answers", "answer_id"),
+}
+DIFF_FORMATS = ("unified", "side-by-side")
+
+# Queries formatted with the target's ``{table}`` and ``{key}`` go through target_query().
+LATEST_REVISIONS_QUERY = """
+    SELECT MAX(revision), MAX(CASE WHEN kind = 'snapshot' THEN revision END)
+    FROM revisions WHERE target_type = %s AND target_id = %s
+"""
+
+FIRST_REVISION_QUERY = """
+    INSERT INTO revisions (target_type, target_id, revision, user_id, kind, data, created_at)
+    SELECT %s, %s, 1, user_id, 'snapshot', %s, updated_at FROM {table} WHERE {key} = %s
+"""
+
+INSERT_REVISION_QUERY = """
+    INSERT INTO revisions (target_type, target_id, revision, user_id, kind, data)
+    VALUES (%s, %s, %s, %s, %s, %s)
+"""
+
+DELETE_QUESTION_REVISIONS_QUERY = """
+    DELETE FROM revisions
+    WHERE (target_type = 'question' AND target_id = %s)
+       OR (target_type = 'answer' AND target_id IN (SELECT answer_id FROM answers WHERE question_id = %s))
+"""
+
+HISTORY_QUERY = """
+    SELECT r.revision, r.user_id, u.username, r.created_at
+    FROM revisions r
+    LEFT JOIN users u ON u.user_id = r.user_id
+    WHERE r.target_type = %s AND r.target_id = %s
+    ORDER BY r.revision
+"""
+
+UNEDITED_HISTORY_QUERY = """
+    SELECT 1, t.user_id, u.username, t.updated_at
+    FROM {table} t
+    LEFT JOIN users u ON u.user_id = t.user_id
+    WHERE t.{key} = %s
+"""
+
+LATEST_REVISION_QUERY = """
+    SELECT COALESCE(
+        (SELECT MAX(revision) FROM revisions WHERE target_type = %s AND target_id = %s), 1)
+    FROM {table} WHERE {key} = %s
+"""
+
+RECONSTRUCT_QUERY = """
+    SELECT revision, kind, data FROM revisions
+    WHERE target_type = %s AND target_id = %s AND revision <= %s AND revision >= (
+        SELECT MAX(revision) FROM revisions
+        WHERE target_type = %s AND target_id = %s AND revision <= %s AND kind = 'snapshot')
+    ORDER BY revision
+"""
+
+UNEDITED_CONTENT_QUERY = """
+    SELECT body, code FROM {table} t
+    WHERE {key} = %s AND NOT EXISTS (
+        SELECT 1 FROM revisions WHERE target_type = %s AND target_id = t.{key})
+"""
+
+
+def target_query(query, target_type):
+    table, key = REVISION_TARGETS[target_type]
+    return query.format(table=table, key=key)
+DIFF_CONTEXT = 3
+MAX_DIFF_CONTEXT = 50
+
+
+class RevisionError(ValueError):
+    """Raised for a malformed ``from``, ``to``, ``format`` or ``context`` parameter."""
+
+
+def _pack(value):
+    return zlib.compress(json.dumps(value, separators=(",", ":")).encode("utf-8"))
+
+
+def _unpack(data):
+    return json.loads(zlib.decompress(bytes(data)))
+
+
+def _lines(text):
+    return (text or "").splitlines(keepends=True)
+
+
+def make_delta(old, new):
+    """Line edit script turning ``old`` into ``new``.
+
+    A positive number keeps that many lines of ``old``, a negative one skips
+    them, and a list inserts its lines. None stands for a new value of None.
+    """
+    if new is None:
+        return None
+    a, b = _lines(old), _lines(new)
+    ops = []
+    for tag, i1, i2, j1, j2 in difflib.SequenceMatcher(None, a, b).get_opcodes():
+        if tag == "equal":
+            ops.append(i2 - i1)
+            continue
+        if i2 > i1:
+            ops.append(i1 - i2)
+        if j2 > j1:
+            ops.append(b[j1:j2])
+    return ops
+
+
+def apply_delta(old, ops):
+    if ops is None:
+        return None
+    lines, out, pos = _lines(old), [], 0
+    for op in ops:
+        if isinstance(op, list):
+            out.extend(op)
+        elif op > 0:
+            out.extend(lines[pos:pos + op])
+            pos += op
+        else:
+            pos -= op
+    return "".join(out)
+
+
+def unified_diff(old, new, from_revision, to_revision, field, context):
+    return "\n".join(difflib.unified_diff(
+        (old or "").splitlines(), (new or "").splitlines(),
+        "r%d/%s" % (from_revision, field), "r%d/%s" % (to_revision, field), n=context, lineterm=""))
+
+
+def side_by_side_diff(old, new, context):
+    """Hunks of ``[op, old_line_no, old_line, new_line_no, new_line]`` rows, None where a side has no line."""
+    a, b = (old or "").splitlines(), (new or "").splitlines()
+    hunks = []
+    for group in difflib.SequenceMatcher(None, a, b).get_grouped_opcodes(context):
+        rows = []
+        for tag, i1, i2, j1, j2 in group:
+            for i, j in zip_longest(range(i1, i2), range(j1, j2)):
+                rows.append([tag,
+                             None if i is None else i + 1, None if i is None else a[i],
+                             None if j is None else j + 1, None if j is None else b[j]])
+        hunks.append(rows)
+    return hunks
+
+
+def parse_diff_args(args):
+    """Reads ``from``, ``to``, ``format`` and ``context``; missing revisions come back as None."""
+    revisions = []
+    for name in ("from", "to"):
+        value = args.get(name)
+        if value is None:
+            revisions.append(None)
+            continue
+        try:
+            value = int(value)
+        except ValueError:
+            raise RevisionError("%s must be a revision number" % name)
+        if value < 1:
+            raise RevisionError("%s must be a revision number" % name)
+        revisions.append(value)
+
+    fmt = args.get("format", "unified")
+    if fmt not in DIFF_FORMATS:
+        raise RevisionError("format must be one of: %s" % ", ".join(DIFF_FORMATS))
+    try:
+        context = int(args.get("context", DIFF_CONTEXT))
+    except ValueError:
+        raise RevisionError("context must be a number of lines")
+    if not 0 <= context <= MAX_DIFF_CONTEXT:
+        raise RevisionError("context must be between 0 and %d" % MAX_DIFF_CONTEXT)
+    return revisions[0], revisions[1], fmt, context
+
+
+class RevisionStore:
+    """Edit history of question and answer ``body`` and ``code``.
+
+    The update routes call ``record()`` before overwriting a post. Each
+    revision is stored as a compressed line delta against the one before it,
+    or as a full snapshot when that is smaller or when
+    ``REVISIONS_SNAPSHOT_INTERVAL`` deltas have accumulated, so reading a
+    revision decompresses one snapshot and at most that many deltas.
+    Revisions never change once written, so reconstructed revisions and
+    computed diffs are kept in the shared cache for
+    ``REVISIONS_CACHE_TTL`` seconds, where the cache's LRU keeps the pairs
+    people actually look at.
+    """
+
+    def __init__(self):
+        self.snapshot_interval = 10
+        self.cache_ttl = 3600
+        self.cache = None
+        self._lock = threading.Lock()
+        self.recorded = 0
+        self.snapshots = 0
+        self.stored_bytes = 0
+        self.reconstructed = 0
+        self.deltas_applied = 0
+        self.diffs = 0
+
+    def init_app(self, app, cache):
+        app.config.setdefault('REVISIONS_SNAPSHOT_INTERVAL', 10)
+        app.config.setdefault('REVISIONS_CACHE_TTL', 3600)
+        self.snapshot_interval = app.config['REVISIONS_SNAPSHOT_INTERVAL']
+        self.cache_ttl = app.config['REVISIONS_CACHE_TTL']
+        self.cache = cache
+        app.extensions['revisions'] = self
+
+    def _cached(self, key, loader):
+        if self.cache is None:
+            return loader()
+        return self.cache.get_or_set(key, loader, self.cache_ttl)
+
+    # Writes
+
+    def record(self, cursor, target_type, target_id, user_id, old, new):
+        """Appends ``new`` as the next revision of a post whose current text is ``old``.
+
+        Both are ``{"body": ..., "code": ...}``. Call it before the UPDATE,
+        with ``old`` read ``FOR UPDATE``: the first recorded edit also stores
+        ``old`` as revision 1, dated by the post's ``updated_at``. Returns the
+        new revision number, or None if nothing changed. The caller commits.
+        """
+        if all(old[field] == new[field] for field in REVISION_FIELDS):
+            return None
+        cursor.execute(LATEST_REVISIONS_QUERY, (target_type, target_id))
+        latest, last_snapshot = cursor.fetchone()
+
+        if not latest:
+            snapshot = _pack(old)
+            cursor.execute(target_query(FIRST_REVISION_QUERY, target_type),
+                           (target_type, target_id, snapshot, target_id))
+            latest = last_snapshot = 1
+            self._count(True, len(snapshot))
+
+        revision = latest + 1
+        snapshot = _pack(new)
+        data, kind = snapshot, "snapshot"
+        if revision - last_snapshot < self.snapshot_interval:
+            delta = _pack({field: make_delta(old[field], new[field]) for field in REVISION_FIELDS})
+            if len(delta) < len(snapshot):
+                data, kind = delta, "delta"
+        cursor.execute(INSERT_REVISION_QUERY, (target_type, target_id, revision, user_id, kind, data))
+        self._count(kind == "snapshot", len(data))
+        return revision
+
+    def _count(self, snapshot, size):
+        with self._lock:
+            self.recorded += 1
+            self.snapshots += snapshot
+            self.stored_bytes += size
+
+    @staticmethod
+    def delete_question(cursor, question_id):
+        """Deletes the history of a question and its answers; run it before deleting the question."""
+        cursor.execute(DELETE_QUESTION_REVISIONS_QUERY, (question_id, question_id))
+
+    # Reads
+
+    def history(self, cursor, target_type, target_id):
+        """Lists the revisions of a post, oldest first, or returns None if the post does not exist.
+
+        A post that was never edited has just revision 1, its current text.
+        """
+        cursor.execute(HISTORY_QUERY, (target_type, target_id))
+        rows = cursor.fetchall()
+        if not rows:
+            cursor.execute(target_query(UNEDITED_HISTORY_QUERY, target_type), (target_id,))
+            rows = cursor.fetchall()
+            if not rows:
+                return None
+        return [{"revision": revision, "user_id": user_id, "edited_by": username, "created_at": created_at}
+                for revision, user_id, username, created_at in rows]
+
+    def latest(self, cursor, target_type, target_id):
+        """The newest revision number of a post, or None if the post does not exist."""
+        cursor.execute(target_query(LATEST_REVISION_QUERY, target_type), (target_type, target_id, target_id))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+    def content(self, cursor, target_type, target_id, revision):
+        """``{"body", "code"}`` as of ``revision``, or None if there is no such revision."""
+        return self._cached("revision:%s:%d:%d" % (target_type, target_id, revision),
+                            lambda: self._reconstruct(cursor, target_type, target_id, revision))
+
+    def _reconstruct(self, cursor, target_type, target_id, revision):
+        cursor.execute(RECONSTRUCT_QUERY, (target_type, target_id, revision) * 2)
+        rows = cursor.fetchall()
+        if not rows:
+            if revision != 1:
+                return None
+            # Never edited: revision 1 is the post as it stands.
+            cursor.execute(target_query(UNEDITED_CONTENT_QUERY, target_type), (target_id, target_type))
+            row = cursor.fetchone()
+            return dict(zip(REVISION_FIELDS, row)) if row else None
+        if rows[-1][0] != revision:
+            return None
+
+        value = _unpack(rows[0][2])
+        for _, _, data in rows[1:]:
+            delta = _unpack(data)
+            value = {field: apply_delta(value[field], delta[field]) for field in REVISION_FIELDS}
+        with self._lock:
+            self.reconstructed += 1
+            self.deltas_applied += len(rows) - 1
+        return value
+
+    def diff(self, cursor, target_type, target_id, from_revision, to_revision, fmt="unified",
+             context=DIFF_CONTEXT):
+        """Diffs ``body`` and ``code`` between two revisions, or returns None if either is missing."""
+        def load():
+            old = self.content(cursor, target_type, target_id, from_revision)
+            new = self.content(cursor, target_type, target_id, to_revision)
+            if old is None or new is None:
+                return None
+            with self._lock:
+                self.diffs += 1
+            if fmt == "unified":
+                return {field: unified_diff(old[field], new[field], from_revision, to_revision, field, context)
+                        for field in REVISION_FIELDS}
+            return {field: side_by_side_diff(old[field], new[field], context) for field in REVISION_FIELDS}
+
+        return self._cached("diff:%s:%d:%d:%d:%s:%d" % (
+            target_type, target_id, from_revision, to_revision, fmt, context), load)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "recorded": self.recorded,
+                "snapshots": self.snapshots,
+                "stored_bytes": self.stored_bytes,
+                "reconstructed": self.reconstructed,
+                "deltas_applied": self.deltas_applied,
+                "diffs_computed": self.diffs,
+                "snapshot_interval": self.snapshot_interval,
+            }
@@ -1,35 +1,186 @@
-import jwt
 import datetime
-from flask import Blueprint, request, jsonify
-from werkzeug.security import check_password_hash, generate_password_hash
-from app.extensions import mysql
-from app.models import get_user_by_email, register_user
+from flask import Blueprint, Response, current_app, request, jsonify
+from app import question_stats
+from app.auth import current_user_id, login_required
+from app.cache import ALL_TAGS_KEY, question_comments_key, question_key, question_keys
+from app.conditional import conditional
+from app.events import SSE_HEADERS, SSE_MIMETYPE, parse_last_event_id
+from app.highlight import RENDER_MODES
+from app.extensions import (auth, cache, code_renderer, counters, events, leaderboards, mysql, passwords, profiler,
+                            revisions, search_index, similarity_index, tag_index)
+from app.models import (MAX_QUESTION_TAGS, MAX_TAG_LENGTH, TOP_QUESTIONS_LIMIT, cast_vote, find_parents,
+                        get_question_comments, get_question_tag_ids, get_question_tree, get_question_version,
+                        get_questions_by_ids, get_questions_version, get_tags_version, get_user_by_email,
+                        get_users_by_ids, insert_answers, insert_comments, link_question_tags, list_tags,
+                        register_user, update_password_hash)
+from app.passwords import HashingBusy
+from app.revisions import RevisionError, parse_diff_args
+from app.similarity import MAX_SIMILAR_LIMIT, SIMILAR_LIMIT
+from app.streaming import stream_format, stream_page
+from app.pagination import EXCERPT_LENGTH, KeysetPaginator, PaginationError
+from app.tags import AUTOCOMPLETE_LIMIT, MAX_AUTOCOMPLETE_LIMIT, TagQueryError, parse_tag_query
 
 app_routes = Blueprint('app_routes', __name__)
 
+@counters.on_flush
+def _invalidate_counted(question_ids):
+    cache.invalidate(*[question_key(qid) for qid in question_ids])
+
+QUESTION_COLUMNS = {
+    "question_id": "q.question_id",
+    "title": "q.title",
+    "body": "q.body",
+    "excerpt": "LEFT(q.body, %d)" % EXCERPT_LENGTH,
+    "code": "q.code",
+    "created_at": "q.created_at",
+    "updated_at": "q.updated_at",
+    "views": "q.views",
+    "upvotes": "q.upvotes",
+    "asked_by": "u.username",
+    "answer_count": "COALESCE(s.answer_count, 0)",
+    "comment_count": "COALESCE(s.comment_count, 0)",
+    "last_activity_at": "COALESCE(s.last_activity_at, q.updated_at)",
+    "tags": "s.tags",
+}
+
+QUESTION_SORTS = {
+    "newest": ("q.created_at", "q.question_id"),
+    "top": ("q.upvotes", "q.views", "q.question_id"),
+}
+
+QUESTIONS_FROM = """questions q
+    JOIN users u ON q.user_id = u.user_id
+    LEFT JOIN question_stats s ON s.question_id = q.question_id"""
+
+TAGGED_QUESTIONS_FROM = """questions q
+    JOIN question_tags qt ON q.question_id = qt.question_id
+    JOIN tags t ON qt.tag_id = t.tag_id
+    JOIN users u ON q.user_id = u.user_id
+    LEFT JOIN question_stats s ON s.question_id = q.question_id"""
+
+ANSWERED_QUESTIONS_FROM = """questions q
+    JOIN answers a ON q.question_id = a.question_id
+    JOIN users u ON q.user_id = u.user_id
+    LEFT JOIN question_stats s ON s.question_id = q.question_id"""
+
+# Write-route queries, named so `flask db-explain` checks the statements the routes run.
+DELETE_QUESTION_QUERY = "DELETE FROM questions WHERE question_id = %s"
+
+QUESTION_FOR_UPDATE_QUERY = """
+    SELECT user_id, body, code, title
+    FROM questions
+    WHERE question_id = %s
+    FOR UPDATE
+"""
+
+UPDATE_QUESTION_QUERY = """
+    UPDATE questions
+    SET code = %s, body = %s, updated_at = NOW()
+    WHERE question_id = %s
+"""
+
+ANSWER_FOR_UPDATE_QUERY = """
+    SELECT user_id, question_id, body, code
+    FROM answers
+    WHERE answer_id = %s
+    FOR UPDATE
+"""
+
+UPDATE_ANSWER_QUERY = """
+    UPDATE answers
+    SET code = %s, body = %s, updated_at = NOW()
+    WHERE answer_id = %s
+"""
+
+COMMENT_OWNER_QUERY = """
+    SELECT c.user_id, c.parent_type, c.parent_id, a.question_id
+    FROM comments c
+    LEFT JOIN answers a ON c.parent_type = 'answer' AND a.answer_id = c.parent_id
+    WHERE c.comment_id = %s
+"""
+
+UPDATE_COMMENT_QUERY = """
+    UPDATE comments
+    SET body = %s, updated_at = NOW()
+    WHERE comment_id = %s
+"""
+
+QUESTION_DATES = ("created_at", "updated_at", "last_activity_at")
+QUESTION_LISTS = ("tags",)
+QUESTION_SUMMARY_FIELDS = ("answer_count", "comment_count", "last_activity_at", "tags")
+
+question_paginator = KeysetPaginator(
+    QUESTION_COLUMNS, QUESTION_SORTS,
+    default_fields=("question_id", "title", "body", "created_at", "updated_at", "views", "upvotes", "asked_by")
+    + QUESTION_SUMMARY_FIELDS,
+    required_fields=("question_id",),
+    dates=QUESTION_DATES,
+    lists=QUESTION_LISTS,
+)
+
+user_question_paginator = KeysetPaginator(
+    QUESTION_COLUMNS, QUESTION_SORTS,
+    default_fields=("question_id", "title", "body", "created_at", "updated_at", "upvotes", "asked_by")
+    + QUESTION_SUMMARY_FIELDS,
+    required_fields=("question_id",),
+    dates=QUESTION_DATES,
+    lists=QUESTION_LISTS,
+)
+
+answered_question_paginator = KeysetPaginator(
+    dict(QUESTION_COLUMNS, answer_id="a.answer_id", answer_body="a.body", answer_created_at="a.created_at"),
+    {
+        "newest": ("a.created_at", "a.answer_id"),
+        "top": ("a.upvotes", "a.answer_id"),
+    },
+    default_fields=("question_id", "title", "body", "code", "created_at", "updated_at"),
+    required_fields=("question_id", "answer_id", "answer_body", "answer_created_at"),
+    dates=QUESTION_DATES + ("answer_created_at",),
+    lists=QUESTION_LISTS,
+)
+
  
 
-def generate_jwt_token(user_id):
-    expiration_time = datetime.datetime.utcnow() + datetime.timedelta(hours=1)  # Token expires in 1 hour
-    payload = {
-        'user_id': user_id,
-        'exp': expiration_time
-    }
-    return jwt.encode(payload, SECRET_KEY, algorithm="HS256")
+@auth.user_loader
+def _load_users(user_ids):
+    return get_users_by_ids(user_ids)
 
-def decode_token():
-    auth_header = request.headers.get("Authorization")
-    if not auth_header or not auth_header.startswith("Bearer "):
-        return None, "Authorization header missing or invalid"
-    
-    token = auth_header.split(" ")[1]  
+def _render_code(cursor, code):
+    """Highlights a snippet whose write has committed.
+
+    A failure is logged rather than failing the request; the snippet is then
+    served raw until `flask render-code` renders it.
+    """
+    try:
+        if code_renderer.ensure(cursor, code):
+            mysql.connection.commit()
+    except Exception:
+        current_app.logger.exception("Failed to render code snippet")
+
+def _index_similarity(cursor, question_id, title, body, code):
+    """Updates a committed question's MinHash signature, logging rather than raising on failure."""
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=["HS256"])
-        return payload, None 
-    except jwt.ExpiredSignatureError:
-        return None, "Token has expired"
-    except jwt.InvalidTokenError:
-        return None, "Invalid token"
+        similarity_index.index_question(cursor, question_id, title, body, code)
+        mysql.connection.commit()
+    except Exception:
+        current_app.logger.exception("Failed to index question %s for similarity", question_id)
+
+def _similar_questions(title, body, code, limit=SIMILAR_LIMIT):
+    similarity_index.ensure_built(mysql)
+    return similarity_index.similar(title, body, code, limit)
+
+def _record_view(question_id):
+    counters.record_view(question_id)
+    leaderboards.record(question_id, views=1)
+
+def _username(user_id):
+    user = auth.load_users([user_id]).get(user_id)
+    return user["username"] if user else None
+
+def _busy(e):
+    response = jsonify({"error": str(e)})
+    response.headers["Retry-After"] = "1"
+    return response, 503
 
 # Login a user
 @app_routes.route('/api/users/login', methods=['POST'])
@@ -46,20 +197,24 @@ def login():
             return jsonify({"error": "Missing required fields"}), 400
 
         user = get_user_by_email(email)
-        if user and check_password_hash(user[3], password):
-            token = generate_jwt_token(user[0])  
+        if user and passwords.verify(user["password_hash"], password):
+            if passwords.needs_rehash(user["password_hash"]):
+                update_password_hash(user["user_id"], passwords.hash(password))
+            token = auth.generate_token(user["user_id"])
 
             return jsonify({
                 "message": "Login successful",
                 "user": {
-                    "user_id": user[0],
-                    "username": user[1],
-                    "email": user[2]
+                    "user_id": user["user_id"],
+                    "username": user["username"],
+                    "email": user["email"]
                 },
                 "token": token 
             }), 200
 
         return jsonify({"error": "Invalid credentials"}), 401
+    except HashingBusy as e:
+        return _busy(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
@@ -82,7 +237,7 @@ def registeruser():
         if existing_user:
             return jsonify({"error": "Email already in use"}), 400
 
-        password_hash = generate_password_hash(password)
+        password_hash = passwords.hash(password)
 
         user_id = register_user(username, email, password_hash)
 
@@ -95,206 +250,145 @@ def registeruser():
             "email": email,
             "created_at": created_at
         }), 201
+    except HashingBusy as e:
+        return _busy(e)
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _questions_version():
+    if request.args.get('tag') or request.args.get('tags'):
+        return None
+    return get_questions_version()
+
 @app_routes.route('/api/questions', methods=['GET'])
+@conditional(_questions_version)
 def get_all_questions():
+    if request.args.get('tags'):
+        return get_questions_by_tags()
+    if request.args.get('tag'):
+        return get_questions_by_tag()
+    try:
+        fmt = stream_format(request)
+        page = question_paginator.parse(request.args, streaming=fmt is not None)
+        if fmt:
+            query, params = question_paginator.build(QUESTIONS_FROM, page)
+            return stream_page(question_paginator, page, mysql, query, params, fmt, "questions")
+
+        with mysql.cursor() as cursor:
+            questions, next_cursor = question_paginator.fetch(cursor, QUESTIONS_FROM, page)
+
+        return jsonify({"questions": questions, "next_cursor": next_cursor}), 200
+
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def _ensure_leaderboards():
+    if leaderboards.reloader.due():
+        with mysql.cursor() as cursor:
+            leaderboards.ensure_built(cursor, counters.pending)
+
+def _ranked_questions(rows):
+    """Joins ranked leaderboard rows with the display fields of those questions."""
+    questions = {q["question_id"]: q for q in get_questions_by_ids([row["question_id"] for row in rows])}
+    ranked = []
+    for row in rows:
+        question = questions.get(row["question_id"])
+        if question is not None:
+            ranked.append(dict(question, **row))
+    return ranked
+
+def _leaderboard_limit():
+    try:
+        limit = int(request.args.get('limit', TOP_QUESTIONS_LIMIT))
+    except ValueError:
+        limit = TOP_QUESTIONS_LIMIT
+    return max(1, min(limit, 100))
+
+@app_routes.route('/api/questions/top', methods=['GET'])
+def get_top_questions_list():
     try:
-        cursor = mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform")
-        query = """
-            SELECT 
-                q.question_id,
-                q.title,
-                q.body,
-                q.created_at,
-                q.updated_at,
-                q.views,
-                q.upvotes,
-                u.username AS asked_by
-            FROM 
-                questions q
-            JOIN 
-                users u ON q.user_id = u.user_id;
-        """
-        cursor.execute(query)
-        results = cursor.fetchall()
-
-        questions = [
-            {
-                "question_id": row[0],
-                "title": row[1],
-                "body": row[2],
-                "created_at": row[3],
-                "updated_at": row[4],
-                "views": row[5],
-                "upvotes": row[6],
-                "asked_by": row[7]
-            }
-            for row in results
-        ]
+        _ensure_leaderboards()
+        questions = _ranked_questions(leaderboards.top(_leaderboard_limit()))
         return jsonify({"questions": questions}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app_routes.route('/api/questions/trending', methods=['GET'])
+def get_trending_questions():
+    try:
+        _ensure_leaderboards()
+        questions = _ranked_questions(leaderboards.trending(_leaderboard_limit()))
+        return jsonify({"questions": questions}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app_routes.route('/api/tags/<tag_name>/top', methods=['GET'])
+def get_top_questions_for_tag(tag_name):
+    try:
+        _ensure_leaderboards()
+        questions = _ranked_questions(leaderboards.top_for_tag(tag_name, _leaderboard_limit()))
+        return jsonify({"questions": questions}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 @app_routes.route('/api/questions/<int:question_id>', methods=['GET'])
+@conditional(get_question_version, on_not_modified=_record_view)
 def get_question_with_details(question_id):
     try:
-        cursor = mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform")  
-
-        query = """
-        SELECT 
-            q.question_id AS question_id,
-            q.title AS question_title,
-            q.body AS question_body,
-            q.code AS question_code,
-            q.created_at AS question_created_at,
-            q.updated_at AS question_updated_at,
-            q.views AS question_views,
-            q.upvotes AS question_upvotes,
-            u.username AS question_asked_by,  -- Added username for the question creator
-            
-            a.answer_id AS answer_id,
-            a.body AS answer_body,
-            a.code AS answer_code,
-            a.created_at AS answer_created_at,
-            a.updated_at AS answer_updated_at,
-            a.upvotes AS answer_upvotes,
-            ua.username AS answer_asked_by,  -- Added username for the answer creator
-            
-            c.comment_id AS comment_id,
-            c.parent_type AS comment_parent_type,
-            c.parent_id AS comment_parent_id,
-            c.body AS comment_body,
-            c.created_at AS comment_created_at,
-            c.updated_at AS comment_updated_at,
-            uc.username AS comment_posted_by  -- Added username for the comment creator
-        FROM 
-            questions q
-        LEFT JOIN 
-            answers a ON q.question_id = a.question_id
-        LEFT JOIN 
-            comments c ON (
-                (c.parent_type = 'question' AND c.parent_id = q.question_id) OR
-                (c.parent_type = 'answer' AND c.parent_id = a.answer_id)
-            )
-        LEFT JOIN
-            users u ON q.user_id = u.user_id  -- Join for the question creator
-        LEFT JOIN
-            users ua ON a.user_id = ua.user_id  -- Join for the answer creator
-        LEFT JOIN
-            users uc ON c.user_id = uc.user_id  -- Join for the comment creator
-        WHERE 
-            q.question_id = %s;
-        """
-        
-        cursor.execute(query, (question_id,))
-        result = cursor.fetchall()
+        render = request.args.get('render')
+        if render is not None and render not in RENDER_MODES:
+            return jsonify({"error": "render must be one of: %s" % ", ".join(RENDER_MODES)}), 400
 
-        if not result:
+        response = cache.get_or_set(question_key(question_id), lambda: get_question_tree(question_id))
+        if response is None:
             return jsonify({"error": "Question not found"}), 404
 
-        response = {
-            "question": {
-                "question_id": result[0][0],
-                "title": result[0][1],
-                "body": result[0][2],
-                "code": result[0][3],
-                "created_at": result[0][4],
-                "updated_at": result[0][5],
-                "views": result[0][6],
-                "upvotes": result[0][7],
-                "asked_by": result[0][8],  
-            },
-            "answers": [],
-            "comments": [],
-        }
-
-        answers = {} 
-        comments = []  
-
-        for row in result:
-            if row[8]: 
-                answer = {
-                    "answer_id": row[8],
-                    "body": row[9],
-                    "code": row[10],
-                    "created_at": row[11],
-                    "updated_at": row[12],
-                    "upvotes": row[13],
-                    "asked_by": row[14],
-                    "comments": []
-                }
-                answers[row[8]] = answer 
-
-            if row[14]: 
-                comment = {
-                    "comment_id": row[14],
-                    "parent_type": row[15],
-                    "parent_id": row[16],
-                    "body": row[17],
-                    "created_at": row[18],
-                    "updated_at": row[19],
-                    "posted_by": row[20],  
-                }
-                if row[15] == 'answer' and row[16] in answers:
-                    answers[row[16]]["comments"].append(comment)  
-                elif row[15] == 'question':
-                    comments.append(comment)
-
-        response["answers"] = list(answers.values()) 
-        response["comments"] = comments
+        _record_view(question_id)
+        tree = counters.apply_to_tree(response)
+        if render:
+            with mysql.cursor() as cursor:
+                renderings = code_renderer.fetch(cursor, code_renderer.tree_digests(tree))
+            tree = code_renderer.with_renderings(tree, renderings, render)
+        return jsonify(tree), 200
 
-        return jsonify(response), 200
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
+
+@app_routes.route('/api/questions/<int:question_id>/events', methods=['GET'])
+def stream_question_events(question_id):
+    """Server-Sent Events for new and edited answers and comments on a question.
+
+    Events are ``answer_created``, ``answer_updated``, ``comment_created``,
+    ``comment_updated``, ``question_updated`` and ``question_deleted``, each
+    carrying only the changed item. A reconnect with ``Last-Event-ID`` (or
+    ``?last_event_id=``) replays what was missed; ``reset`` means the gap is
+    no longer buffered and the client should refetch the question.
+    """
+    try:
+        questions, _ = find_parents({question_id}, ())
+        if question_id not in questions:
+            return jsonify({"error": "Question not found"}), 404
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+    after = parse_last_event_id(request.headers, request.args)
+    return Response(events.stream(question_id, after), mimetype=SSE_MIMETYPE, headers=SSE_HEADERS)
 
 @app_routes.route('/api/users', methods=['GET'])
+@login_required
 def get_user_info():
-    payload, error = decode_token()
-    
-    if error:
-        return jsonify({"error": error}), 401  
-
-    user_id_from_token = payload['user_id']  
     try:
-        cursor = mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform")
-        
-        query = """
-        SELECT
-            u.user_id,
-            u.username,
-            u.email,
-            u.created_at
-        FROM
-            users u
-        WHERE
-            u.user_id = %s;
-        """
-        cursor.execute(query, (user_id_from_token,))
-        result = cursor.fetchone()
-        print(result)
-        if not result:
+        user = auth.load_users([current_user_id()]).get(current_user_id())
+        if not user:
             return jsonify({"error": "User not found"}), 404
-
-        user_info = {
-            "user_id": result[0],
-            "username": result[1],
-            "email": result[2],
-            "created_at": result[3]
-        }
-        print(user_info)
-        print("Decoded user_id: {user_id_from_token}") 
-
-
-        return jsonify(user_info), 200
+        return jsonify(user), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -302,45 +396,40 @@ def get_user_info():
 @app_routes.route('/api/questions/<int:question_id>', methods=['DELETE'])
 def delete_question(question_id):
     try:
-        cursor = mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform") 
+        with mysql.cursor() as cursor:
+            tag_ids = get_question_tag_ids(cursor, question_id)
+            revisions.delete_question(cursor, question_id)
+            cursor.execute(DELETE_QUESTION_QUERY, (question_id,))
+            mysql.connection.commit()
 
-        query = "DELETE FROM questions WHERE question_id = %s"
-        
-        cursor.execute(query, (question_id,))
-        mysql.connection.commit()
+            if cursor.rowcount == 0:
+                return jsonify({"error": "Question not found"}), 404
 
-        if cursor.rowcount == 0:
-            return jsonify({"error": "Question not found"}), 404
-        
-        cursor.close()
-        return jsonify({"message": "Question deleted successfully"}), 200
+            search_index.remove_question(question_id)
+            cache.invalidate(*question_keys(question_id))
+            leaderboards.remove_question(question_id)
+            tag_index.remove_question(question_id, tag_ids)
+            similarity_index.remove_question(question_id)
+            events.publish(question_id, "question_deleted", {"question_id": question_id})
+
+            return jsonify({"message": "Question deleted successfully"}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app_routes.route('/api/tags', methods=['GET'])
+@conditional(get_tags_version)
 def get_all_tags():
     try:
-        cursor=mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform") 
-        query = "SELECT tag_id, tag_name FROM tags "
-        cursor.execute(query)
-        mysql.connection.commit()
-        results = cursor.fetchall()
-
-        cursor.close()
-        if not results:
+        tags = cache.get_or_set(ALL_TAGS_KEY, list_tags)
+        if not tags:
             return jsonify({"message": "No tags found"}), 404
 
-        tags = [{"tag_id": row[0], "tag_name": row[1]} for row in results]
-
         return jsonify({"tags": tags}), 200
 
     except Exception as e:
             return jsonify({"error": str(e)}), 500
 
-@app_routes.route('/api/questions', methods=['GET'])
 def get_questions_by_tag():
     try:
         tag_name = request.args.get('tag')
@@ -348,54 +437,73 @@ def get_questions_by_tag():
         if not tag_name:
             return jsonify({"error": "Tag name is required"}), 400
 
-        cursor = mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform")  
-
-        query = """
-        SELECT 
-            q.question_id,
-            q.title,
-            q.body,
-            q.created_at,
-            q.updated_at,
-            q.views,
-            q.upvotes,
-            u.username AS asked_by
-        FROM 
-            questions q
-        JOIN 
-            question_tags qt ON q.question_id = qt.question_id
-        JOIN 
-            tags t ON qt.tag_id = t.tag_id
-        JOIN 
-            users u ON q.user_id = u.user_id
-        WHERE 
-            t.tag_name = %s;
-        """
-        
-        cursor.execute(query, (tag_name,))
-        results = cursor.fetchall()
+        fmt = stream_format(request)
+        page = question_paginator.parse(request.args, streaming=fmt is not None)
+        if fmt:
+            query, params = question_paginator.build(
+                TAGGED_QUESTIONS_FROM, page, where="t.tag_name = %s", params=(tag_name,))
+            return stream_page(question_paginator, page, mysql, query, params, fmt, "questions")
 
-        cursor.close()
+        with mysql.cursor() as cursor:
+            questions, next_cursor = question_paginator.fetch(
+                cursor, TAGGED_QUESTIONS_FROM, page, where="t.tag_name = %s", params=(tag_name,))
 
-        if not results:
+        if not questions and page.after is None:
             return jsonify({"message": "No questions found for this tag"}), 404
 
-        questions = [
-            {
-                "question_id": row[0],
-                "title": row[1],
-                "body": row[2],
-                "created_at": row[3],
-                "updated_at": row[4],
-                "views": row[5],
-                "upvotes": row[6],
-                "asked_by": row[7]
-            }
-            for row in results
-        ]
+        return jsonify({"questions": questions, "next_cursor": next_cursor}), 200
 
-        return jsonify({"questions": questions}), 200
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def get_questions_by_tags():
+    """``GET /api/questions?tags=a,b&mode=all|any``: questions carrying all (or any) of the tags.
+
+    The tag index resolves the tags to question ids in memory. A small
+    match becomes an IN list on the usual listing query; a large one is
+    checked against the index while scanning the listing in sort order.
+    """
+    try:
+        if stream_format(request):
+            return jsonify({"error": "stream is not supported with tags"}), 400
+        names, mode = parse_tag_query(request.args)
+        page = question_paginator.parse(request.args)
+
+        tag_index.ensure_built(mysql)
+        matches = tag_index.match(names, mode)
+        where = matches.where("q.question_id")
+        with mysql.cursor() as cursor:
+            if where is not None:
+                questions, next_cursor = question_paginator.fetch(cursor, QUESTIONS_FROM, page, *where)
+            else:
+                questions, next_cursor = question_paginator.fetch_filtered(
+                    cursor, QUESTIONS_FROM, page, lambda row: row[-1] in matches)
+
+        if not questions and page.after is None:
+            return jsonify({"message": "No questions found for these tags"}), 404
+
+        return jsonify({"questions": questions, "next_cursor": next_cursor, "total": len(matches)}), 200
+
+    except (PaginationError, TagQueryError) as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app_routes.route('/api/tags/autocomplete', methods=['GET'])
+def autocomplete_tags():
+    try:
+        prefix = request.args.get('prefix', '').strip()
+        if not prefix:
+            return jsonify({"error": "prefix is required"}), 400
+        try:
+            limit = min(max(int(request.args.get('limit', AUTOCOMPLETE_LIMIT)), 1), MAX_AUTOCOMPLETE_LIMIT)
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+
+        tag_index.ensure_built(mysql)
+        return jsonify({"tags": tag_index.autocomplete(prefix, limit)}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -403,60 +511,63 @@ def get_questions_by_tag():
 @app_routes.route('/api/questions/<int:question_id>/comments', methods=['GET'])
 def get_comments_for_question(question_id):
     try:
-        cursor = mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform") 
-        query = """
-        SELECT 
-            c.comment_id,
-            c.parent_type,
-            c.parent_id,
-            c.body,
-            c.created_at,
-            c.updated_at,
-            u.username AS commented_by
-        FROM 
-            comments c
-        JOIN
-            users u ON c.user_id = u.user_id
-        WHERE
-            c.parent_type = 'question' AND c.parent_id = %s;
-        """
-
-        cursor.execute(query, (question_id,))
-        result = cursor.fetchall()
-
-        if not result:
+        comments = cache.get_or_set(question_comments_key(question_id),
+                                    lambda: get_question_comments(question_id))
+        if not comments:
             return jsonify({"message": "No comments found for this question"}), 404
 
-        comments = [
-            {
-                "comment_id": row[0],
-                "parent_type": row[1],
-                "parent_id": row[2],
-                "body": row[3],
-                "created_at": row[4],
-                "updated_at": row[5],
-                "commented_by": row[6]
-            }
-            for row in result
-        ]
-
         return jsonify({"comments": comments}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def _tag_names(value):
+    """Validates the ``tags`` of a new question, given as a list or a comma-separated string."""
+    if value is None:
+        return [], None
+    if isinstance(value, str):
+        value = value.split(",")
+    if not isinstance(value, list) or not all(isinstance(name, str) for name in value):
+        return None, "tags must be a list of tag names"
+    names = []
+    for name in value:
+        name = name.strip()
+        if name and name.lower() not in (n.lower() for n in names):
+            names.append(name)
+    if len(names) > MAX_QUESTION_TAGS:
+        return None, "At most %d tags per question" % MAX_QUESTION_TAGS
+    if any(len(name) > MAX_TAG_LENGTH for name in names):
+        return None, "Tag names are at most %d characters" % MAX_TAG_LENGTH
+    return names, None
+
+@app_routes.route('/api/questions/similar', methods=['POST'])
+def find_similar_questions():
+    """Likely duplicates of a draft question, for checking before it is posted."""
+    try:
+        data = request.get_json(silent=True)
+        if not data:
+            return jsonify({"error": "Missing request body"}), 400
+
+        title = data.get("title")
+        body = data.get("body", data.get("description"))
+        code = data.get("code")
+        if not title and not body:
+            return jsonify({"error": "Title or description is required"}), 400
+        limit = data.get("limit", SIMILAR_LIMIT)
+        if not isinstance(limit, int) or not 1 <= limit <= MAX_SIMILAR_LIMIT:
+            return jsonify({"error": "limit must be between 1 and %d" % MAX_SIMILAR_LIMIT}), 400
+
+        return jsonify({"similar": _similar_questions(title, body, code, limit)}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app_routes.route('/api/uploadquestion', methods=['POST'])
+@login_required
 def upload_question():
     try:
-        payload, error = decode_token()
-        if error:
-            return jsonify({"error": error}), 401
-
-        user_id = payload.get("user_id")
-        if not user_id:
-            return jsonify({"error": "Invalid token"}), 401
+        user_id = current_user_id()
 
         data = request.json
         if not data:
@@ -465,47 +576,58 @@ def upload_question():
         title = data.get("title")
         description = data.get("description")
         code_snippet = data.get("code")
+        tag_names, error = _tag_names(data.get("tags"))
 
         if not title or not description:
             return jsonify({"error": "Title and description are required"}), 400
+        if error:
+            return jsonify({"error": error}), 400
 
-        cursor = mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform")
-        
-        query = """
-        INSERT INTO questions (user_id, title, body, code, created_at)
-        VALUES (%s, %s, %s, %s, NOW())
-        """
-        cursor.execute(query, (user_id, title, description, code_snippet))
-
-        mysql.connection.commit()
-        print("Commit successful")
-
-        question_id = cursor.lastrowid
-        cursor.close()
+        # With check_similar set, likely duplicates are returned instead of posting.
+        if data.get("check_similar"):
+            similar = _similar_questions(title, description, code_snippet)
+            if similar:
+                return jsonify({"error": "Similar questions already exist", "similar": similar}), 409
 
-        return jsonify({"message": "Question submitted successfully", "question_id": question_id}), 201
+        with mysql.cursor() as cursor:
+            query = """
+            INSERT INTO questions (user_id, title, body, code, created_at)
+            VALUES (%s, %s, %s, %s, NOW())
+            """
+            cursor.execute(query, (user_id, title, description, code_snippet))
+            question_id = cursor.lastrowid
+            question_stats.touch(cursor, question_id)
+            tags = link_question_tags(cursor, question_id, tag_names)
+            if tags:
+                question_stats.set_tags(cursor, question_id, [name for _, name in tags])
+
+            mysql.connection.commit()
+
+            _render_code(cursor, code_snippet)
+            _index_similarity(cursor, question_id, title, description, code_snippet)
+            names = [name for _, name in tags]
+            search_index.index_question(question_id, title=title, body=description, code=code_snippet, tags=names)
+            leaderboards.add_question(question_id, tags=names)
+            if tags:
+                tag_index.tag_question(question_id, tags)
+                cache.invalidate(ALL_TAGS_KEY)
+
+            return jsonify({"message": "Question submitted successfully", "question_id": question_id}), 201
 
     except Exception as e:
-        print("Error:", e)
+        current_app.logger.exception("Failed to upload question")
         return jsonify({"error": str(e)}), 500
 
 @app_routes.route('/api/getuseridfromtoken', methods=['GET'])
+@login_required
 def getuserid():
-    try:
-        payload, error = decode_token()
-        if error:
-            return jsonify({"error": error}), 401
-        user_id = payload.get("user_id")
-        return jsonify({'user_id': user_id}), 200
-    except Exception as e:
-        return jsonify({"error": str(e)}), 500
+    return jsonify({'user_id': current_user_id()}), 200
     
 @app_routes.route('/api/updatequestion/<int:question_id>', methods=['PUT'])
+@login_required
 def updatequestion(question_id):
     try:
-        payload, error = decode_token()  
-        user_id = payload['user_id']   
+        user_id = current_user_id()
         
         data = request.json
         if not data:
@@ -517,47 +639,41 @@ def updatequestion(question_id):
         if not all([code, body]):
             return jsonify({"error": "Missing required fields"}), 400
 
-        cursor = mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform")
-        
-        query = """
-        SELECT user_id
-        FROM questions
-        WHERE question_id = %s;
-        """
-        cursor.execute(query, (question_id,))
-        result = cursor.fetchone()
-        
-        if not result or user_id != result[0]:
-            return jsonify({"error": "Unauthorized user"}), 403
-        
-        update_query = """
-        UPDATE questions
-        SET
-            code = %s,
-            body = %s,
-            updated_at = NOW()
-        WHERE
-            question_id = %s;
-        """
-        cursor.execute(update_query, (code, body, question_id))
-        mysql.connection.commit()
+        with mysql.cursor() as cursor:
+            cursor.execute(QUESTION_FOR_UPDATE_QUERY, (question_id,))
+            result = cursor.fetchone()
 
-        return jsonify({"message": "Question updated successfully"}), 200
-    
-    except Exception as e:
-        print(f"Error: {e}")
+            if not result or user_id != result[0]:
+                return jsonify({"error": "Unauthorized user"}), 403
+
+            revisions.record(cursor, "question", question_id, user_id,
+                             {"body": result[1], "code": result[2]}, {"body": body, "code": code})
+
+            cursor.execute(UPDATE_QUESTION_QUERY, (code, body, question_id))
+            question_stats.touch(cursor, question_id)
+            mysql.connection.commit()
+            _render_code(cursor, code)
+            _index_similarity(cursor, question_id, result[3], body, code)
+            search_index.index_question(question_id, body=body, code=code)
+            cache.invalidate(question_key(question_id))
+            events.publish(question_id, "question_updated", {
+                "question_id": question_id, "body": body, "code": code, "updated_at": datetime.datetime.now()})
+
+            return jsonify({"message": "Question updated successfully"}), 200
+
+    except Exception:
+        current_app.logger.exception("Unexpected error in %s", request.endpoint)
         return jsonify({"error": "An unexpected error occurred"}), 500
     
-    except Exception as e:
-        print(f"Error: {e}")
+    except Exception:
+        current_app.logger.exception("Unexpected error in %s", request.endpoint)
         return jsonify({"error": "An unexpected error occurred"}), 500
 
 @app_routes.route('/api/updateanswer/<int:answer_id>', methods=['PUT'])
+@login_required
 def updateanswer(answer_id):
     try:
-        payload, error = decode_token() 
-        user_id = payload['user_id']    
+        user_id = current_user_id()
         
         data = request.json
         if not data:
@@ -569,43 +685,134 @@ def updateanswer(answer_id):
         if not body:
             return jsonify({"error": "Missing required fields"}), 400
 
-        cursor = mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform")
-        
-        query = """
-        SELECT user_id
-        FROM answers
-        WHERE answer_id = %s;
-        """
-        cursor.execute(query, (answer_id,))
-        result = cursor.fetchone()
-        
-        if not result or user_id != result[0]:
-            return jsonify({"error": "Unauthorized user"}), 403
-        
-        update_query = """
-        UPDATE answers
-        SET
-            code = %s,
-            body = %s,
-            updated_at = NOW()
-        WHERE
-            answer_id = %s;
-        """
-        cursor.execute(update_query, (code ,body, answer_id))
-        mysql.connection.commit()
+        with mysql.cursor() as cursor:
+            cursor.execute(ANSWER_FOR_UPDATE_QUERY, (answer_id,))
+            result = cursor.fetchone()
 
-        return jsonify({"message": "Answer updated successfully"}), 200
+            if not result or user_id != result[0]:
+                return jsonify({"error": "Unauthorized user"}), 403
 
-    except Exception as e:
-        print(f"Error: {e}")
+            revisions.record(cursor, "answer", answer_id, user_id,
+                             {"body": result[2], "code": result[3]}, {"body": body, "code": code})
+
+            cursor.execute(UPDATE_ANSWER_QUERY, (code, body, answer_id))
+            question_stats.touch(cursor, result[1])
+            mysql.connection.commit()
+            _render_code(cursor, code)
+            search_index.index_answer(result[1], answer_id, body, code)
+            cache.invalidate(question_key(result[1]))
+            events.publish(result[1], "answer_updated", {
+                "answer_id": answer_id, "body": body, "code": code, "updated_at": datetime.datetime.now()})
+
+            return jsonify({"message": "Answer updated successfully"}), 200
+
+    except Exception:
+        current_app.logger.exception("Unexpected error in %s", request.endpoint)
         return jsonify({"error": "An unexpected error occurred"}), 500
 
+def _revision_history(target_type, target_id):
+    try:
+        with mysql.cursor() as cursor:
+            history = revisions.history(cursor, target_type, target_id)
+        if history is None:
+            return jsonify({"error": "%s not found" % target_type.capitalize()}), 404
+        return jsonify({"revisions": history}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _revision(target_type, target_id, revision):
+    try:
+        with mysql.cursor() as cursor:
+            content = revisions.content(cursor, target_type, target_id, revision)
+        if content is None:
+            return jsonify({"error": "Revision not found"}), 404
+        return jsonify(dict(content, revision=revision)), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def _revision_diff(target_type, target_id):
+    """Diffs two revisions; ``to`` defaults to the newest and ``from`` to the one before it."""
+    try:
+        from_revision, to_revision, fmt, context = parse_diff_args(request.args)
+        with mysql.cursor() as cursor:
+            if to_revision is None:
+                to_revision = revisions.latest(cursor, target_type, target_id)
+                if to_revision is None:
+                    return jsonify({"error": "%s not found" % target_type.capitalize()}), 404
+            if from_revision is None:
+                from_revision = max(to_revision - 1, 1)
+            diff = revisions.diff(cursor, target_type, target_id, from_revision, to_revision, fmt, context)
+        if diff is None:
+            return jsonify({"error": "Revision not found"}), 404
+        return jsonify({"from": from_revision, "to": to_revision, "format": fmt, "diff": diff}), 200
+
+    except RevisionError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app_routes.route('/api/questions/<int:question_id>/revisions', methods=['GET'])
+def get_question_revisions(question_id):
+    return _revision_history("question", question_id)
+
+@app_routes.route('/api/questions/<int:question_id>/revisions/<int:revision>', methods=['GET'])
+def get_question_revision(question_id, revision):
+    return _revision("question", question_id, revision)
+
+@app_routes.route('/api/questions/<int:question_id>/diff', methods=['GET'])
+def get_question_diff(question_id):
+    return _revision_diff("question", question_id)
+
+@app_routes.route('/api/answers/<int:answer_id>/revisions', methods=['GET'])
+def get_answer_revisions(answer_id):
+    return _revision_history("answer", answer_id)
+
+@app_routes.route('/api/answers/<int:answer_id>/revisions/<int:revision>', methods=['GET'])
+def get_answer_revision(answer_id, revision):
+    return _revision("answer", answer_id, revision)
+
+@app_routes.route('/api/answers/<int:answer_id>/diff', methods=['GET'])
+def get_answer_diff(answer_id):
+    return _revision_diff("answer", answer_id)
+
+def _vote(target_type, target_id):
+    try:
+        data = request.get_json(silent=True) or {}
+        value = data.get("value", 1)
+        if value not in (-1, 0, 1):
+            return jsonify({"error": "value must be -1, 0 or 1"}), 400
+
+        result = cast_vote(current_user_id(), target_type, target_id, value)
+        if result is None:
+            return jsonify({"error": "%s not found" % target_type.capitalize()}), 404
+
+        delta, question_id = result
+        counters.record_vote(target_type, target_id, delta, question_id)
+        if target_type == 'question':
+            leaderboards.record(question_id, votes=delta)
+
+        return jsonify({"message": "Vote recorded", "value": value}), 200
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app_routes.route('/api/questions/<int:question_id>/vote', methods=['POST'])
+@login_required
+def vote_question(question_id):
+    return _vote('question', question_id)
+
+@app_routes.route('/api/answers/<int:answer_id>/vote', methods=['POST'])
+@login_required
+def vote_answer(answer_id):
+    return _vote('answer', answer_id)
+
 @app_routes.route('/api/updatecomment/<int:comment_id>', methods=['PUT'])
+@login_required
 def updatecomment(comment_id):
     try:
-        payload, error = decode_token()  
-        user_id = payload['user_id']   
+        user_id = current_user_id()
         
         data = request.json
         if not data:
@@ -616,198 +823,395 @@ def updatecomment(comment_id):
         if not body:
             return jsonify({"error": "Missing required fields"}), 400
 
-        cursor = mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform")
-        
-        query = """
-        SELECT user_id
-        FROM comments
-        WHERE comment_id = %s;
-        """
-        cursor.execute(query, (comment_id,))
-        result = cursor.fetchone()
-        
-        if not result or user_id != result[0]:
-            return jsonify({"error": "Unauthorized user"}), 403
-        
-        update_query = """
-        UPDATE comments
-        SET
-            body = %s,
-            updated_at = NOW()
-        WHERE
-            comment_id = %s;
-        """
-        cursor.execute(update_query, (body, comment_id))
-        mysql.connection.commit()
-
-        return jsonify({"message": "Comment updated successfully"}), 200
-
-    except Exception as e:
-        print(f"Error: {e}")
+        with mysql.cursor() as cursor:
+            cursor.execute(COMMENT_OWNER_QUERY, (comment_id,))
+            result = cursor.fetchone()
+
+            if not result or user_id != result[0]:
+                return jsonify({"error": "Unauthorized user"}), 403
+
+            cursor.execute(UPDATE_COMMENT_QUERY, (body, comment_id))
+            question_id = result[2] if result[1] == 'question' else result[3]
+            if question_id is not None:
+                question_stats.touch(cursor, question_id)
+            mysql.connection.commit()
+            if result[1] == 'question':
+                cache.invalidate(*question_keys(result[2]))
+            elif result[3] is not None:
+                cache.invalidate(question_key(result[3]))
+            if question_id is not None:
+                events.publish(question_id, "comment_updated", {
+                    "comment_id": comment_id, "parent_type": result[1], "parent_id": result[2],
+                    "body": body, "updated_at": datetime.datetime.now()})
+
+            return jsonify({"message": "Comment updated successfully"}), 200
+
+    except Exception:
+        current_app.logger.exception("Unexpected error in %s", request.endpoint)
         return jsonify({"error": "An unexpected error occurred"}), 500
 
 @app_routes.route('/api/<int:question_id>/answers', methods=['POST'])
+@login_required
 def post_answer(question_id):
     try:
-        print(f"Received POST request to post an answer for question ID: {question_id}")
-        
         data = request.get_json()
-        print(f"Request data: {data}")
-
-        payload, error = decode_token()
-        print(f"Decoded token: {payload}, Error: {error}")
-        
-        if error:
-            return jsonify({"error": "Invalid token"}), 401
-
-        user_id = payload['user_id']
-        print(f"User ID extracted from token: {user_id}")
+        user_id = current_user_id()
 
         body = data.get("body")
         code = data.get("code", None)  
 
         if not body:
-            print("Answer body is missing")
             return jsonify({"error": "Answer body cannot be empty"}), 400
 
-        print("Attempting to insert answer into the database...")
-        cursor = mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform")
-        cursor.execute("""
-            INSERT INTO answers (question_id, user_id, body, code, created_at)
-            VALUES (%s, %s, %s, %s, NOW())
-        """, (question_id, user_id, body, code))
-        mysql.connection.commit()
-        print("Answer inserted successfully!")
-
-        return jsonify({"message": "Answer posted successfully"}), 201
+        with mysql.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO answers (question_id, user_id, body, code, created_at)
+                VALUES (%s, %s, %s, %s, NOW())
+            """, (question_id, user_id, body, code))
+            answer_id = cursor.lastrowid
+            question_stats.bump(cursor, {question_id: (1, 0)})
+            mysql.connection.commit()
+            _render_code(cursor, code)
+            search_index.index_answer(question_id, answer_id, body, code)
+            cache.invalidate(question_key(question_id))
+            events.publish(question_id, "answer_created", _answer_event(answer_id, body, code, user_id))
+
+            return jsonify({"message": "Answer posted successfully"}), 201
     except Exception as e:
-        print(f"Error occurred in post_answer: {str(e)}")
+        current_app.logger.exception("Failed to post answer to question %s", question_id)
         return jsonify({"error": str(e)}), 500
 
 @app_routes.route('/api/comments/<parent_type>/<int:parent_id>', methods=['POST'])
+@login_required
 def post_comment(parent_type, parent_id):
     try:
-        payload, error = decode_token()
-        user_id = payload['user_id']
+        user_id = current_user_id()
         data = request.get_json()
         body = data.get("body")
 
         if not body:
             return jsonify({"error": "Comment body cannot be empty"}), 400
+        if parent_type not in ('question', 'answer'):
+            return jsonify({"error": "parent_type must be 'question' or 'answer'"}), 400
+
+        questions, answers = find_parents({parent_id} if parent_type == 'question' else (),
+                                          {parent_id} if parent_type == 'answer' else ())
+        question_id = parent_id if parent_id in questions else answers.get(parent_id)
+        if question_id is None:
+            return jsonify({"error": "%s not found" % parent_type.capitalize()}), 404
+
+        with mysql.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO comments (parent_type, parent_id, user_id, body, created_at)
+                VALUES (%s, %s, %s, %s, NOW())
+            """, (parent_type, parent_id, user_id, body))
+            comment_id = cursor.lastrowid
+            question_stats.bump(cursor, {question_id: (0, 1)})
+            mysql.connection.commit()
+
+            if parent_type == 'question':
+                cache.invalidate(*question_keys(parent_id))
+            else:
+                cache.invalidate(question_key(question_id))
+            events.publish(question_id, "comment_created",
+                           _comment_event(comment_id, parent_type, parent_id, body, user_id))
+
+            return jsonify({"message": "Comment posted successfully"}), 201
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
-        cursor = mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform")
-        cursor.execute("""
-            INSERT INTO comments (parent_type, parent_id, user_id, body, created_at)
-            VALUES (%s, %s, %s, %s, NOW())
-        """, (parent_type, parent_id, user_id, body))
-        mysql.connection.commit()
+def _answer_event(answer_id, body, code, user_id):
+    """An answer_created payload shaped like the answers in the question tree."""
+    return {"answer_id": answer_id, "body": body, "code": code, "created_at": datetime.datetime.now(),
+            "updated_at": None, "upvotes": 0, "asked_by": _username(user_id)}
+
+def _comment_event(comment_id, parent_type, parent_id, body, user_id):
+    """A comment_created payload shaped like the comments in the question tree."""
+    return {"comment_id": comment_id, "parent_type": parent_type, "parent_id": parent_id, "body": body,
+            "created_at": datetime.datetime.now(), "updated_at": None, "posted_by": _username(user_id)}
+
+BATCH_WRITE_LIMIT = 1000
+
+def _batch_items(key):
+    """Returns the array under ``key`` in the JSON body, or an error message."""
+    data = request.get_json(silent=True)
+    items = data.get(key) if isinstance(data, dict) else None
+    if not isinstance(items, list) or not items:
+        return None, "%s must be a non-empty array" % key
+    if len(items) > BATCH_WRITE_LIMIT:
+        return None, "At most %d %s per request" % (BATCH_WRITE_LIMIT, key)
+    return items, None
+
+def _batch_response(results, id_field):
+    """Per-item results in request order; 201 if every item was created, 207 if some were."""
+    created = sum(1 for result in results if id_field in result)
+    status = 201 if created == len(results) else 207 if created else 400
+    return jsonify({"created": created, "failed": len(results) - created, "results": results}), status
+
+def _positive_int(value):
+    return value if isinstance(value, int) and not isinstance(value, bool) and value > 0 else None
+
+@app_routes.route('/api/answers/batch', methods=['POST'])
+@login_required
+def post_answers_batch():
+    """Posts up to BATCH_WRITE_LIMIT answers in one transaction.
+
+    Body: ``{"answers": [{"question_id": 1, "body": "...", "code": "..."}]}``.
+    Invalid items and items whose question does not exist are reported
+    with an error; the rest are inserted.
+    """
+    try:
+        user_id = current_user_id()
+        items, error = _batch_items("answers")
+        if error:
+            return jsonify({"error": error}), 400
+
+        results = [{"index": index} for index in range(len(items))]
+        valid = []
+        for index, item in enumerate(items):
+            item = item if isinstance(item, dict) else {}
+            question_id = _positive_int(item.get("question_id"))
+            body = item.get("body")
+            if question_id is None:
+                results[index]["error"] = "question_id must be a positive integer"
+            elif not body or not isinstance(body, str):
+                results[index]["error"] = "Answer body cannot be empty"
+            else:
+                valid.append((index, (question_id, user_id, body, item.get("code"))))
+
+        questions, _ = find_parents({row[0] for _, row in valid}, ())
+        for index, row in valid:
+            if row[0] not in questions:
+                results[index]["error"] = "Question not found"
+        valid = [(index, row) for index, row in valid if row[0] in questions]
+
+        if valid:
+            ids = insert_answers([row for _, row in valid])
+            with mysql.cursor() as cursor:
+                for code in {row[3] for _, row in valid}:
+                    _render_code(cursor, code)
+            for (index, (question_id, _, body, code)), answer_id in zip(valid, ids):
+                results[index]["answer_id"] = answer_id
+                search_index.index_answer(question_id, answer_id, body, code)
+                events.publish(question_id, "answer_created", _answer_event(answer_id, body, code, user_id))
+            cache.invalidate(*{question_key(row[0]) for _, row in valid})
+
+        return _batch_response(results, "answer_id")
+    except Exception as e:
+        current_app.logger.exception("Failed to post answer batch")
+        return jsonify({"error": str(e)}), 500
 
-        return jsonify({"message": "Comment posted successfully"}), 201
+@app_routes.route('/api/comments/batch', methods=['POST'])
+@login_required
+def post_comments_batch():
+    """Posts up to BATCH_WRITE_LIMIT comments in one transaction.
+
+    Body: ``{"comments": [{"parent_type": "question", "parent_id": 1, "body": "..."}]}``.
+    Invalid items and items whose parent does not exist are reported with
+    an error; the rest are inserted.
+    """
+    try:
+        user_id = current_user_id()
+        items, error = _batch_items("comments")
+        if error:
+            return jsonify({"error": error}), 400
+
+        results = [{"index": index} for index in range(len(items))]
+        valid = []
+        for index, item in enumerate(items):
+            item = item if isinstance(item, dict) else {}
+            parent_type = item.get("parent_type")
+            parent_id = _positive_int(item.get("parent_id"))
+            body = item.get("body")
+            if parent_type not in ("question", "answer"):
+                results[index]["error"] = "parent_type must be 'question' or 'answer'"
+            elif parent_id is None:
+                results[index]["error"] = "parent_id must be a positive integer"
+            elif not body or not isinstance(body, str):
+                results[index]["error"] = "Comment body cannot be empty"
+            else:
+                valid.append((index, (parent_type, parent_id, user_id, body)))
+
+        questions, answers = find_parents(
+            {row[1] for _, row in valid if row[0] == "question"},
+            {row[1] for _, row in valid if row[0] == "answer"})
+        stale_keys = set()
+        inserted = []
+        question_ids = []
+        for index, row in valid:
+            parent_type, parent_id = row[0], row[1]
+            if parent_type == "question" and parent_id in questions:
+                question_ids.append(parent_id)
+                stale_keys.update(question_keys(parent_id))
+            elif parent_type == "answer" and parent_id in answers:
+                question_ids.append(answers[parent_id])
+                stale_keys.add(question_key(answers[parent_id]))
+            else:
+                results[index]["error"] = "%s not found" % parent_type.capitalize()
+                continue
+            inserted.append((index, row))
+
+        if inserted:
+            ids = insert_comments([row for _, row in inserted], question_ids)
+            for (index, (parent_type, parent_id, _, body)), comment_id, question_id in zip(inserted, ids, question_ids):
+                results[index]["comment_id"] = comment_id
+                events.publish(question_id, "comment_created",
+                               _comment_event(comment_id, parent_type, parent_id, body, user_id))
+            cache.invalidate(*stale_keys)
+
+        return _batch_response(results, "comment_id")
     except Exception as e:
+        current_app.logger.exception("Failed to post comment batch")
         return jsonify({"error": str(e)}), 500
 
 @app_routes.route('/api/user/myquestions', methods=['GET'])
+@login_required
 def get_user_questions():
     try:
-        payload, error = decode_token()
-        user_id = payload['user_id']
-        # Establish a database connection
-        cursor = mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform") 
-
-        query = """
-        SELECT 
-            q.question_id,
-            q.title,
-            q.body,
-            q.created_at,
-            q.updated_at,
-            q.upvotes,
-            u.username AS asked_by
-        FROM 
-            questions q
-        JOIN 
-            users u ON q.user_id = u.user_id
-        WHERE 
-            q.user_id = %s;
-        """
-
-        cursor.execute(query, (user_id,))
-        
-        result = cursor.fetchall()
+        user_id = current_user_id()
 
-        if not result:
-            return jsonify({"error": "No questions found for this user"}), 404
+        fmt = stream_format(request)
+        page = user_question_paginator.parse(request.args, streaming=fmt is not None)
+        if fmt:
+            query, params = user_question_paginator.build(
+                QUESTIONS_FROM, page, where="q.user_id = %s", params=(user_id,))
+            return stream_page(user_question_paginator, page, mysql, query, params, fmt, "questions")
 
-        questions = []
-        for row in result:
-            questions.append({
-                "question_id": row[0],
-                "title": row[1],
-                "body": row[2],
-                "created_at": row[3],
-                "updated_at": row[4],
-                "upvotes": row[5],
-                "asked_by": row[6],
-            })
+        with mysql.cursor() as cursor:
+            questions, next_cursor = user_question_paginator.fetch(
+                cursor, QUESTIONS_FROM, page, where="q.user_id = %s", params=(user_id,))
 
-        return jsonify({"questions": questions}), 200
+        if not questions and page.after is None:
+            return jsonify({"error": "No questions found for this user"}), 404
+
+        return jsonify({"questions": questions, "next_cursor": next_cursor}), 200
 
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+def _nest_answer(row):
+    row["answer"] = {
+        "answer_id": row.pop("answer_id"),
+        "body": row.pop("answer_body"),
+        "created_at": row.pop("answer_created_at"),
+    }
+    return row
+
 @app_routes.route('/api/my-answered-questions', methods=['GET'])
+@login_required
 def get_answered_questions():
     try:
-        payload, error = decode_token()
-        user_id = payload['user_id']
+        user_id = current_user_id()
 
-        cursor = mysql.connection.cursor()
-        cursor.execute("USE questionanswerplatform")  
+        fmt = stream_format(request)
+        page = answered_question_paginator.parse(request.args, streaming=fmt is not None)
+        if fmt:
+            query, params = answered_question_paginator.build(
+                ANSWERED_QUESTIONS_FROM, page, where="a.user_id = %s", params=(user_id,))
+            return stream_page(answered_question_paginator, page, mysql, query, params, fmt, "questions",
+                               transform=_nest_answer)
 
-        
-        cursor.execute("""
-            SELECT 
-                q.question_id,
-                q.title,
-                q.body,
-                q.code,
-                q.created_at,
-                q.updated_at,
-                a.answer_id,
-                a.body AS answer_body,
-                a.created_at AS answer_created_at
-            FROM questions q
-            JOIN answers a ON q.question_id = a.question_id
-            WHERE a.user_id = %s
-        """, (user_id,))
-        
-        result = cursor.fetchall()
-        
-        if not result:
-            return jsonify({"message": "You haven't answered any questions."}), 200
-        
-        questions = []
-        for row in result:
-            question = {
-                "question_id": row[0],
-                "title": row[1],
-                "body": row[2],
-                "code": row[3],
-                "created_at": row[4],
-                "updated_at": row[5],
-                "answer": {
-                    "answer_id": row[6],
-                    "body": row[7],
-                    "created_at": row[8]
-                }
-            }
-            questions.append(question)
-        
-        return jsonify(questions), 200
+        with mysql.cursor() as cursor:
+            rows, next_cursor = answered_question_paginator.fetch(
+                cursor, ANSWERED_QUESTIONS_FROM, page, where="a.user_id = %s", params=(user_id,))
+
+        questions = [_nest_answer(row) for row in rows]
+
+        response = {"questions": questions, "next_cursor": next_cursor}
+        if not questions and page.after is None:
+            response["message"] = "You haven't answered any questions."
+        return jsonify(response), 200
+
+    except PaginationError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app_routes.route('/api/search', methods=['GET'])
+def search_questions():
+    try:
+        query = request.args.get('q', '').strip()
+        if not query:
+            return jsonify({"error": "Search query is required"}), 400
+
+        try:
+            limit = int(request.args.get('limit', 20))
+        except ValueError:
+            return jsonify({"error": "limit must be an integer"}), 400
+        limit = max(1, min(limit, 100))
+        prefix = request.args.get('prefix', '').lower() in ('1', 'true')
+
+        if search_index.reloader.due():
+            with mysql.cursor() as cursor:
+                search_index.ensure_built(cursor)
+
+        total, results = search_index.search(query, limit=limit, prefix_last=prefix)
+        return jsonify({"query": query, "total": total, "results": results}), 200
 
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+@app_routes.route('/api/_debug/pool', methods=['GET'])
+def get_pool_status():
+    if not current_app.debug:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(mysql.status()), 200
+
+@app_routes.route('/api/_debug/cache', methods=['GET'])
+def get_cache_status():
+    if not current_app.debug:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(cache.stats()), 200
+
+@app_routes.route('/api/_debug/auth', methods=['GET'])
+def get_auth_status():
+    if not current_app.debug:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(auth.stats()), 200
+
+@app_routes.route('/api/_debug/passwords', methods=['GET'])
+def get_password_hasher_status():
+    if not current_app.debug:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(passwords.status()), 200
+
+@app_routes.route('/api/_debug/events', methods=['GET'])
+def get_event_bus_status():
+    if not current_app.debug:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(events.stats()), 200
+
+@app_routes.route('/api/_debug/tags', methods=['GET'])
+def get_tag_index_status():
+    if not current_app.debug:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(tag_index.stats()), 200
+
+@app_routes.route('/api/_debug/code-renderer', methods=['GET'])
+def get_code_renderer_status():
+    if not current_app.debug:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(code_renderer.stats()), 200
+
+@app_routes.route('/api/_debug/revisions', methods=['GET'])
+def get_revision_store_status():
+    if not current_app.debug:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(revisions.stats()), 200
+
+@app_routes.route('/api/_debug/similarity', methods=['GET'])
+def get_similarity_index_status():
+    if not current_app.debug:
+        return jsonify({"error": "Not found"}), 404
+    return jsonify(similarity_index.stats()), 200
+
+@app_routes.route('/api/_debug/queries', methods=['GET'])
+def get_query_profile():
+    # Profiling is switched once at startup; without it there is nothing to report.
+    if not current_app.debug or not profiler.enabled:
+        return jsonify({"error": "Not found"}), 404
+    if request.args.get('reset', '').lower() in ('1', 'true'):
+        profiler.reset()
+    return jsonify(profiler.snapshot()), 200
@@ -0,0 +1,104 @@
+import time
+from datetime import datetime
+
+from flask.json.provider import DefaultJSONProvider
+from werkzeug.http import http_date
+
+try:
+    import orjson
+except ImportError:  # the standard library encoder is used instead
+    orjson = None
+
+
+_DAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
+
+def format_datetime(value):
+    """Formats a datetime the way Flask's JSON provider does.
+
+    Naive datetimes, which is what MySQL DATETIME columns return, take a
+    direct formatting path several times faster than ``http_date``.
+    """
+    if value is None:
+        return None
+    if isinstance(value, datetime) and value.tzinfo is None:
+        return "%s, %02d %s %04d %02d:%02d:%02d GMT" % (
+            _DAYS[value.weekday()], value.day, _MONTHS[value.month - 1], value.year,
+            value.hour, value.minute, value.second)
+    return http_date(value)
+
+
+def split_list(value):
+    """Splits a comma-separated column such as question_stats.tags into a list."""
+    return value.split(",") if value else []
+
+
+class RowMapper:
+    """Maps the rows of one query to dicts, compiled once from the column list.
+
+    ``fields`` names the selected columns in order. The generated function
+    is a single dict display indexing the row tuple, so there is no per-row
+    zip() or per-key loop. Columns listed in ``dates`` are formatted at map
+    time and columns in ``lists`` are split on commas, leaving only
+    JSON-native values for the encoder.
+    """
+
+    def __init__(self, fields, dates=(), lists=()):
+        self.fields = tuple(fields)
+        self.dates = frozenset(dates) & frozenset(self.fields)
+        self.lists = frozenset(lists) & frozenset(self.fields)
+        items = []
+        for index, field in enumerate(self.fields):
+            value = "row[%d]" % index
+            if field in self.dates:
+                value = "_date(%s)" % value
+            elif field in self.lists:
+                value = "_list(%s)" % value
+            items.append("%r: %s" % (field, value))
+        namespace = {"_date": format_datetime, "_list": split_list}
+        exec("def map_row(row):\n    return {%s}\n" % ", ".join(items), namespace)
+        self.map = namespace["map_row"]
+
+    def __call__(self, row):
+        return self.map(row)
+
+    def many(self, rows):
+        map_row = self.map
+        return [map_row(row) for row in rows]
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider that encodes with orjson when it is installed.
+
+    Output matches the default provider: keys are sorted and datetimes
+    left in the data still go through ``default`` as HTTP dates. When
+    ``timer`` is set, it is called with the seconds spent building each
+    JSON response.
+    """
+
+    timer = None
+
+    if orjson is not None:
+        option = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+        def dumps(self, obj, **kwargs):
+            if kwargs:
+                return super().dumps(obj, **kwargs)
+            return orjson.dumps(obj, default=self.default, option=self.option).decode()
+
+        def _response(self, args, kwargs):
+            obj = self._prepare_response_obj(args, kwargs)
+            body = orjson.dumps(obj, default=self.default, option=self.option | orjson.OPT_APPEND_NEWLINE)
+            return self._app.response_class(body, mimetype=self.mimetype)
+    else:
+        def _response(self, args, kwargs):
+            return super().response(*args, **kwargs)
+
+    def response(self, *args, **kwargs):
+        if self.timer is None:
+            return self._response(args, kwargs)
+        started = time.perf_counter()
+        response = self._response(args, kwargs)
+        self.timer(time.perf_counter() - started)
+        return response
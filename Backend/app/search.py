@@ -0,0 +1,259 @@
+import bisect
+import math
+import re
+import threading
+
+import click
+
+from app.reload import DEFAULT_RELOAD_INTERVAL, Reloader
+
+TOKEN_RE = re.compile(r"[a-z0-9_]+(?:[+#]+)?")
+
+FIELD_WEIGHTS = {
+    "title": 3.0,
+    "tags": 2.0,
+    "body": 1.0,
+    "code": 1.0,
+    "answers": 0.5,
+}
+
+EXCERPT_LENGTH = 200
+
+
+def tokenize(text):
+    """Lowercases text and splits it into terms, keeping names like c++ and c#."""
+    if not text:
+        return []
+    return TOKEN_RE.findall(text.lower())
+
+
+class _Document:
+    __slots__ = ("title", "excerpt", "body", "code", "tags", "answers", "terms", "length")
+
+    def __init__(self, title, body, code, tags):
+        self.title = title
+        self.body = body
+        self.code = code
+        self.excerpt = (body or "")[:EXCERPT_LENGTH]
+        self.tags = list(tags)
+        self.answers = {}
+        self.terms = {}
+        self.length = 0.0
+
+
+class SearchIndex:
+    """In-memory inverted index over questions, ranked with BM25.
+
+    Each question is one document made of its title, body, code, tags and
+    the text of its answers, with per-field weights applied to term
+    frequencies. Results carry the title, an excerpt and the tags, so queries
+    are answered without touching MySQL. The index lives in the worker
+    process; it is filled by ``rebuild()`` and kept current by the write
+    routes. Writes that arrive while a rebuild is reading MySQL are logged
+    and replayed onto the rebuilt index, so they are not lost in the swap.
+    ``reloader`` rebuilds it periodically to pick up other workers' writes.
+    """
+
+    def __init__(self, k1=1.2, b=0.75):
+        self.k1 = k1
+        self.b = b
+        self.built = False
+        self._docs = {}
+        self._postings = {}
+        self._vocabulary = []
+        self._total_length = 0.0
+        self._lock = threading.RLock()
+        self.reloader = Reloader()
+        self._replay = None
+
+    def init_app(self, app):
+        app.config.setdefault('INDEX_RELOAD_INTERVAL', DEFAULT_RELOAD_INTERVAL)
+        self.reloader.interval = app.config['INDEX_RELOAD_INTERVAL']
+        app.extensions['search_index'] = self
+
+        @app.cli.command('rebuild-search-index')
+        def rebuild_search_index():
+            """Rebuilds the search index from MySQL."""
+            from app.extensions import mysql
+            with mysql.cursor() as cursor:
+                count = self.rebuild(cursor)
+            click.echo("Indexed %d questions" % count)
+
+    def __len__(self):
+        return len(self._docs)
+
+    def ensure_built(self, cursor):
+        self.reloader.ensure(lambda: self._rebuild(cursor))
+
+    def rebuild(self, cursor):
+        """Replaces the index contents with every question and answer in the database."""
+        return self.reloader.rebuild(lambda: self._rebuild(cursor))
+
+    def _rebuild(self, cursor):
+        with self._lock:
+            self._replay = []
+        try:
+            docs = self._load(cursor)
+            with self._lock:
+                self._docs = {}
+                self._postings = {}
+                self._total_length = 0.0
+                for question_id, doc in docs.items():
+                    self._add(question_id, doc, sort=False)
+                self._vocabulary = sorted(self._postings)
+                for apply, args in self._replay:
+                    apply(*args)
+                self.built = True
+        finally:
+            with self._lock:
+                self._replay = None
+        return len(docs)
+
+    def _write(self, apply, *args):
+        with self._lock:
+            if self._replay is not None:
+                self._replay.append((apply, args))
+            apply(*args)
+
+    @staticmethod
+    def _load(cursor):
+        cursor.execute("SELECT question_id, title, body, code FROM questions")
+        docs = {row[0]: _Document(row[1], row[2], row[3], ()) for row in cursor.fetchall()}
+
+        cursor.execute("""
+            SELECT qt.question_id, t.tag_name
+            FROM question_tags qt
+            JOIN tags t ON qt.tag_id = t.tag_id
+        """)
+        for question_id, tag_name in cursor.fetchall():
+            if question_id in docs:
+                docs[question_id].tags.append(tag_name)
+
+        cursor.execute("SELECT answer_id, question_id, body, code FROM answers")
+        for answer_id, question_id, body, code in cursor.fetchall():
+            if question_id in docs:
+                docs[question_id].answers[answer_id] = (body, code)
+        return docs
+
+    def _analyze(self, doc):
+        terms = {}
+        fields = {
+            "title": doc.title,
+            "tags": " ".join(doc.tags),
+            "body": doc.body,
+            "code": doc.code,
+            "answers": " ".join(" ".join(filter(None, a)) for a in doc.answers.values()),
+        }
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for term in tokenize(text):
+                terms[term] = terms.get(term, 0.0) + weight
+        return terms
+
+    def _add(self, question_id, doc, sort=True):
+        doc.terms = self._analyze(doc)
+        doc.length = sum(doc.terms.values())
+        self._docs[question_id] = doc
+        self._total_length += doc.length
+        for term, tf in doc.terms.items():
+            postings = self._postings.get(term)
+            if postings is None:
+                postings = self._postings[term] = {}
+                if sort:
+                    bisect.insort(self._vocabulary, term)
+            postings[question_id] = tf
+
+    def _remove(self, question_id):
+        doc = self._docs.pop(question_id, None)
+        if doc is None:
+            return None
+        self._total_length -= doc.length
+        for term in doc.terms:
+            postings = self._postings[term]
+            del postings[question_id]
+            if not postings:
+                del self._postings[term]
+                del self._vocabulary[bisect.bisect_left(self._vocabulary, term)]
+        return doc
+
+    def index_question(self, question_id, title=None, body=None, code=None, tags=None):
+        """Adds a question or updates the given fields of an indexed one."""
+        self._write(self._index_question, question_id, title, body, code, tags)
+
+    def _index_question(self, question_id, title, body, code, tags):
+        old = self._remove(question_id)
+        if old is None:
+            doc = _Document(title, body, code, tags or ())
+        else:
+            doc = _Document(old.title if title is None else title,
+                            old.body if body is None else body,
+                            old.code if code is None else code,
+                            old.tags if tags is None else tags)
+            doc.answers = old.answers
+        self._add(question_id, doc)
+
+    def index_answer(self, question_id, answer_id, body, code):
+        """Adds or replaces an answer's text on its question's document."""
+        self._write(self._index_answer, question_id, answer_id, body, code)
+
+    def _index_answer(self, question_id, answer_id, body, code):
+        doc = self._remove(question_id)
+        if doc is None:
+            return
+        doc.answers[answer_id] = (body, code)
+        self._add(question_id, doc)
+
+    def remove_question(self, question_id):
+        self._write(self._remove, question_id)
+
+    def _expand(self, term):
+        start = bisect.bisect_left(self._vocabulary, term)
+        end = bisect.bisect_left(self._vocabulary, term + "\uffff")
+        return self._vocabulary[start:end]
+
+    def search(self, query, limit=20, prefix_last=False):
+        """Returns ``(total, results)`` for a free-text query.
+
+        A term ending in ``*`` matches every indexed term with that prefix, as
+        does the last term when ``prefix_last`` is set.
+        """
+        pieces = query.split()
+        groups = []
+        for i, piece in enumerate(pieces):
+            is_prefix = piece.endswith("*") or (prefix_last and i == len(pieces) - 1)
+            for term in tokenize(piece):
+                groups.append((term, is_prefix))
+
+        with self._lock:
+            n = len(self._docs)
+            if not n or not groups:
+                return 0, []
+            avg_length = self._total_length / n
+            scores = {}
+            for term, is_prefix in groups:
+                best = {}
+                for candidate in (self._expand(term) if is_prefix else [term]):
+                    postings = self._postings.get(candidate)
+                    if not postings:
+                        continue
+                    idf = math.log(1 + (n - len(postings) + 0.5) / (len(postings) + 0.5))
+                    for question_id, tf in postings.items():
+                        norm = self.k1 * (1 - self.b + self.b * self._docs[question_id].length / avg_length)
+                        score = idf * tf * (self.k1 + 1) / (tf + norm)
+                        if score > best.get(question_id, 0.0):
+                            best[question_id] = score
+                for question_id, score in best.items():
+                    scores[question_id] = scores.get(question_id, 0.0) + score
+
+            ranked = sorted(scores.items(), key=lambda item: (-item[1], -item[0]))[:limit]
+            results = []
+            for question_id, score in ranked:
+                doc = self._docs[question_id]
+                results.append({
+                    "question_id": question_id,
+                    "title": doc.title,
+                    "excerpt": doc.excerpt,
+                    "tags": list(doc.tags),
+                    "score": round(score, 4),
+                })
+        return len(scores), results
@@ -0,0 +1,280 @@
+import heapq
+import multiprocessing
+import os
+import random
+import re
+import threading
+import time
+import zlib
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+
+import click
+
+from app.reload import DEFAULT_RELOAD_INTERVAL, Reloader
+from app.search import tokenize
+
+# Bump when shingling or hashing changes; older stored signatures are then ignored.
+SIGNATURE_VERSION = 1
+NUM_PERM = 128
+# 64 bands of 2 rows: a pair with Jaccard similarity s shares a band with
+# probability 1 - (1 - s^2)^64, about 0.998 at the default min score of 0.3,
+# 0.93 at 0.2 and 0.006 at 0.01, so unrelated questions are rarely scored.
+BANDS = 64
+ROWS = NUM_PERM // BANDS
+TEXT_SHINGLE = 3
+CODE_SHINGLE = 5
+MAX_SHINGLE_CHARS = 20000
+SIMILAR_LIMIT = 5
+MAX_SIMILAR_LIMIT = 20
+REBUILD_BATCH_SIZE = 1000
+LOAD_CHUNK_SIZE = 10000
+STORE_BATCH_ROWS = 500
+
+LOAD_QUERY = """
+    SELECT s.question_id, q.title, s.signature
+    FROM question_signatures s
+    JOIN questions q ON q.question_id = s.question_id
+    WHERE s.signature_version = %s
+"""
+
+REBUILD_BATCH_QUERY = """
+    SELECT question_id, title, body, code FROM questions
+    WHERE question_id > %s ORDER BY question_id LIMIT %s
+"""
+
+DELETE_SIGNATURE_QUERY = "DELETE FROM question_signatures WHERE question_id = %s"
+
+CODE_TOKEN_RE = re.compile(r"\w+|[^\w\s]")
+
+_PRIME = (1 << 61) - 1
+# Fixed seed: signatures are stored, so every process must draw the same permutations.
+_rng = random.Random(0x6D696E68)
+PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(NUM_PERM)]
+del _rng
+
+
+def _ngrams(tokens, n):
+    if len(tokens) < n:
+        return [" ".join(tokens)] if tokens else []
+    return [" ".join(tokens[i:i + n]) for i in range(len(tokens) - n + 1)]
+
+
+def shingles(title, body, code):
+    """Hashes of the word 3-grams of title and body and the token 5-grams of code."""
+    text = tokenize("%s %s" % (title or "", (body or "")[:MAX_SHINGLE_CHARS]))
+    code_tokens = CODE_TOKEN_RE.findall((code or "")[:MAX_SHINGLE_CHARS])
+    hashes = {zlib.crc32(shingle.encode("utf-8")) for shingle in _ngrams(text, TEXT_SHINGLE)}
+    # Code shingles are seeded differently so identical text in prose and code does not collide.
+    hashes.update(zlib.crc32(shingle.encode("utf-8"), 1) for shingle in _ngrams(code_tokens, CODE_SHINGLE))
+    return hashes
+
+
+def signature(title, body, code):
+    """The MinHash signature of a question, or None if it has no shingles."""
+    hashes = shingles(title, body, code)
+    if not hashes:
+        return None
+    return array("I", [min([(a * h + b) % _PRIME for h in hashes]) & 0xFFFFFFFF for a, b in PERMUTATIONS])
+
+
+def _signature_row(row):
+    question_id, title, body, code = row
+    sig = signature(title, body, code)
+    return question_id, None if sig is None else sig.tobytes()
+
+
+def _band_keys(sig):
+    return [hash(tuple(sig[band * ROWS:(band + 1) * ROWS])) for band in range(BANDS)]
+
+
+def estimate_similarity(a, b):
+    """Estimated Jaccard similarity of two questions' shingle sets."""
+    return sum(1 for x, y in zip(a, b) if x == y) / NUM_PERM
+
+
+class SimilarityIndex:
+    """Finds likely duplicate questions with MinHash signatures and locality-sensitive hashing.
+
+    Each question's title, body and code are shingled and reduced to a
+    NUM_PERM-value MinHash signature, stored in ``question_signatures`` and
+    split into BANDS bands in memory. Only questions sharing a whole band
+    with the query are scored, so a lookup touches a handful of candidates
+    rather than every question. ``SIMILARITY_MIN_SCORE`` is the estimated
+    Jaccard similarity a candidate needs to be reported.
+
+    The write routes call ``index_question()``; ``ensure_built()`` loads the
+    stored signatures on first use and reloads them every
+    ``INDEX_RELOAD_INTERVAL`` seconds, and ``flask rebuild-similarity-index``
+    recomputes all of them with a process pool.
+    """
+
+    def __init__(self):
+        self.min_score = 0.3
+        self.built = False
+        self._lock = threading.Lock()
+        self.reloader = Reloader()
+        self._signatures = {}
+        self._titles = {}
+        self._bands = [{} for _ in range(BANDS)]
+        self.queries = 0
+        self.candidates = 0
+
+    def init_app(self, app, pool):
+        app.config.setdefault('SIMILARITY_MIN_SCORE', 0.3)
+        app.config.setdefault('INDEX_RELOAD_INTERVAL', DEFAULT_RELOAD_INTERVAL)
+        self.min_score = app.config['SIMILARITY_MIN_SCORE']
+        self.reloader.interval = app.config['INDEX_RELOAD_INTERVAL']
+        app.extensions['similarity_index'] = self
+
+        @app.cli.command('rebuild-similarity-index')
+        @click.option('--workers', type=int, default=os.cpu_count(), show_default=True,
+                      help='Worker processes computing signatures.')
+        @click.option('--batch-size', type=int, default=REBUILD_BATCH_SIZE, show_default=True)
+        def rebuild_similarity_index(workers, batch_size):
+            """Recomputes and stores the MinHash signature of every question."""
+            self.rebuild(pool, workers, batch_size, click.echo)
+
+    # In-memory index
+
+    def _add(self, question_id, title, sig):
+        self._remove(question_id)
+        self._signatures[question_id] = sig
+        self._titles[question_id] = title
+        for band, key in zip(self._bands, _band_keys(sig)):
+            band.setdefault(key, set()).add(question_id)
+
+    def _remove(self, question_id):
+        sig = self._signatures.pop(question_id, None)
+        self._titles.pop(question_id, None)
+        if sig is None:
+            return
+        for band, key in zip(self._bands, _band_keys(sig)):
+            bucket = band.get(key)
+            if bucket is not None:
+                bucket.discard(question_id)
+                if not bucket:
+                    del band[key]
+
+    def load(self, pool):
+        """Replaces the in-memory index with the stored signatures."""
+        signatures, titles = {}, {}
+        for rows in pool.iter_chunks(LOAD_QUERY, (SIGNATURE_VERSION,), chunk_size=LOAD_CHUNK_SIZE):
+            for question_id, title, data in rows:
+                sig = array("I")
+                sig.frombytes(bytes(data))
+                signatures[question_id] = sig
+                titles[question_id] = title
+
+        bands = [{} for _ in range(BANDS)]
+        for question_id, sig in signatures.items():
+            for band, key in zip(bands, _band_keys(sig)):
+                band.setdefault(key, set()).add(question_id)
+
+        with self._lock:
+            self._signatures = signatures
+            self._titles = titles
+            self._bands = bands
+            self.built = True
+        return len(signatures)
+
+    def ensure_built(self, pool):
+        self.reloader.ensure(lambda: self.load(pool))
+
+    # Writes
+
+    @staticmethod
+    def _store(cursor, rows):
+        """Upserts ``[(question_id, signature_bytes)]`` into question_signatures."""
+        for start in range(0, len(rows), STORE_BATCH_ROWS):
+            chunk = rows[start:start + STORE_BATCH_ROWS]
+            cursor.execute("""
+                INSERT INTO question_signatures (question_id, signature_version, signature)
+                VALUES {}
+                ON DUPLICATE KEY UPDATE
+                    signature_version = VALUES(signature_version),
+                    signature = VALUES(signature)
+            """.format(", ".join(["(%s, %s, %s)"] * len(chunk))),
+                [value for question_id, data in chunk for value in (question_id, SIGNATURE_VERSION, data)])
+
+    def index_question(self, cursor, question_id, title, body, code):
+        """Stores a question's signature on the caller's cursor and adds it to the index. The caller commits."""
+        sig = signature(title, body, code)
+        if sig is None:
+            cursor.execute(DELETE_SIGNATURE_QUERY, (question_id,))
+            self.remove_question(question_id)
+            return
+        self._store(cursor, [(question_id, sig.tobytes())])
+        with self._lock:
+            self._add(question_id, title, sig)
+
+    def remove_question(self, question_id):
+        with self._lock:
+            self._remove(question_id)
+
+    # Queries
+
+    def similar(self, title, body, code, limit=SIMILAR_LIMIT, exclude=None):
+        """The ``limit`` indexed questions most similar to the given text, best first."""
+        sig = signature(title, body, code)
+        if sig is None:
+            return []
+        keys = _band_keys(sig)
+        with self._lock:
+            candidates = set()
+            for band, key in zip(self._bands, keys):
+                bucket = band.get(key)
+                if bucket:
+                    candidates.update(bucket)
+            candidates.discard(exclude)
+            scored = [(estimate_similarity(sig, self._signatures[question_id]), question_id)
+                      for question_id in candidates]
+            top = heapq.nlargest(limit, (item for item in scored if item[0] >= self.min_score))
+            titles = {question_id: self._titles[question_id] for _, question_id in top}
+            self.queries += 1
+            self.candidates += len(candidates)
+        return [{"question_id": question_id, "title": titles[question_id], "score": round(score, 3)}
+                for score, question_id in top]
+
+    # Bulk rebuild
+
+    def rebuild(self, pool, workers, batch_size, echo):
+        """Recomputes every question's signature ``workers`` processes at a time, then reloads the index."""
+        started = time.perf_counter()
+        total = stored = 0
+        after = 0
+        with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as executor:
+            while True:
+                with pool.checkout() as conn:
+                    with conn.cursor() as cursor:
+                        cursor.execute(REBUILD_BATCH_QUERY, (after, batch_size))
+                        rows = cursor.fetchall()
+                if not rows:
+                    break
+                after = rows[-1][0]
+                results = [(question_id, data)
+                           for question_id, data in executor.map(_signature_row, rows, chunksize=64)
+                           if data is not None]
+                if results:
+                    with pool.checkout() as conn:
+                        with conn.cursor() as cursor:
+                            self._store(cursor, results)
+                        conn.commit()
+                total += len(rows)
+                stored += len(results)
+                echo("Signed %d questions (%.0f questions/s)" % (total, total / (time.perf_counter() - started)))
+        count = self.load(pool)
+        echo("Stored %d signatures for %d questions in %.1f s; %d indexed" % (
+            stored, total, time.perf_counter() - started, count))
+
+    def stats(self):
+        with self._lock:
+            return {
+                "built": self.built,
+                "reloads": self.reloader.reloads,
+                "questions": len(self._signatures),
+                "buckets": sum(len(band) for band in self._bands),
+                "queries": self.queries,
+                "avg_candidates": self.candidates / self.queries if self.queries else 0.0,
+                "min_score": self.min_score,
+            }
@@ -0,0 +1,78 @@
+from flask import Response, current_app
+from werkzeug.wsgi import ClosingIterator
+
+from app.pagination import PaginationError, encode_cursor
+
+STREAM_CHUNK_ROWS = 500
+STREAM_FORMATS = ("json", "ndjson")
+NDJSON_MIMETYPE = "application/x-ndjson"
+
+
+def stream_format(request):
+    """Returns ``json`` or ``ndjson`` if the request asks for a streamed response, else None.
+
+    Streaming is requested with ``?stream=json|ndjson`` or an
+    ``Accept: application/x-ndjson`` header.
+    """
+    fmt = request.args.get('stream')
+    if fmt is None:
+        if request.accept_mimetypes.best == NDJSON_MIMETYPE:
+            return "ndjson"
+        return None
+    if fmt not in STREAM_FORMATS:
+        raise PaginationError("stream must be one of: %s" % ", ".join(STREAM_FORMATS))
+    return fmt
+
+
+def _encode(chunks, to_item, dumps, fmt, key, page):
+    width = len(page.fields)
+    remaining = page.limit
+    last_row = None
+    more = False
+    first = True
+
+    if fmt == "json":
+        yield '{"%s": [' % key
+    for rows in chunks:
+        if remaining is not None:
+            if len(rows) > remaining:
+                more = True
+                rows = rows[:remaining]
+            remaining -= len(rows)
+        if rows:
+            parts = [dumps(to_item(row)) for row in rows]
+            if fmt == "ndjson":
+                yield "\n".join(parts) + "\n"
+            else:
+                yield ("" if first else ",") + ",".join(parts)
+                first = False
+            last_row = rows[-1]
+        if more:
+            break
+    if fmt == "json":
+        next_cursor = encode_cursor(page.sort, last_row[width:]) if more else None
+        yield '], "next_cursor": %s}' % dumps(next_cursor)
+
+
+def stream_page(paginator, page, pool, query, params, fmt, key, transform=None):
+    """Streams the rows of a built listing query as a JSON envelope or NDJSON.
+
+    Rows are read from an unbuffered cursor ``STREAM_CHUNK_ROWS`` at a time
+    and encoded as they arrive, so memory use does not grow with the size
+    of the result. The JSON form matches the paginated response, including
+    ``next_cursor`` when ``limit`` cuts the listing short.
+
+    The stream reads on a connection of its own for as long as the client
+    does, so the request's connection (used for the ETag version check) is
+    returned first; otherwise ``MYSQL_POOL_SIZE`` concurrent streams would
+    each hold one connection while waiting for a second.
+    """
+    pool.release()
+    chunks = pool.iter_chunks(query, params, STREAM_CHUNK_ROWS)
+    to_item = paginator.row_mapper(page)
+    if transform is not None:
+        to_item = lambda row, map_row=to_item: transform(map_row(row))
+    dumps = current_app.json.dumps
+    body = _encode(chunks, to_item, dumps, fmt, key, page)
+    mimetype = NDJSON_MIMETYPE if fmt == "ndjson" else "application/json"
+    return Response(ClosingIterator(body, chunks.close), mimetype=mimetype)
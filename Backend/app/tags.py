@@ -0,0 +1,363 @@
+import heapq
+import re
+import threading
+from array import array
+from bisect import bisect_left
+
+import click
+
+from app.reload import DEFAULT_RELOAD_INTERVAL, Reloader
+
+# A tag filter matching at most this many questions is sent to MySQL as an
+# IN list; a larger match is applied while scanning the listing in order.
+TAG_FILTER_IN_LIMIT = 5000
+MAX_QUERY_TAGS = 10
+AUTOCOMPLETE_LIMIT = 10
+MAX_AUTOCOMPLETE_LIMIT = 50
+REBUILD_CHUNK_SIZE = 10000
+
+REBUILD_TAGS_QUERY = "SELECT tag_id, tag_name FROM tags"
+# idx_question_tags_tag returns the rows grouped by tag and sorted by question.
+REBUILD_POSTINGS_QUERY = "SELECT tag_id, question_id FROM question_tags ORDER BY tag_id, question_id"
+
+TAG_MODES = ("all", "any")
+_NONZERO = re.compile(rb"[^\x00]")
+
+
+class TagQueryError(ValueError):
+    """Raised for a malformed ``tags`` or ``mode`` parameter."""
+
+
+def _bitmap(ids):
+    bits = bytearray((ids[-1] >> 3) + 1) if ids else bytearray()
+    for question_id in ids:
+        bits[question_id >> 3] |= 1 << (question_id & 7)
+    return bits
+
+
+def _iter_bits(bits):
+    # The regex finds the non-zero bytes at C speed, so empty stretches cost nothing.
+    for match in _NONZERO.finditer(bits):
+        start = match.start()
+        byte = bits[start]
+        for bit in range(8):
+            if byte >> bit & 1:
+                yield (start << 3) | bit
+
+
+class PostingList:
+    """The sorted question ids of one tag, or of a tag query's result.
+
+    While sparse the ids are a packed ``array('I')``, four bytes each; once a
+    bitmap with one bit per id up to the largest would be smaller, they are
+    stored as that bitmap instead, and switch back when it falls under half
+    full by the same measure. Either way membership is a bisect or a byte
+    lookup, and AND/OR over dense lists are single big-integer operations.
+    """
+
+    __slots__ = ("ids", "bits", "count")
+
+    def __init__(self, ids=()):
+        self.ids = array("I", ids)
+        self.bits = None
+        self.count = len(self.ids)
+        self._compact()
+
+    @classmethod
+    def from_int(cls, value):
+        posting = cls()
+        posting.ids = None
+        posting.bits = bytearray(value.to_bytes((value.bit_length() + 7) // 8, "little"))
+        posting.count = bin(value).count("1")
+        posting._compact()
+        return posting
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, question_id):
+        if self.bits is not None:
+            index = question_id >> 3
+            return index < len(self.bits) and bool(self.bits[index] >> (question_id & 7) & 1)
+        i = bisect_left(self.ids, question_id)
+        return i < len(self.ids) and self.ids[i] == question_id
+
+    def __iter__(self):
+        """Ids in ascending order."""
+        return iter(self.ids) if self.bits is None else _iter_bits(self.bits)
+
+    def add(self, question_id):
+        if question_id in self:
+            return False
+        if self.bits is None:
+            self.ids.insert(bisect_left(self.ids, question_id), question_id)
+        else:
+            index = question_id >> 3
+            if index >= len(self.bits):
+                self.bits.extend(bytes(index + 1 - len(self.bits)))
+            self.bits[index] |= 1 << (question_id & 7)
+        self.count += 1
+        self._compact()
+        return True
+
+    def remove(self, question_id):
+        if question_id not in self:
+            return False
+        if self.bits is None:
+            del self.ids[bisect_left(self.ids, question_id)]
+        else:
+            self.bits[question_id >> 3] &= ~(1 << (question_id & 7)) & 0xFF
+        self.count -= 1
+        self._compact()
+        return True
+
+    def as_int(self):
+        return int.from_bytes(_bitmap(self.ids) if self.bits is None else self.bits, "little")
+
+    def _compact(self):
+        if self.bits is None:
+            if self.ids and (self.ids[-1] >> 3) + 1 < 4 * self.count:
+                self.bits = _bitmap(self.ids)
+                self.ids = None
+        elif 8 * self.count < len(self.bits):
+            self.ids = array("I", _iter_bits(self.bits))
+            self.bits = None
+
+    def where(self, column):
+        """Returns ``(sql, params)`` restricting ``column`` to these ids, or None if there are too many."""
+        if self.count > TAG_FILTER_IN_LIMIT:
+            return None
+        if not self.count:
+            return "1 = 0", []
+        return "%s IN (%s)" % (column, ", ".join(["%s"] * self.count)), list(self)
+
+
+def intersect(postings):
+    """Ids present in every posting list, smallest list first so the work shrinks as it goes."""
+    postings = sorted(postings, key=len)
+    if not postings or not postings[0]:
+        return PostingList()
+    if all(p.bits is not None for p in postings):
+        value = postings[0].as_int()
+        for posting in postings[1:]:
+            value &= posting.as_int()
+        return PostingList.from_int(value)
+    result = set(postings[0])
+    for posting in postings[1:]:
+        if posting.bits is None:
+            result.intersection_update(posting.ids)
+        else:
+            result = {question_id for question_id in result if question_id in posting}
+        if not result:
+            break
+    return PostingList(sorted(result))
+
+
+def union(postings):
+    """Ids present in any of the posting lists."""
+    postings = [p for p in postings if p]
+    if not postings:
+        return PostingList()
+    if all(p.bits is None for p in postings):
+        return PostingList(sorted(set().union(*(p.ids for p in postings))))
+    value = 0
+    for posting in postings:
+        value |= posting.as_int()
+    return PostingList.from_int(value)
+
+
+class _TrieNode:
+    __slots__ = ("children", "tag_id")
+
+    def __init__(self):
+        self.children = {}
+        self.tag_id = None
+
+
+class TagTrie:
+    """Prefix trie over lowercased tag names, each terminal node holding a tag id."""
+
+    def __init__(self):
+        self.root = _TrieNode()
+
+    def insert(self, name, tag_id):
+        node = self.root
+        for char in name.lower():
+            node = node.children.setdefault(char, _TrieNode())
+        node.tag_id = tag_id
+
+    def remove(self, name):
+        path = [self.root]
+        for char in name.lower():
+            node = path[-1].children.get(char)
+            if node is None:
+                return
+            path.append(node)
+        path[-1].tag_id = None
+        # Prune the branch back up to the nearest node still in use.
+        for parent, char in zip(reversed(path[:-1]), reversed(name.lower())):
+            node = parent.children[char]
+            if node.children or node.tag_id is not None:
+                break
+            del parent.children[char]
+
+    def with_prefix(self, prefix):
+        node = self.root
+        for char in prefix.lower():
+            node = node.children.get(char)
+            if node is None:
+                return
+        stack = [node]
+        while stack:
+            node = stack.pop()
+            if node.tag_id is not None:
+                yield node.tag_id
+            stack.extend(node.children.values())
+
+
+class TagIndex:
+    """In-memory index of which questions carry which tags.
+
+    Every tag has a PostingList of its question ids, so ``tags=a,b`` queries
+    in ``all`` or ``any`` mode are set operations in memory instead of
+    joins, and a TagTrie over the names answers autocomplete ranked by
+    question count. ``rebuild()`` loads it from ``question_tags``; the write
+    routes keep it current with ``add_tag()``, ``tag_question()`` and
+    ``remove_question()``, and ``ensure_built()`` reloads it periodically
+    for changes made by other workers.
+    """
+
+    def __init__(self):
+        self.built = False
+        self._lock = threading.Lock()
+        self.reloader = Reloader()
+        self._names = {}
+        self._ids = {}
+        self._postings = {}
+        self._trie = TagTrie()
+
+    def init_app(self, app, pool):
+        app.config.setdefault('INDEX_RELOAD_INTERVAL', DEFAULT_RELOAD_INTERVAL)
+        self.reloader.interval = app.config['INDEX_RELOAD_INTERVAL']
+        app.extensions['tag_index'] = self
+
+        @app.cli.command('rebuild-tag-index')
+        def rebuild_tag_index():
+            """Rebuilds the tag index from MySQL."""
+            count = self.rebuild(pool)
+            click.echo("Indexed %d tags" % count)
+
+    def rebuild(self, pool):
+        """Replaces the index contents with the tags and question_tags tables."""
+        names = {}
+        for rows in pool.iter_chunks(REBUILD_TAGS_QUERY, chunk_size=REBUILD_CHUNK_SIZE):
+            names.update(rows)
+
+        postings = {}
+        current, ids = None, array("I")
+        for rows in pool.iter_chunks(REBUILD_POSTINGS_QUERY, chunk_size=REBUILD_CHUNK_SIZE):
+            for tag_id, question_id in rows:
+                if tag_id != current:
+                    if current is not None:
+                        postings[current] = PostingList(ids)
+                    current, ids = tag_id, array("I")
+                ids.append(question_id)
+        if current is not None:
+            postings[current] = PostingList(ids)
+
+        trie = TagTrie()
+        for tag_id, name in names.items():
+            trie.insert(name, tag_id)
+
+        with self._lock:
+            self._names = names
+            self._ids = {name.lower(): tag_id for tag_id, name in names.items()}
+            self._postings = postings
+            self._trie = trie
+            self.built = True
+        return len(names)
+
+    def ensure_built(self, pool):
+        """Builds the index on first use and reloads it every ``INDEX_RELOAD_INTERVAL`` seconds."""
+        self.reloader.ensure(lambda: self.rebuild(pool))
+
+    def add_tag(self, tag_id, name):
+        with self._lock:
+            if tag_id not in self._names:
+                self._names[tag_id] = name
+                self._ids[name.lower()] = tag_id
+                self._trie.insert(name, tag_id)
+
+    def tag_question(self, question_id, tags):
+        """Records ``[(tag_id, tag_name)]`` as tags of a question, adding unseen tags."""
+        for tag_id, name in tags:
+            self.add_tag(tag_id, name)
+        with self._lock:
+            for tag_id, _ in tags:
+                self._postings.setdefault(tag_id, PostingList()).add(question_id)
+
+    def remove_question(self, question_id, tag_ids):
+        with self._lock:
+            for tag_id in tag_ids:
+                posting = self._postings.get(tag_id)
+                if posting is not None:
+                    posting.remove(question_id)
+
+    def question_count(self, name):
+        with self._lock:
+            posting = self._postings.get(self._ids.get(name.lower()))
+            return len(posting) if posting is not None else 0
+
+    def match(self, names, mode="all"):
+        """Returns the PostingList of questions tagged with all (or any) of ``names``."""
+        with self._lock:
+            postings = []
+            for name in names:
+                posting = self._postings.get(self._ids.get(name.lower()))
+                if posting is None:
+                    if mode == "all":
+                        return PostingList()
+                    continue
+                postings.append(posting)
+            return intersect(postings) if mode == "all" else union(postings)
+
+    def autocomplete(self, prefix, limit=AUTOCOMPLETE_LIMIT):
+        """The ``limit`` tags starting with ``prefix``, most used first."""
+        with self._lock:
+            def count(tag_id):
+                posting = self._postings.get(tag_id)
+                return len(posting) if posting is not None else 0
+
+            top = heapq.nsmallest(limit, self._trie.with_prefix(prefix),
+                                  key=lambda tag_id: (-count(tag_id), self._names[tag_id].lower()))
+            return [{"tag_id": tag_id, "tag_name": self._names[tag_id], "question_count": count(tag_id)}
+                    for tag_id in top]
+
+    def stats(self):
+        with self._lock:
+            dense = sum(1 for posting in self._postings.values() if posting.bits is not None)
+            return {
+                "built": self.built,
+                "tags": len(self._names),
+                "postings": sum(len(posting) for posting in self._postings.values()),
+                "dense_tags": dense,
+                "bytes": sum(len(posting.bits) if posting.bits is not None else 4 * len(posting.ids)
+                             for posting in self._postings.values()),
+            }
+
+
+def parse_tag_query(args):
+    """Reads ``tags=a,b`` and ``mode=all|any``; returns ``(names, mode)``."""
+    names = []
+    for name in args.get('tags', '').split(","):
+        name = name.strip()
+        if name and name.lower() not in (n.lower() for n in names):
+            names.append(name)
+    if not names:
+        raise TagQueryError("tags must name at least one tag")
+    if len(names) > MAX_QUERY_TAGS:
+        raise TagQueryError("At most %d tags per query" % MAX_QUERY_TAGS)
+    mode = args.get('mode', 'all')
+    if mode not in TAG_MODES:
+        raise TagQueryError("mode must be one of: %s" % ", ".join(TAG_MODES))
+    return names, mode
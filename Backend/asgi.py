@@ -0,0 +1,10 @@
+"""ASGI entry point serving the same API with async MySQL on the hot read routes.
+
+    uvicorn asgi:app --port 5000
+
+``python app.py`` keeps serving everything synchronously.
+"""
+from app.async_routes import create_asgi_app
+from wsgi import app as flask_app
+
+app = create_asgi_app(flask_app)
@@ -0,0 +1,235 @@
+"""Deterministic synthetic Q&A dataset, written as a bulk.py dump.
+
+    python -m benchmarks.datagen dump/ --users 5000 --questions 50000
+    python bulk.py import dump/ --defer-indexes
+
+The same seed and counts always produce the same files. Activity is skewed
+the way real Q&A sites are: user activity and tag popularity follow a Zipf
+distribution, a minority of questions collect most answers, comments and
+votes, and question upvotes equal the sum of their vote rows. Every user
+can log in with ``BENCH_PASSWORD`` as ``user<N>@bench.example``.
+
+Rows are generated one question at a time and written straight to the
+per-table files, so memory use does not grow with the counts.
+"""
+import argparse
+import csv
+import datetime
+import itertools
+import json
+import os
+import random
+import time
+
+from werkzeug.security import _hash_internal
+
+from bulk import CSV_NULL, FORMATS, TABLES
+
+BENCH_PASSWORD = "benchmark-password"
+BENCH_EMAIL = "user%d@bench.example"
+PASSWORD_METHOD = "scrypt:32768:8:1"
+EPOCH = datetime.datetime(2024, 1, 1)
+
+WORDS = (
+    "array list dict index loop query join table cursor thread async await lock pool cache socket "
+    "request response header token session cookie json parse encode decode string bytes unicode "
+    "regex match split format number float integer overflow memory leak pointer null error "
+    "exception stack trace import module package install version build compile deploy docker "
+    "container server client port proxy timeout retry batch stream buffer file path read write "
+    "sort filter map reduce lambda closure class object method property static inherit interface "
+    "generic type cast schema migration index foreign key transaction commit rollback deadlock"
+).split()
+LANGUAGES = (
+    "python", "javascript", "java", "c", "cpp", "csharp", "go", "rust", "sql", "typescript",
+    "php", "ruby", "kotlin", "swift", "bash",
+)
+TOPICS = (
+    "react", "flask", "django", "node", "spring", "mysql", "postgres", "docker", "kubernetes",
+    "git", "linux", "pandas", "numpy", "regex", "css", "html", "api", "testing", "performance",
+    "security", "async", "algorithms", "networking", "aws", "android",
+)
+CODE_SNIPPETS = (
+    "for i in range(10):\n    print(i)\n",
+    "const items = data.map(x => x.id);\nconsole.log(items);\n",
+    "SELECT q.title, COUNT(*) FROM questions q JOIN answers a USING (question_id) GROUP BY q.question_id;\n",
+    "public static void main(String[] args) {\n    System.out.println(\"hello\");\n}\n",
+    "fn main() {\n    let v: Vec<i32> = (0..10).collect();\n    println!(\"{:?}\", v);\n}\n",
+    "#include <stdio.h>\nint main(void) { printf(\"%d\\n\", 42); return 0; }\n",
+)
+
+
+def zipf_weights(count, exponent):
+    """Cumulative weights for ranks 1..count, for use with random.choices(cum_weights=...)."""
+    return list(itertools.accumulate(1.0 / (rank ** exponent) for rank in range(1, count + 1)))
+
+
+def skewed_count(rng, mean, heat):
+    """A geometric-ish count with the given mean, scaled by how popular the item is."""
+    if mean <= 0:
+        return 0
+    return int(rng.expovariate(1.0 / (mean * heat)) + 0.5)
+
+
+def tag_names(count):
+    names = list(LANGUAGES) + list(TOPICS)
+    names += ["%s-%s" % pair for pair in itertools.product(LANGUAGES, TOPICS)]
+    names += ["tag-%d" % i for i in range(len(names), count)]
+    return names[:count]
+
+
+class DumpWriter:
+    """Writes rows for every table in the bulk.py dump format."""
+
+    def __init__(self, directory, fmt):
+        os.makedirs(directory, exist_ok=True)
+        self.fmt = fmt
+        self.columns = dict(TABLES)
+        self.files = {}
+        self.writers = {}
+        self.counts = dict.fromkeys(self.columns, 0)
+        for table, columns in TABLES:
+            f = open(os.path.join(directory, "%s.%s" % (table, fmt)), "w", newline="", encoding="utf-8")
+            self.files[table] = f
+            if fmt == "csv":
+                self.writers[table] = csv.writer(f)
+                self.writers[table].writerow(columns)
+
+    def write(self, table, row):
+        self.counts[table] += 1
+        values = [v.strftime("%Y-%m-%d %H:%M:%S") if isinstance(v, datetime.datetime) else v for v in row]
+        if self.fmt == "csv":
+            self.writers[table].writerow([CSV_NULL if v is None else v for v in values])
+        else:
+            self.files[table].write(json.dumps(dict(zip(self.columns[table], values))) + "\n")
+
+    def close(self):
+        for f in self.files.values():
+            f.close()
+
+
+class Generator:
+    def __init__(self, args):
+        self.args = args
+        self.rng = random.Random(args.seed)
+        self.span = args.days * 86400
+        self.user_weights = zipf_weights(args.users, args.skew)
+        self.tag_weights = zipf_weights(args.tags, args.skew)
+        self.answer_id = 0
+        self.comment_id = 0
+        # One hash for everyone keeps generation fast; a fixed salt keeps it deterministic.
+        hashed, method = _hash_internal(PASSWORD_METHOD, "benchsalt", BENCH_PASSWORD)
+        self.password_hash = "%s$%s$%s" % (method, "benchsalt", hashed)
+
+    def text(self, low, high):
+        return " ".join(self.rng.choice(WORDS) for _ in range(self.rng.randint(low, high)))
+
+    def timestamp(self, after=None):
+        if after is None:
+            return EPOCH + datetime.timedelta(seconds=self.rng.randrange(self.span))
+        remaining = max(1, int((EPOCH + datetime.timedelta(seconds=self.span) - after).total_seconds()))
+        return after + datetime.timedelta(seconds=self.rng.randrange(min(remaining, 30 * 86400)))
+
+    def user(self):
+        return self.rng.choices(range(1, self.args.users + 1), cum_weights=self.user_weights)[0]
+
+    def users(self, out):
+        for user_id in range(1, self.args.users + 1):
+            out.write("users", (
+                user_id, "user%d" % user_id, BENCH_EMAIL % user_id, self.password_hash, None,
+                self.text(3, 12) if self.rng.random() < 0.3 else None, self.timestamp(), None))
+
+    def tags(self, out):
+        for tag_id, name in enumerate(tag_names(self.args.tags), 1):
+            out.write("tags", (tag_id, name, "Questions about %s" % name))
+
+    def comments(self, out, parent_id, parent_type, after, heat):
+        for _ in range(skewed_count(self.rng, self.args.comments, heat)):
+            self.comment_id += 1
+            created_at = self.timestamp(after)
+            out.write("comments", (self.comment_id, self.user(), parent_id, parent_type,
+                                   self.text(4, 25), created_at, created_at))
+
+    def votes(self, out, target_type, target_id, after, heat):
+        voters = self.rng.sample(range(1, self.args.users + 1),
+                                 min(self.args.users, skewed_count(self.rng, self.args.votes, heat)))
+        total = 0
+        for voter in voters:
+            value = 1 if self.rng.random() < 0.85 else -1
+            total += value
+            out.write("votes", (voter, target_type, target_id, value, self.timestamp(after)))
+        return total
+
+    def heat(self):
+        """Pareto-distributed popularity with a mean of 1, so the --answers,
+        --comments and --votes means hold across the whole dataset."""
+        alpha = self.args.skew + 1.0
+        return self.rng.paretovariate(alpha) * (alpha - 1.0) / alpha
+
+    def question(self, out, question_id):
+        rng = self.rng
+        heat = self.heat()
+        created_at = self.timestamp()
+        code = rng.choice(CODE_SNIPPETS) if rng.random() < 0.6 else None
+
+        answer_rows = []
+        for _ in range(skewed_count(rng, self.args.answers, heat)):
+            self.answer_id += 1
+            answered_at = self.timestamp(created_at)
+            answer_rows.append((self.answer_id, answered_at))
+
+        upvotes = self.votes(out, "question", question_id, created_at, heat)
+        out.write("questions", (
+            question_id, self.user(), self.text(4, 12).capitalize() + "?", self.text(20, 120), code,
+            created_at, created_at, int(rng.paretovariate(1.2) * 20 * heat), upvotes))
+
+        tag_ids = set(rng.choices(range(1, self.args.tags + 1), cum_weights=self.tag_weights,
+                                  k=rng.randint(1, min(5, self.args.tags))))
+        for tag_id in sorted(tag_ids):
+            out.write("question_tags", (question_id, tag_id))
+
+        self.comments(out, question_id, "question", created_at, heat)
+        for answer_id, answered_at in answer_rows:
+            heat = self.heat()
+            answer_upvotes = self.votes(out, "answer", answer_id, answered_at, heat)
+            out.write("answers", (
+                answer_id, question_id, self.user(), self.text(15, 90),
+                rng.choice(CODE_SNIPPETS) if rng.random() < 0.4 else None,
+                answered_at, answered_at, answer_upvotes))
+            self.comments(out, answer_id, "answer", answered_at, heat)
+
+    def run(self, out):
+        self.users(out)
+        self.tags(out)
+        for question_id in range(1, self.args.questions + 1):
+            self.question(out, question_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("directory")
+    parser.add_argument("--format", choices=FORMATS, default="ndjson")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=2000)
+    parser.add_argument("--questions", type=int, default=20000)
+    parser.add_argument("--answers", type=float, default=2.5, help="mean answers per question")
+    parser.add_argument("--comments", type=float, default=1.0, help="mean comments per question and answer")
+    parser.add_argument("--votes", type=float, default=3.0, help="mean votes per question and answer")
+    parser.add_argument("--tags", type=int, default=200)
+    parser.add_argument("--days", type=int, default=365, help="time span of created_at values")
+    parser.add_argument("--skew", type=float, default=1.1, help="Zipf exponent for users and tags")
+    args = parser.parse_args()
+    if args.users < 1 or args.tags < 1:
+        parser.error("--users and --tags must be at least 1")
+
+    started = time.perf_counter()
+    out = DumpWriter(args.directory, args.format)
+    try:
+        Generator(args).run(out)
+    finally:
+        out.close()
+    print("generated in %.1f s: %s" % (time.perf_counter() - started, ", ".join(
+        "%s=%d" % (table, out.counts[table]) for table, _ in TABLES)))
+
+
+if __name__ == "__main__":
+    main()
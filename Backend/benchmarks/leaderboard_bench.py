@@ -0,0 +1,128 @@
+"""Compares the in-memory leaderboards with the top-questions SQL query.
+
+    python -m benchmarks.leaderboard_bench --questions 1000000
+    python -m benchmarks.leaderboard_bench --mysql --host localhost --user root
+
+The in-memory side is loaded with synthetic questions with Zipf-like vote
+counts. With ``--mysql`` the ORDER BY query the leaderboards replaced is
+timed against whatever data the configured database holds.
+"""
+import argparse
+import random
+import statistics
+import time
+
+from app.leaderboard import TRENDING_EPOCH, Leaderboards
+
+TOP_QUESTIONS_QUERY = """
+    SELECT Q.question_id, Q.title, Q.body, Q.views, Q.upvotes, U.username AS author
+    FROM questions Q
+    JOIN users U ON Q.user_id = U.user_id
+    ORDER BY Q.upvotes DESC, Q.views DESC
+    LIMIT 10
+"""
+
+
+class _RowsCursor:
+    """Feeds generated rows to Leaderboards.rebuild() in place of a MySQL cursor."""
+
+    def __init__(self, questions, tags):
+        self._results = iter([questions, tags])
+        self._current = None
+
+    def execute(self, query, params=None):
+        self._current = next(self._results)
+
+    def fetchall(self):
+        return self._current
+
+
+def synthetic_rows(count, tag_count, seed):
+    rng = random.Random(seed)
+    questions = []
+    tags = []
+    for question_id in range(1, count + 1):
+        upvotes = int(rng.paretovariate(1.2)) - 1
+        views = upvotes * rng.randint(5, 60) + rng.randint(0, 100)
+        created_at = TRENDING_EPOCH + rng.randint(0, 365 * 86400)
+        questions.append((question_id, upvotes, views, created_at))
+        for tag in rng.sample(range(tag_count), rng.randint(1, 3)):
+            tags.append((question_id, "tag%d" % tag))
+    return questions, tags
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def report(name, samples):
+    samples = sorted(samples)
+    p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+    print("%-28s median %9.3f ms   p99 %9.3f ms   (%d runs)" % (
+        name, statistics.median(samples) * 1000, p99 * 1000, len(samples)))
+
+
+def bench_memory(args):
+    print("Generating %d questions..." % args.questions)
+    questions, tags = synthetic_rows(args.questions, args.tags, args.seed)
+
+    boards = Leaderboards()
+    started = time.perf_counter()
+    boards.rebuild(_RowsCursor(questions, tags))
+    print("rebuild: %.2f s" % (time.perf_counter() - started))
+
+    report("top(10)", timed(lambda: boards.top(10), args.runs))
+    report("trending(10)", timed(lambda: boards.trending(10), args.runs))
+    report("top_for_tag(10)", timed(lambda: boards.top_for_tag("tag1", 10), args.runs))
+
+    rng = random.Random(args.seed)
+    ids = [rng.randint(1, args.questions) for _ in range(args.runs)]
+    updates = iter(ids)
+    report("record(vote)", timed(lambda: boards.record(next(updates), votes=1), args.runs))
+
+
+def bench_mysql(args):
+    import pymysql
+
+    conn = pymysql.connect(host=args.host, port=args.port, user=args.user,
+                           password=args.password, database=args.database)
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT COUNT(*) FROM questions")
+            print("MySQL questions table: %d rows" % cursor.fetchone()[0])
+
+            def run():
+                cursor.execute(TOP_QUESTIONS_QUERY)
+                cursor.fetchall()
+
+            report("ORDER BY ... LIMIT 10", timed(run, args.runs))
+    finally:
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=1000000)
+    parser.add_argument("--tags", type=int, default=500)
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--mysql", action="store_true", help="also time the SQL query")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="questionanswerplatform")
+    args = parser.parse_args()
+
+    bench_memory(args)
+    if args.mysql:
+        bench_mysql(args)
+
+
+if __name__ == "__main__":
+    main()
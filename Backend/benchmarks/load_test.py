@@ -0,0 +1,210 @@
+"""Load test comparing the sync (Flask) and async (ASGI) serving modes.
+
+    python -m benchmarks.load_test --launch --concurrency 200 --duration 20
+    python -m benchmarks.load_test --target sync=http://localhost:5000 --target async=http://localhost:8000
+
+With ``--launch`` both servers are started against the configured local
+MySQL: ``flask run`` (threaded, via wsgi.py) on --sync-port and ``uvicorn asgi:app`` on
+--async-port. Each run keeps ``--concurrency`` clients issuing requests
+back to back over keep-alive connections and reports requests per second
+and latency percentiles. ``--long-polls N`` adds N clients that loop on the
+long-poll form of the question endpoint for the whole run, which the async
+mode parks without holding a thread.
+"""
+import argparse
+import asyncio
+import os
+import random
+import statistics
+import subprocess
+import sys
+import time
+from urllib.parse import urlsplit
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Connection:
+    """A minimal HTTP/1.1 keep-alive client, enough for GET load."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self.reader = None
+        self.writer = None
+
+    async def get(self, path, headers=None):
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(self.host, self.port)
+        lines = ["GET %s HTTP/1.1" % path, "Host: %s:%d" % (self.host, self.port)]
+        lines += ["%s: %s" % item for item in (headers or {}).items()]
+        self.writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        await self.writer.drain()
+
+        status = int((await self.reader.readline()).split()[1])
+        response_headers = {}
+        while True:
+            line = await self.reader.readline()
+            if line in (b"\r\n", b""):
+                break
+            name, _, value = line.decode("latin-1").partition(":")
+            response_headers[name.strip().lower()] = value.strip()
+
+        if response_headers.get("transfer-encoding") == "chunked":
+            body = b""
+            while True:
+                size = int((await self.reader.readline()).strip(), 16)
+                body += await self.reader.readexactly(size + 2)
+                if size == 0:
+                    break
+        else:
+            body = await self.reader.readexactly(int(response_headers.get("content-length", 0)))
+
+        if response_headers.get("connection", "").lower() == "close":
+            self.close()
+        return status, response_headers, body
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = self.reader = None
+
+
+async def _client(url, paths, deadline, latencies, errors):
+    parts = urlsplit(url)
+    conn = Connection(parts.hostname, parts.port or 80)
+    rng = random.Random()
+    try:
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                status, _, _ = await conn.get(rng.choice(paths))
+            except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                errors.append(1)
+                conn.close()
+                continue
+            if status >= 500:
+                errors.append(status)
+            else:
+                latencies.append(time.perf_counter() - started)
+    finally:
+        conn.close()
+
+
+async def _long_poller(url, path, deadline, wait, counts):
+    parts = urlsplit(url)
+    conn = Connection(parts.hostname, parts.port or 80)
+    etag = None
+    try:
+        while time.monotonic() < deadline:
+            try:
+                status, headers, _ = await asyncio.wait_for(
+                    conn.get(path, {"If-None-Match": etag} if etag else None), deadline - time.monotonic())
+            except asyncio.TimeoutError:
+                break
+            except (OSError, asyncio.IncompleteReadError, ValueError, IndexError):
+                counts["errors"] += 1
+                conn.close()
+                await asyncio.sleep(wait)
+                continue
+            counts[status] = counts.get(status, 0) + 1
+            etag = headers.get("etag", etag)
+            if status >= 400:
+                await asyncio.sleep(wait)
+    finally:
+        conn.close()
+
+
+async def run(url, paths, concurrency, duration, long_polls, long_poll_path, wait):
+    deadline = time.monotonic() + duration
+    latencies = []
+    errors = []
+    counts = {"errors": 0}
+    tasks = [_client(url, paths, deadline, latencies, errors) for _ in range(concurrency)]
+    tasks += [_long_poller(url, long_poll_path, deadline, wait, counts) for _ in range(long_polls)]
+    started = time.perf_counter()
+    await asyncio.gather(*tasks)
+    return latencies, errors, counts, time.perf_counter() - started
+
+
+def _percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+def report(name, latencies, errors, counts, elapsed, long_polls):
+    latencies.sort()
+    print("%s: %d requests in %.1f s, %d errors" % (name, len(latencies), elapsed, len(errors)))
+    if latencies:
+        print("  %.1f req/s   p50 %.1f ms   p99 %.1f ms   max %.1f ms" % (
+            len(latencies) / elapsed,
+            statistics.median(latencies) * 1000,
+            _percentile(latencies, 0.99) * 1000,
+            latencies[-1] * 1000))
+    if long_polls:
+        print("  long polls: %s" % ", ".join("%s=%d" % item for item in sorted(counts.items(), key=str)))
+
+
+def _wait_for_port(port, timeout=30.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            asyncio.run(asyncio.wait_for(asyncio.open_connection("127.0.0.1", port), 1))
+            return
+        except (OSError, asyncio.TimeoutError):
+            time.sleep(0.2)
+    raise RuntimeError("server on port %d did not start" % port)
+
+
+def launch(args):
+    servers = [
+        subprocess.Popen([sys.executable, "-m", "flask", "run", "--port", str(args.sync_port), "--with-threads"],
+                         cwd=BACKEND_DIR),
+        subprocess.Popen([sys.executable, "-m", "uvicorn", "asgi:app", "--port", str(args.async_port),
+                          "--log-level", "warning"], cwd=BACKEND_DIR),
+    ]
+    for port in (args.sync_port, args.async_port):
+        _wait_for_port(port)
+    targets = [("sync", "http://127.0.0.1:%d" % args.sync_port),
+               ("async", "http://127.0.0.1:%d" % args.async_port)]
+    return servers, targets
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--target", action="append", default=[], metavar="NAME=URL")
+    parser.add_argument("--launch", action="store_true", help="start both servers locally")
+    parser.add_argument("--sync-port", type=int, default=5001)
+    parser.add_argument("--async-port", type=int, default=5002)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--duration", type=float, default=15.0)
+    parser.add_argument("--long-polls", type=int, default=0)
+    parser.add_argument("--wait", type=float, default=30.0, help="long-poll wait in seconds")
+    parser.add_argument("--question-id", type=int, default=1)
+    parser.add_argument("--path", action="append", default=[], help="GET path to load (repeatable)")
+    args = parser.parse_args()
+
+    paths = args.path or ["/api/questions?limit=20", "/api/questions/%d" % args.question_id, "/api/tags"]
+    long_poll_path = "/api/questions/%d?wait=%g" % (args.question_id, args.wait)
+
+    servers = []
+    targets = [tuple(t.split("=", 1)) for t in args.target]
+    if args.launch:
+        servers, targets = launch(args)
+    if not targets:
+        parser.error("pass --launch or at least one --target NAME=URL")
+
+    try:
+        print("%d clients, %d long polls, %.0f s per mode, paths: %s" % (
+            args.concurrency, args.long_polls, args.duration, ", ".join(paths)))
+        for name, url in targets:
+            result = asyncio.run(run(url, paths, args.concurrency, args.duration,
+                                     args.long_polls, long_poll_path, args.wait))
+            report(name, *result, args.long_polls)
+    finally:
+        for server in servers:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,97 @@
+"""Login throughput with inline hashing versus the PasswordHasher process pool.
+
+    python -m benchmarks.login_bench --clients 16 --logins 200
+    python -m benchmarks.login_bench --method pbkdf2:sha256:600000 --workers 8
+
+Each client thread verifies passwords back to back, as concurrent /login
+requests would. A probe thread meanwhile runs a small pure-Python task, as
+a cheap endpoint served by the same process would, and its latency shows
+how much the hashing load stalls everything else.
+"""
+import argparse
+import os
+import statistics
+import threading
+import time
+
+from werkzeug.security import generate_password_hash
+
+from app.passwords import HashingBusy, PasswordHasher
+from benchmarks.leaderboard_bench import report
+
+
+def _probe_work():
+    return sum(i * i for i in range(2000))
+
+
+def run(hasher, password_hash, clients, logins):
+    done = threading.Event()
+    probe_samples = []
+    rejected = [0]
+    lock = threading.Lock()
+
+    def probe():
+        while not done.is_set():
+            started = time.perf_counter()
+            _probe_work()
+            probe_samples.append(time.perf_counter() - started)
+            time.sleep(0.005)
+
+    def client(count):
+        for _ in range(count):
+            try:
+                assert hasher.verify(password_hash, "correct horse battery staple")
+            except HashingBusy:
+                with lock:
+                    rejected[0] += 1
+
+    probe_thread = threading.Thread(target=probe)
+    probe_thread.start()
+    per_client = max(1, logins // clients)
+    threads = [threading.Thread(target=client, args=(per_client,)) for _ in range(clients)]
+    started = time.perf_counter()
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    probe_thread.join()
+
+    total = per_client * clients
+    completed = total - rejected[0]
+    return completed / elapsed, rejected[0], probe_samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--method", default="scrypt:32768:8:1")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--queue-limit", type=int, default=0, help="defaults to 4 x workers")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--logins", type=int, default=200)
+    args = parser.parse_args()
+
+    password_hash = generate_password_hash("correct horse battery staple", args.method)
+    print("method %s, %d clients, %d logins" % (args.method, args.clients, args.logins))
+
+    started = time.perf_counter()
+    for _ in range(50):
+        _probe_work()
+    print("idle probe: %.3f ms" % ((time.perf_counter() - started) / 50 * 1000))
+
+    for label, workers in (("inline", 0), ("pool x%d" % args.workers, args.workers)):
+        hasher = PasswordHasher()
+        hasher.configure(args.method, workers, args.queue_limit or 4 * max(workers, 1))
+        if workers:
+            hasher.verify(password_hash, "warm up the worker processes")
+        rate, rejected, probe = run(hasher, password_hash, args.clients, args.logins)
+        hasher.shutdown()
+        print("%-12s %8.1f logins/s   rejected %d   probe median %.3f ms" % (
+            label, rate, rejected, statistics.median(probe) * 1000 if probe else 0.0))
+        if probe:
+            report("  probe latency", probe)
+
+
+if __name__ == "__main__":
+    main()
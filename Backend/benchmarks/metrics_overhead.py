@@ -0,0 +1,100 @@
+"""Per-request cost of the /metrics instrumentation, checked against a budget.
+
+    python -m benchmarks.metrics_overhead --budget-us 15
+
+Times the request hooks and the JSON timer directly inside a request
+context, which is the cost every instrumented request pays, and then
+serves a cached question-detail sized response through the test client
+with and without Metrics for an end-to-end comparison. Exits with status
+1 when the hook cost goes over ``--budget-us`` microseconds per request.
+"""
+import argparse
+import datetime
+import sys
+import time
+
+from flask import Flask, jsonify
+
+from app.metrics import Metrics
+from app.rows import FastJSONProvider
+
+
+def question_tree():
+    created_at = datetime.datetime(2024, 1, 1, 12, 0)
+    comment = {"comment_id": 1, "body": "A comment " * 5, "created_at": created_at, "commented_by": "user2"}
+    answer = {"answer_id": 1, "body": "An answer " * 40, "code": "print('hi')\n" * 5, "created_at": created_at,
+              "updated_at": created_at, "upvotes": 3, "answered_by": "user3", "comments": [comment] * 2}
+    return {"question_id": 1, "title": "How do I profile a Flask app?", "body": "Question body " * 50,
+            "code": "def f():\n    pass\n" * 5, "created_at": created_at, "updated_at": created_at,
+            "views": 1200, "upvotes": 10, "asked_by": "user1", "tags": ["python", "flask"],
+            "answers": [answer] * 5, "comments": [comment] * 3}
+
+
+def build_app(with_metrics):
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    metrics = None
+    if with_metrics:
+        metrics = Metrics()
+        metrics.init_app(app)
+    tree = question_tree()
+
+    @app.route('/api/questions/<int:question_id>')
+    def get_question_with_details(question_id):
+        return jsonify(tree), 200
+
+    return app, metrics
+
+
+def hook_cost(app, metrics, iterations):
+    """Seconds per request spent in the metrics hooks and JSON timer."""
+    with app.test_request_context('/api/questions/1'):
+        response = app.response_class("{}")
+        started = time.perf_counter()
+        for _ in range(iterations):
+            metrics._start()
+            metrics.observe_json(0.0001)
+            metrics._finish(response)
+            metrics._teardown(None)
+        return (time.perf_counter() - started) / iterations
+
+
+def request_cost(app, requests):
+    client = app.test_client()
+    started = time.perf_counter()
+    for _ in range(requests):
+        client.get('/api/questions/1').close()
+    return (time.perf_counter() - started) / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--budget-us", type=float, default=15.0, help="allowed hook cost per request")
+    parser.add_argument("--iterations", type=int, default=50000)
+    parser.add_argument("--requests", type=int, default=3000)
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    plain, _ = build_app(False)
+    instrumented, metrics = build_app(True)
+
+    hooks = min(hook_cost(instrumented, metrics, args.iterations) for _ in range(args.rounds))
+    before = after = None
+    for _ in range(args.rounds):
+        # Alternate so drift in machine load hits both variants alike.
+        cost = request_cost(plain, args.requests)
+        before = cost if before is None else min(before, cost)
+        cost = request_cost(instrumented, args.requests)
+        after = cost if after is None else min(after, cost)
+
+    print("metrics hooks        %7.2f us per request (budget %.1f us)" % (hooks * 1e6, args.budget_us))
+    print("detail request       %7.2f us without metrics, %7.2f us with (%+.1f%%)" % (
+        before * 1e6, after * 1e6, (after / before - 1) * 100))
+    if hooks * 1e6 > args.budget_us:
+        print("FAIL: instrumentation is over budget")
+        sys.exit(1)
+    print("OK")
+
+
+if __name__ == "__main__":
+    main()
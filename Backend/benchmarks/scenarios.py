@@ -0,0 +1,272 @@
+"""Scenario benchmarks that drive the real API routes in-process.
+
+    python -m benchmarks.datagen dump/ && python bulk.py import dump/
+    python -m benchmarks.scenarios --requests 500 --threads 8 --out results/base.json
+    python -m benchmarks.scenarios --compare results/base.json --out results/new.json
+
+Each scenario sends ``--requests`` requests through the Flask test client
+from ``--threads`` threads against the configured MySQL database, which
+should hold a datagen dataset: login uses its ``BENCH_PASSWORD``, and the
+write scenarios add answers and change question bodies. Requests run
+in-process so every SQL statement can be counted per request.
+
+Results are written as JSON with throughput, p50/p95/p99 latency, error
+count and queries per request for every scenario. ``--compare`` prints
+the change against an earlier result file and exits with status 1 when a
+scenario got slower or more query-hungry than ``--tolerance`` allows.
+"""
+import argparse
+import datetime
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pymysql
+
+from benchmarks.datagen import BENCH_PASSWORD
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SAMPLE_SIZE = 1000
+
+
+class QueryCounter:
+    """Counts statements executed by pymysql cursors on the current thread."""
+
+    def __init__(self):
+        self.local = threading.local()
+        self._original = None
+
+    def install(self):
+        original = self._original = pymysql.cursors.Cursor.execute
+        local = self.local
+
+        def execute(cursor, query, args=None):
+            local.count = getattr(local, "count", 0) + 1
+            return original(cursor, query, args)
+
+        pymysql.cursors.Cursor.execute = execute
+
+    def uninstall(self):
+        pymysql.cursors.Cursor.execute = self._original
+
+    def reset(self):
+        self.local.count = 0
+
+    def value(self):
+        return getattr(self.local, "count", 0)
+
+
+def percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+
+class Fixtures:
+    """Ids, tags and tokens sampled from the database, skewed toward popular rows."""
+
+    def __init__(self, app, mysql, auth, seed):
+        self.rng = random.Random(seed)
+        with app.app_context(), mysql.cursor() as cursor:
+            cursor.execute("SELECT question_id FROM questions ORDER BY views DESC LIMIT %s", (SAMPLE_SIZE,))
+            self.question_ids = [row[0] for row in cursor.fetchall()]
+            cursor.execute("""
+                SELECT t.tag_name FROM tags t JOIN question_tags qt ON qt.tag_id = t.tag_id
+                GROUP BY t.tag_id ORDER BY COUNT(*) DESC LIMIT 100
+            """)
+            self.tags = [row[0] for row in cursor.fetchall()]
+            cursor.execute("SELECT user_id, email FROM users ORDER BY user_id LIMIT %s", (SAMPLE_SIZE,))
+            self.users = cursor.fetchall()
+            cursor.execute("SELECT question_id, user_id FROM questions ORDER BY question_id LIMIT %s",
+                           (SAMPLE_SIZE,))
+            self.owned = cursor.fetchall()
+            self.tokens = {user_id: auth.generate_token(user_id)
+                           for user_id in {row[0] for row in self.users} | {row[1] for row in self.owned}}
+        if not (self.question_ids and self.tags and self.users):
+            raise SystemExit("the database has no questions, tags or users; load a datagen dump first")
+        self.lock = threading.Lock()
+
+    def pick(self, items):
+        # Squaring a uniform draw favours the front of the list, which is sorted by popularity.
+        with self.lock:
+            return items[int(self.rng.random() ** 2 * len(items))]
+
+    def headers(self, user_id):
+        return {"Authorization": "Bearer %s" % self.tokens[user_id]}
+
+
+def scenario_list(client, fx):
+    return client.get("/api/questions?limit=20&sort=%s" % fx.pick(["newest", "newest", "top"]))
+
+
+def scenario_detail(client, fx):
+    return client.get("/api/questions/%d" % fx.pick(fx.question_ids))
+
+
+def scenario_tag(client, fx):
+    return client.get("/api/questions?tag=%s&limit=20" % fx.pick(fx.tags))
+
+
+def scenario_login(client, fx):
+    _, email = fx.pick(fx.users)
+    return client.post("/api/users/login", json={"email": email, "password": BENCH_PASSWORD})
+
+
+def scenario_post_answer(client, fx):
+    user_id, _ = fx.pick(fx.users)
+    return client.post("/api/%d/answers" % fx.pick(fx.question_ids), headers=fx.headers(user_id),
+                       json={"body": "Benchmark answer posted at %f" % time.time()})
+
+
+def scenario_update(client, fx):
+    question_id, user_id = fx.pick(fx.owned)
+    return client.put("/api/updatequestion/%d" % question_id, headers=fx.headers(user_id),
+                      json={"body": "Benchmark update at %f" % time.time(), "code": "print('bench')"})
+
+
+SCENARIOS = {
+    "list": scenario_list,
+    "detail": scenario_detail,
+    "tag_filter": scenario_tag,
+    "login": scenario_login,
+    "post_answer": scenario_post_answer,
+    "update": scenario_update,
+}
+
+
+def run_scenario(app, counter, fx, fn, requests, threads, warmup):
+    latencies = []
+    queries = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def worker(count):
+        client = app.test_client()
+        for _ in range(count):
+            counter.reset()
+            started = time.perf_counter()
+            response = fn(client, fx)
+            elapsed = time.perf_counter() - started
+            response.close()
+            with lock:
+                if response.status_code >= 400:
+                    errors[0] += 1
+                latencies.append(elapsed)
+                queries.append(counter.value())
+
+    worker(warmup)
+    latencies.clear()
+    queries.clear()
+    errors[0] = 0
+
+    per_thread = max(1, requests // threads)
+    started = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(worker, [per_thread] * threads))
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": errors[0],
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+        "queries_per_request": sum(queries) / len(queries),
+        "max_queries": max(queries),
+    }
+
+
+def _git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_result(name, result):
+    print("%-12s %8.1f req/s   p50 %7.2f ms   p95 %7.2f ms   p99 %7.2f ms   %5.1f queries   %d errors" % (
+        name, result["throughput"], result["p50_ms"], result["p95_ms"], result["p99_ms"],
+        result["queries_per_request"], result["errors"]))
+
+
+def compare(baseline, current, tolerance):
+    """Prints changes against a baseline run and returns the names of regressed scenarios."""
+    regressed = []
+    print("\nchange against %s (%s)" % (baseline["meta"].get("revision"), baseline["meta"].get("started_at")))
+    for name, result in current["scenarios"].items():
+        before = baseline["scenarios"].get(name)
+        if before is None:
+            continue
+        throughput = result["throughput"] / before["throughput"] - 1 if before["throughput"] else 0.0
+        p95 = result["p95_ms"] / before["p95_ms"] - 1 if before["p95_ms"] else 0.0
+        more_queries = result["queries_per_request"] - before["queries_per_request"]
+        worse = throughput < -tolerance or p95 > tolerance or more_queries > 0.5
+        print("%-12s throughput %+6.1f%%   p95 %+6.1f%%   queries %+5.1f%s" % (
+            name, throughput * 100, p95 * 100, more_queries, "   REGRESSION" if worse else ""))
+        if worse:
+            regressed.append(name)
+    return regressed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scenario", action="append", choices=sorted(SCENARIOS),
+                        help="scenario to run (repeatable); defaults to all")
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=20, help="untimed requests before each scenario")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--out", help="write results to this JSON file")
+    parser.add_argument("--compare", metavar="BASELINE", help="earlier results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.10, help="allowed relative slowdown")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BACKEND_DIR)
+    from wsgi import app
+    from app.extensions import auth, mysql
+
+    fixtures = Fixtures(app, mysql, auth, args.seed)
+    counter = QueryCounter()
+    counter.install()
+    results = {
+        "meta": {
+            "started_at": datetime.datetime.now().isoformat(timespec="seconds"),
+            "revision": _git_revision(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        },
+        "scenarios": {},
+    }
+    try:
+        for name in args.scenario or list(SCENARIOS):
+            result = run_scenario(app, counter, fixtures, SCENARIOS[name],
+                                  args.requests, args.threads, args.warmup)
+            results["scenarios"][name] = result
+            print_result(name, result)
+    finally:
+        counter.uninstall()
+
+    if args.out:
+        os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+        print("results written to %s" % args.out)
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressed = compare(json.load(f), results, args.tolerance)
+        if regressed:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
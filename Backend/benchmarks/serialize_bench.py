@@ -0,0 +1,68 @@
+"""Rows per second mapped and serialized for a question listing page.
+
+    python -m benchmarks.serialize_bench --rows 100000
+
+Compares the previous ``dict(zip(fields, row))`` mapping encoded by Flask's
+default provider with the compiled RowMapper, encoded by both the default
+provider and FastJSONProvider (orjson, when installed).
+"""
+import argparse
+import datetime
+import time
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+from app.rows import FastJSONProvider, RowMapper, orjson
+
+FIELDS = ("question_id", "title", "body", "created_at", "updated_at", "views", "upvotes", "asked_by")
+DATES = ("created_at", "updated_at")
+
+
+def synthetic_rows(count):
+    started = datetime.datetime(2024, 1, 1)
+    return [
+        (i, "Question title number %d" % i, "Body text of the question " * 8,
+         started + datetime.timedelta(minutes=i), started + datetime.timedelta(minutes=i, seconds=30),
+         i * 7 % 1000, i % 50, "user%d" % (i % 300))
+        for i in range(count)
+    ]
+
+
+def zip_mapping(rows):
+    return [dict(zip(FIELDS, row)) for row in rows]
+
+
+def run(name, rows, map_rows, dumps, repeat):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        dumps({"questions": map_rows(rows), "next_cursor": None})
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    print("%-34s %10.0f rows/s   %7.1f ms per %d rows" % (name, len(rows) / best, best * 1000, len(rows)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    rows = synthetic_rows(args.rows)
+    app = Flask(__name__)
+    default = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    mapper = RowMapper(FIELDS, DATES)
+
+    run("dict(zip) + default provider", rows, zip_mapping, default.dumps, args.repeat)
+    run("RowMapper + default provider", rows, mapper.many, default.dumps, args.repeat)
+    if orjson is None:
+        print("orjson is not installed; FastJSONProvider falls back to the default encoder")
+    else:
+        run("RowMapper + FastJSONProvider", rows, mapper.many, fast.dumps, args.repeat)
+        run("mapping only (RowMapper)", rows, mapper.many, lambda obj: None, args.repeat)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""Peak memory of a buffered versus a streamed listing response.
+
+    python -m benchmarks.stream_bench --rows 100000
+    python -m benchmarks.stream_bench --rows 100000 --mysql --host localhost --user root
+
+The buffered path is what the paginated routes do: fetchall(), build a dict
+per row, then serialize the whole list. The streamed path is stream_page():
+rows are pulled in chunks and each chunk is encoded and handed off before
+the next is read. Without ``--mysql``, rows are generated on demand in place
+of a cursor. Peak memory is traced with tracemalloc, which sees Python
+allocations including the driver's row tuples.
+"""
+import argparse
+import datetime
+import time
+import tracemalloc
+
+from flask import Flask
+
+from app.pagination import Page
+from app.routes import QUESTIONS_FROM, question_paginator
+from app.streaming import STREAM_CHUNK_ROWS, _encode
+
+FIELDS = ("question_id", "title", "excerpt", "created_at", "updated_at")
+
+
+class _GeneratedCursor:
+    """Produces listing rows lazily, like an unbuffered cursor."""
+
+    def __init__(self, count):
+        self.count = count
+        self._next = 0
+
+    def _row(self, i):
+        created_at = datetime.datetime(2024, 1, 1) + datetime.timedelta(seconds=i)
+        return (i, "Question title number %d" % i, "x" * 200, created_at, created_at, created_at, i)
+
+    def fetchmany(self, size):
+        end = min(self._next + size, self.count)
+        rows = [self._row(i) for i in range(self._next, end)]
+        self._next = end
+        return rows
+
+    def fetchall(self):
+        return self.fetchmany(self.count)
+
+
+def _chunks(cursor):
+    while True:
+        rows = cursor.fetchmany(STREAM_CHUNK_ROWS)
+        if not rows:
+            return
+        yield rows
+
+
+def buffered(cursor, page, dumps):
+    items, _ = question_paginator.paginate(page, cursor.fetchall())
+    return len(dumps({"questions": items, "next_cursor": None}))
+
+
+def streamed(cursor, page, dumps):
+    size = 0
+    for part in _encode(_chunks(cursor), question_paginator.row_mapper(page), dumps, "json", "questions", page):
+        size += len(part)
+    return size
+
+
+def measure(name, fn):
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = fn()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print("%-10s peak %8.1f MiB   %6.2f s   %.1f MiB of JSON" % (name, peak / 2 ** 20, elapsed, size / 2 ** 20))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--mysql", action="store_true", help="read real rows from the questions table")
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=3306)
+    parser.add_argument("--user", default="root")
+    parser.add_argument("--password", default="")
+    parser.add_argument("--database", default="questionanswerplatform")
+    args = parser.parse_args()
+
+    dumps = Flask(__name__).json.dumps
+    page = Page(FIELDS, "newest", args.rows, None)
+
+    if not args.mysql:
+        measure("buffered", lambda: buffered(_GeneratedCursor(args.rows), page, dumps))
+        measure("streamed", lambda: streamed(_GeneratedCursor(args.rows), page, dumps))
+        return
+
+    import pymysql
+
+    conn = pymysql.connect(host=args.host, port=args.port, user=args.user,
+                           password=args.password, database=args.database)
+    query, params = question_paginator.build(QUESTIONS_FROM, page)
+    try:
+        def run(cursor_class, fn):
+            with conn.cursor(cursor_class) as cursor:
+                cursor.execute(query, params)
+                return fn(cursor, page, dumps)
+
+        measure("buffered", lambda: run(pymysql.cursors.Cursor, buffered))
+        measure("streamed", lambda: run(pymysql.cursors.SSCursor, streamed))
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+"""Bulk import and export of the Q&A dataset as NDJSON or CSV.
+
+    python bulk.py export dump/ --format ndjson
+    python bulk.py import dump/ --format ndjson --batch-size 2000 --defer-indexes
+    python bulk.py import dump/ --format csv --load-data
+
+A dump is one ``<table>.ndjson`` or ``<table>.csv`` file per table. CSV
+files have a header row and write NULL as ``\\N``; datetimes are
+``YYYY-MM-DD HH:MM:SS`` strings. Primary keys are kept, so references
+between files stay valid.
+
+Import runs one phase per table in foreign-key order. Each batch is
+committed together with its checkpoint row in ``bulk_import_checkpoints``,
+so an interrupted import re-run with the same job name resumes after the
+last committed batch. ``--defer-indexes`` drops the secondary ``idx_*``
+indexes first, except any a foreign key depends on, and rebuilds them once
+all rows are in. ``--load-data`` sends
+each batch with LOAD DATA LOCAL INFILE instead of multi-row INSERTs; the
+server must allow ``local_infile``.
+
+Connection settings come from the ``MYSQL_*`` config of the Flask app.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import date, datetime
+
+import pymysql
+
+# Foreign-key order: every table only references tables before it.
+TABLES = [
+    ("users", ("user_id", "username", "email", "password_hash", "profile_picture", "bio",
+               "created_at", "last_login")),
+    ("tags", ("tag_id", "tag_name", "description")),
+    ("questions", ("question_id", "user_id", "title", "body", "code", "created_at", "updated_at",
+                   "views", "upvotes")),
+    ("question_tags", ("question_id", "tag_id")),
+    ("answers", ("answer_id", "question_id", "user_id", "body", "code", "created_at", "updated_at",
+                 "upvotes")),
+    ("comments", ("comment_id", "user_id", "parent_id", "parent_type", "body", "created_at", "updated_at")),
+    ("votes", ("user_id", "target_type", "target_id", "value", "created_at")),
+]
+PRIMARY_KEYS = {
+    "users": ("user_id",),
+    "tags": ("tag_id",),
+    "questions": ("question_id",),
+    "question_tags": ("question_id", "tag_id"),
+    "answers": ("answer_id",),
+    "comments": ("comment_id",),
+    "votes": ("user_id", "target_type", "target_id"),
+}
+FORMATS = ("ndjson", "csv")
+CSV_NULL = "\\N"
+EXPORT_CHUNK_ROWS = 1000
+PROGRESS_INTERVAL = 2.0
+
+
+class Progress:
+    """Prints rows and rows per second for a phase every few seconds."""
+
+    def __init__(self, label, done=0):
+        self.label = label
+        self.rows = 0
+        self.skipped = done
+        self.started = time.perf_counter()
+        self._last_report = self.started
+
+    def add(self, count):
+        self.rows += count
+        now = time.perf_counter()
+        if now - self._last_report >= PROGRESS_INTERVAL:
+            self._last_report = now
+            self._print(now)
+
+    def _print(self, now, final=False):
+        elapsed = max(now - self.started, 1e-9)
+        print("%-14s %10d rows  %9.0f rows/s%s" % (
+            self.label, self.skipped + self.rows, self.rows / elapsed, "  done" if final else ""),
+            file=sys.stderr)
+
+    def finish(self):
+        self._print(time.perf_counter(), final=True)
+
+
+def _to_text(value):
+    if isinstance(value, (datetime, date)):
+        return value.strftime("%Y-%m-%d %H:%M:%S") if isinstance(value, datetime) else value.isoformat()
+    return value
+
+
+def _path(directory, table, fmt):
+    return os.path.join(directory, "%s.%s" % (table, fmt))
+
+
+# Export
+
+def export_table(conn, table, columns, path, fmt):
+    query = "SELECT %s FROM %s ORDER BY %s" % (", ".join(columns), table, ", ".join(PRIMARY_KEYS[table]))
+    progress = Progress(table)
+    with conn.cursor(pymysql.cursors.SSCursor) as cursor, open(path, "w", newline="", encoding="utf-8") as out:
+        cursor.execute(query)
+        if fmt == "csv":
+            writer = csv.writer(out)
+            writer.writerow(columns)
+        while True:
+            rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+            if not rows:
+                break
+            if fmt == "csv":
+                writer.writerows([CSV_NULL if v is None else _to_text(v) for v in row] for row in rows)
+            else:
+                out.write("".join(
+                    json.dumps(dict(zip(columns, map(_to_text, row))), ensure_ascii=False) + "\n" for row in rows))
+            progress.add(len(rows))
+    progress.finish()
+
+
+def export(conn, directory, fmt, tables):
+    os.makedirs(directory, exist_ok=True)
+    for table, columns in TABLES:
+        if table in tables:
+            export_table(conn, table, columns, _path(directory, table, fmt), fmt)
+
+
+# Import
+
+def read_rows(path, columns, fmt):
+    """Yields tuples in ``columns`` order from an NDJSON or CSV file."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if fmt == "csv":
+            reader = csv.reader(f)
+            header = next(reader)
+            order = [header.index(column) if column in header else None for column in columns]
+            for record in reader:
+                yield tuple(None if i is None or record[i] == CSV_NULL else record[i] for i in order)
+        else:
+            for line in f:
+                if line.strip():
+                    record = json.loads(line)
+                    yield tuple(record.get(column) for column in columns)
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) == size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class Checkpoints:
+    """Import progress stored in the target database, committed with each batch."""
+
+    def __init__(self, conn, job):
+        self.conn = conn
+        self.job = job
+        with conn.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS bulk_import_checkpoints (
+                    job VARCHAR(100) NOT NULL,
+                    table_name VARCHAR(64) NOT NULL,
+                    rows_done BIGINT NOT NULL DEFAULT 0,
+                    completed BOOLEAN NOT NULL DEFAULT FALSE,
+                    deferred_indexes TEXT,
+                    PRIMARY KEY (job, table_name)
+                )
+            """)
+        conn.commit()
+
+    def load(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT table_name, rows_done, completed, deferred_indexes "
+                           "FROM bulk_import_checkpoints WHERE job = %s", (self.job,))
+            return {row[0]: row[1:] for row in cursor.fetchall()}
+
+    def save(self, cursor, table, rows_done, completed=False):
+        """Records progress on ``cursor``; the caller commits it with the batch."""
+        cursor.execute("""
+            INSERT INTO bulk_import_checkpoints (job, table_name, rows_done, completed)
+            VALUES (%s, %s, %s, %s)
+            ON DUPLICATE KEY UPDATE rows_done = VALUES(rows_done), completed = VALUES(completed)
+        """, (self.job, table, rows_done, completed))
+
+    def save_indexes(self, table, indexes):
+        with self.conn.cursor() as cursor:
+            cursor.execute("""
+                INSERT INTO bulk_import_checkpoints (job, table_name, deferred_indexes)
+                VALUES (%s, %s, %s)
+                ON DUPLICATE KEY UPDATE deferred_indexes = VALUES(deferred_indexes)
+            """, (self.job, table, json.dumps(indexes) if indexes else None))
+        self.conn.commit()
+
+
+def secondary_indexes(conn, table):
+    """Returns ``{index_name: [columns]}`` for the droppable ``idx_*`` indexes of a table."""
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT index_name, column_name FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s AND index_name LIKE 'idx\\_%%'
+            ORDER BY index_name, seq_in_index
+        """, (table,))
+        indexes = {}
+        for name, column in cursor.fetchall():
+            indexes.setdefault(name, []).append(column)
+    return indexes
+
+
+def foreign_key_indexes(conn, table, indexes):
+    """Names of the ``idx_*`` indexes MySQL needs for a foreign key of ``table``.
+
+    InnoDB drops its own foreign key index once another index starts with the
+    key's columns, and refuses to drop that index afterwards (error 1553), so
+    an ``idx_*`` index is kept when no other index covers the key.
+    """
+    with conn.cursor() as cursor:
+        cursor.execute("""
+            SELECT constraint_name, column_name FROM information_schema.key_column_usage
+            WHERE table_schema = DATABASE() AND table_name = %s AND referenced_table_name IS NOT NULL
+            ORDER BY constraint_name, ordinal_position
+        """, (table,))
+        foreign_keys = {}
+        for name, column in cursor.fetchall():
+            foreign_keys.setdefault(name, []).append(column)
+        cursor.execute("""
+            SELECT index_name, column_name FROM information_schema.statistics
+            WHERE table_schema = DATABASE() AND table_name = %s
+            ORDER BY index_name, seq_in_index
+        """, (table,))
+        others = {}
+        for name, column in cursor.fetchall():
+            if name not in indexes:
+                others.setdefault(name, []).append(column)
+
+    keep = set()
+    for columns in foreign_keys.values():
+        if any(index_columns[:len(columns)] == columns for index_columns in others.values()):
+            continue
+        covering = sorted(name for name, index_columns in indexes.items() if index_columns[:len(columns)] == columns)
+        # One covering index is enough; any others can still be deferred.
+        if covering and not keep.intersection(covering):
+            keep.add(covering[0])
+    return keep
+
+
+def drop_indexes(conn, checkpoints, state, table):
+    indexes = secondary_indexes(conn, table)
+    kept = foreign_key_indexes(conn, table, indexes)
+    indexes = {name: columns for name, columns in indexes.items() if name not in kept}
+    if kept:
+        print("%-14s keeping %s for foreign keys" % (table, ", ".join(sorted(kept))), file=sys.stderr)
+    if not indexes:
+        return
+    recorded = json.loads(state[table][2]) if table in state and state[table][2] else {}
+    checkpoints.save_indexes(table, dict(recorded, **indexes))
+    with conn.cursor() as cursor:
+        cursor.execute("ALTER TABLE %s %s" % (table, ", ".join("DROP INDEX %s" % name for name in indexes)))
+    print("%-14s dropped %s" % (table, ", ".join(indexes)), file=sys.stderr)
+
+
+def rebuild_indexes(conn, checkpoints, table):
+    state = checkpoints.load().get(table)
+    indexes = json.loads(state[2]) if state and state[2] else {}
+    existing = secondary_indexes(conn, table)
+    missing = {name: columns for name, columns in indexes.items() if name not in existing}
+    if missing:
+        started = time.perf_counter()
+        with conn.cursor() as cursor:
+            cursor.execute("ALTER TABLE %s %s" % (table, ", ".join(
+                "ADD INDEX %s (%s)" % (name, ", ".join(columns)) for name, columns in missing.items())))
+        print("%-14s rebuilt %s in %.1f s" % (table, ", ".join(missing), time.perf_counter() - started),
+              file=sys.stderr)
+    checkpoints.save_indexes(table, None)
+
+
+def _insert_batch(cursor, table, columns, batch):
+    cursor.executemany("INSERT INTO %s (%s) VALUES (%s)" % (
+        table, ", ".join(columns), ", ".join(["%s"] * len(columns))), batch)
+
+
+def _csv_field(value):
+    if value is None:
+        return "NULL"
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return str(value)
+    return '"%s"' % str(value).replace('"', '""')
+
+
+def _load_batch(cursor, table, columns, batch):
+    with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False, encoding="utf-8", newline="") as f:
+        for row in batch:
+            f.write(",".join(_csv_field(v) for v in row) + "\n")
+        path = f.name
+    try:
+        cursor.execute("""
+            LOAD DATA LOCAL INFILE %%s INTO TABLE %s CHARACTER SET utf8mb4
+            FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '"' ESCAPED BY ''
+            LINES TERMINATED BY '\\n' (%s)
+        """ % (table, ", ".join(columns)), (path,))
+    finally:
+        os.unlink(path)
+
+
+def import_table(conn, checkpoints, state, table, columns, path, fmt, batch_size, load_data):
+    rows_done, completed = (state[table][0], state[table][1]) if table in state else (0, False)
+    if completed:
+        print("%-14s already imported" % table, file=sys.stderr)
+        return
+
+    rows = read_rows(path, columns, fmt)
+    for _ in range(rows_done):
+        next(rows)
+
+    write_batch = _load_batch if load_data else _insert_batch
+    progress = Progress(table, rows_done)
+    for batch in _batches(rows, batch_size):
+        with conn.cursor() as cursor:
+            write_batch(cursor, table, columns, batch)
+            rows_done += len(batch)
+            checkpoints.save(cursor, table, rows_done)
+        conn.commit()
+        progress.add(len(batch))
+
+    with conn.cursor() as cursor:
+        checkpoints.save(cursor, table, rows_done, completed=True)
+    conn.commit()
+    progress.finish()
+
+
+def run_import(conn, directory, fmt, tables, job, batch_size, load_data, defer_indexes):
+    checkpoints = Checkpoints(conn, job)
+    state = checkpoints.load()
+    phases = [(table, columns) for table, columns in TABLES
+              if table in tables and os.path.exists(_path(directory, table, fmt))]
+
+    if defer_indexes:
+        for table, _ in phases:
+            if not (table in state and state[table][1]):
+                drop_indexes(conn, checkpoints, state, table)
+
+    started = time.perf_counter()
+    for table, columns in phases:
+        import_table(conn, checkpoints, state, table, columns, _path(directory, table, fmt),
+                     fmt, batch_size, load_data)
+
+    for table, _ in phases:
+        rebuild_indexes(conn, checkpoints, table)
+    print("import finished in %.1f s; run 'flask reconcile-question-stats', 'flask rebuild-search-index', "
+          "'flask rebuild-leaderboards' and 'flask rebuild-tag-index'" % (time.perf_counter() - started),
+          file=sys.stderr)
+
+
+def connect(config, load_data=False):
+    return pymysql.connect(
+        host=config['MYSQL_HOST'],
+        port=config['MYSQL_PORT'],
+        user=config['MYSQL_USER'],
+        password=config['MYSQL_PASSWORD'],
+        database=config['MYSQL_DB'],
+        charset=config['MYSQL_CHARSET'],
+        autocommit=False,
+        local_infile=load_data,
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    sub = parser.add_subparsers(dest="command", required=True)
+    table_names = [table for table, _ in TABLES]
+
+    export_parser = sub.add_parser("export", help="write every table to a dump directory")
+    import_parser = sub.add_parser("import", help="load a dump directory into the database")
+    for p in (export_parser, import_parser):
+        p.add_argument("directory")
+        p.add_argument("--format", choices=FORMATS, default="ndjson")
+        p.add_argument("--tables", default=",".join(table_names),
+                       help="comma-separated subset of: %s" % ", ".join(table_names))
+    import_parser.add_argument("--batch-size", type=int, default=1000)
+    import_parser.add_argument("--job", help="checkpoint name, defaults to the directory name")
+    import_parser.add_argument("--load-data", action="store_true", help="use LOAD DATA LOCAL INFILE")
+    import_parser.add_argument("--defer-indexes", action="store_true",
+                               help="drop idx_* indexes during the load and rebuild them at the end")
+    args = parser.parse_args()
+
+    tables = {t.strip() for t in args.tables.split(",") if t.strip()}
+    unknown = tables - set(table_names)
+    if unknown:
+        parser.error("unknown tables: %s" % ", ".join(sorted(unknown)))
+
+    from wsgi import app
+
+    conn = connect(app.config, load_data=getattr(args, "load_data", False))
+    try:
+        if args.command == "export":
+            export(conn, args.directory, args.format, tables)
+        else:
+            job = args.job or os.path.basename(os.path.abspath(args.directory))
+            run_import(conn, args.directory, args.format, tables, job,
+                       args.batch_size, args.load_data, args.defer_indexes)
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,11 @@
+-- One row per user and voted item; the aggregate lives in questions/answers.upvotes
+CREATE TABLE votes (
+    user_id INT NOT NULL,
+    target_type ENUM('question', 'answer') NOT NULL,
+    target_id INT NOT NULL,
+    value TINYINT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, target_type, target_id),
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+
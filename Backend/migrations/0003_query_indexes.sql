@@ -0,0 +1,23 @@
+-- Indexes for the queries issued by app/routes.py and app/models.py.
+
+-- Question and answer comments: WHERE parent_type = ? AND parent_id IN (...)
+CREATE INDEX idx_comments_parent ON comments (parent_type, parent_id, comment_id);
+
+-- get_questions_by_tag: tag -> questions
+CREATE INDEX idx_question_tags_tag ON question_tags (tag_id, question_id);
+
+-- Keyset listings: sort=newest and sort=top
+CREATE INDEX idx_questions_created ON questions (created_at, question_id);
+CREATE INDEX idx_questions_top ON questions (upvotes, views, question_id);
+
+-- /api/user/myquestions
+CREATE INDEX idx_questions_user_created ON questions (user_id, created_at, question_id);
+
+-- Conditional GET version of the question list: MAX(updated_at)
+CREATE INDEX idx_questions_updated ON questions (updated_at);
+
+-- Question detail: answers of a question in id order
+CREATE INDEX idx_answers_question ON answers (question_id, answer_id);
+
+-- /api/my-answered-questions
+CREATE INDEX idx_answers_user_created ON answers (user_id, created_at, answer_id);
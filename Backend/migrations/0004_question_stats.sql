@@ -0,0 +1,34 @@
+-- Per-question summary maintained by the write routes, so list pages can show
+-- answer and comment counts, last activity and tags without extra queries.
+-- `flask reconcile-question-stats` recomputes it in batches to repair drift.
+CREATE TABLE question_stats (
+    question_id INT PRIMARY KEY,
+    answer_count INT NOT NULL DEFAULT 0,
+    comment_count INT NOT NULL DEFAULT 0,
+    last_activity_at TIMESTAMP NULL,
+    tags VARCHAR(1024) NOT NULL DEFAULT '',
+    FOREIGN KEY (question_id) REFERENCES questions(question_id) ON DELETE CASCADE
+);
+
+-- Conditional GET version of the question list: MAX(last_activity_at)
+CREATE INDEX idx_question_stats_activity ON question_stats (last_activity_at);
+
+-- Backfill; comment_count includes comments on the question's answers.
+INSERT INTO question_stats (question_id, answer_count, comment_count, last_activity_at, tags)
+SELECT q.question_id,
+    (SELECT COUNT(*) FROM answers a WHERE a.question_id = q.question_id),
+    (SELECT COUNT(*) FROM comments c WHERE c.parent_type = 'question' AND c.parent_id = q.question_id)
+        + (SELECT COUNT(*) FROM answers a JOIN comments c ON c.parent_type = 'answer' AND c.parent_id = a.answer_id
+           WHERE a.question_id = q.question_id),
+    GREATEST(
+        q.updated_at,
+        COALESCE((SELECT MAX(a.updated_at) FROM answers a WHERE a.question_id = q.question_id), q.updated_at),
+        COALESCE((SELECT MAX(c.updated_at) FROM comments c
+                  WHERE c.parent_type = 'question' AND c.parent_id = q.question_id), q.updated_at),
+        COALESCE((SELECT MAX(c.updated_at) FROM answers a JOIN comments c
+                  ON c.parent_type = 'answer' AND c.parent_id = a.answer_id
+                  WHERE a.question_id = q.question_id), q.updated_at)),
+    COALESCE((SELECT GROUP_CONCAT(t.tag_name ORDER BY t.tag_name SEPARATOR ',')
+              FROM question_tags qt JOIN tags t ON t.tag_id = qt.tag_id
+              WHERE qt.question_id = q.question_id), '')
+FROM questions q;
@@ -0,0 +1,11 @@
+-- Highlighted code snippets keyed by the SHA-256 of the code, so a snippet
+-- used by many questions and answers is rendered and stored once.
+-- `flask render-code` fills in rows for existing snippets.
+CREATE TABLE code_renderings (
+    code_hash BINARY(32) PRIMARY KEY,
+    renderer_version SMALLINT NOT NULL,
+    language VARCHAR(64) NOT NULL,
+    html MEDIUMTEXT NOT NULL,
+    tokens MEDIUMTEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
@@ -0,0 +1,17 @@
+-- Edit history of question and answer body/code. Each edit is stored as a
+-- zlib-compressed line delta against the previous revision, with a full
+-- snapshot at least every REVISIONS_SNAPSHOT_INTERVAL revisions so reading
+-- any revision applies a bounded number of deltas. Revision 1 is the text
+-- as it was before the first recorded edit.
+CREATE TABLE revisions (
+    target_type ENUM('question', 'answer') NOT NULL,
+    target_id INT NOT NULL,
+    revision INT NOT NULL,
+    user_id INT NULL,
+    kind ENUM('snapshot', 'delta') NOT NULL,
+    data MEDIUMBLOB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (target_type, target_id, revision),
+    -- Deleting an editor must not drop a delta out of someone else's chain.
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE SET NULL
+);
@@ -0,0 +1,11 @@
+-- MinHash signatures of question title, body and code for near-duplicate
+-- detection. The in-memory LSH index is loaded from this table, so workers
+-- start without re-shingling every question. `flask rebuild-similarity-index`
+-- computes signatures for existing questions.
+CREATE TABLE question_signatures (
+    question_id INT PRIMARY KEY,
+    signature_version SMALLINT NOT NULL,
+    signature VARBINARY(1024) NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (question_id) REFERENCES questions(question_id) ON DELETE CASCADE
+);
@@ -0,0 +1,75 @@
+import time
+
+import pytest
+
+from app.cache import MISSING, Cache, LocalCache, RedisCache
+
+
+class FakeRedis:
+    def __init__(self):
+        self.data = {}
+
+    def get(self, key):
+        entry = self.data.get(key)
+        if entry is None or entry[1] < time.time():
+            return None
+        return entry[0]
+
+    def set(self, key, value, px):
+        self.data[key] = (value.encode() if isinstance(value, str) else value, time.time() + px / 1000)
+
+    def delete(self, *keys):
+        for key in keys:
+            self.data.pop(key, None)
+
+    def scan_iter(self, match):
+        return [key for key in list(self.data) if key.startswith(match.rstrip("*"))]
+
+
+@pytest.fixture(params=["local", "redis"])
+def cache(request):
+    cache = Cache()
+    if request.param == "redis":
+        cache.backend = RedisCache(FakeRedis())
+    else:
+        cache.backend = LocalCache()
+    return cache
+
+
+def test_miss_loads_and_stores(cache):
+    assert cache.get_or_set("k", lambda: 1) == 1
+    assert cache.get_or_set("k", lambda: 2) == 1
+    assert cache.stats()["hits"] == 1
+
+
+def test_load_overlapping_an_invalidation_is_not_stored(cache):
+    def stale_load():
+        # A write commits and invalidates while this read is still loading.
+        cache.invalidate("k")
+        return "old"
+
+    assert cache.get_or_set("k", stale_load) == "old"
+    assert cache.backend.get("k") is MISSING
+    assert cache.get_or_set("k", lambda: "new") == "new"
+    assert cache.get_or_set("k", lambda: "newer") == "new"
+    assert cache.stats()["stale_loads"] == 1
+
+
+def test_invalidation_before_the_load_does_not_block_it(cache):
+    cache.invalidate("k")
+    time.sleep(0.001)
+    cache.get_or_set("k", lambda: 1)
+    assert cache.backend.get("k") == 1
+
+
+def test_none_is_not_cached(cache):
+    assert cache.get_or_set("k", lambda: None) is None
+    assert cache.backend.get("k") is MISSING
+
+
+def test_redis_len_ignores_invalidation_marks():
+    cache = Cache()
+    cache.backend = RedisCache(FakeRedis())
+    cache.get_or_set("a", lambda: 1)
+    cache.invalidate("b")
+    assert cache.stats()["entries"] == 1
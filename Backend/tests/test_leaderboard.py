@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+from app.leaderboard import SortedKeys
+
+
+def check(keys, model):
+    assert len(keys) == len(model)
+    assert keys.first(len(model) + 5) == model
+    assert keys._maxes == [chunk[-1] for chunk in keys._chunks]
+    assert all(chunk for chunk in keys._chunks)
+    assert all(len(chunk) <= 2 * keys.load for chunk in keys._chunks)
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_matches_sorted_list(seed):
+    rng = random.Random(seed)
+    keys = SortedKeys(load=4)
+    model = sorted(rng.sample(range(1000), rng.randint(0, 50)))
+    keys.load_sorted(list(model))
+    check(keys, model)
+
+    for _ in range(500):
+        if model and rng.random() < 0.45:
+            key = rng.choice(model)
+            keys.remove(key)
+            model.remove(key)
+        else:
+            key = rng.randrange(1000)
+            if key in model:
+                continue
+            keys.add(key)
+            model.append(key)
+            model.sort()
+        k = rng.randint(0, 20)
+        assert keys.first(k) == model[:k]
+    check(keys, model)
+
+
+def test_tuple_keys_sort_best_first():
+    keys = SortedKeys(load=2)
+    for question_id, votes in [(1, 5), (2, 9), (3, 5), (4, 0), (5, 9)]:
+        keys.add((-votes, -question_id))
+    assert [-question_id for _, question_id in keys.first(3)] == [5, 2, 3]
+
+
+def test_remove_missing_key():
+    keys = SortedKeys(load=2)
+    with pytest.raises(KeyError):
+        keys.remove(1)
+    keys.load_sorted([1, 3, 5])
+    for missing in (0, 2, 6):
+        with pytest.raises(KeyError):
+            keys.remove(missing)
+    check(keys, [1, 3, 5])
@@ -0,0 +1,85 @@
+import random
+import sqlite3
+
+import pytest
+
+from app.pagination import KeysetPaginator, PaginationError, decode_cursor, encode_cursor
+
+paginator = KeysetPaginator(
+    columns={"id": "id", "votes": "votes", "views": "views"},
+    sorts={"votes": ("votes", "views", "id"), "newest": ("id",)},
+    default_fields=("votes",),
+    required_fields=("id",),
+)
+
+
+@pytest.fixture(scope="module")
+def db():
+    rng = random.Random(0)
+    conn = sqlite3.connect(":memory:")
+    conn.execute("CREATE TABLE posts (id INTEGER PRIMARY KEY, votes INTEGER, views INTEGER)")
+    # Few distinct values, so rows tie on the leading keys and the later ones decide the order.
+    conn.executemany("INSERT INTO posts VALUES (?, ?, ?)",
+                     [(i, rng.randrange(4), rng.randrange(3)) for i in range(1, 201)])
+    yield conn
+    conn.close()
+
+
+def run(db, page, where=None, params=()):
+    query, params = paginator.build("posts", page, where, params)
+    return db.execute(query.replace("%s", "?"), params).fetchall()
+
+
+def walk(db, args, where=None, params=()):
+    items, cursor, pages = [], None, 0
+    while True:
+        page = paginator.parse(dict(args, cursor=cursor) if cursor else args)
+        page_items, cursor = paginator.paginate(page, run(db, page, where, params))
+        assert len(page_items) <= page.limit
+        items.extend(page_items)
+        pages += 1
+        if cursor is None:
+            return items, pages
+
+
+@pytest.mark.parametrize("sort", ["votes", "newest"])
+@pytest.mark.parametrize("limit", [1, 7, 20, 100])
+def test_pages_cover_the_order_exactly_once(db, sort, limit):
+    keys = paginator.sorts[sort]
+    expected = db.execute("SELECT id FROM posts ORDER BY %s" % ", ".join(k + " DESC" for k in keys)).fetchall()
+    items, pages = walk(db, {"sort": sort, "limit": str(limit)})
+    assert [item["id"] for item in items] == [row[0] for row in expected]
+    assert pages == max(1, -(-len(expected) // limit))
+
+
+def test_where_params_come_before_the_keyset(db):
+    expected = [row[0] for row in db.execute(
+        "SELECT id FROM posts WHERE views = 1 ORDER BY votes DESC, views DESC, id DESC")]
+    items, _ = walk(db, {"limit": "3"}, "views = %s", [1])
+    assert [item["id"] for item in items] == expected
+
+
+def test_fields_projection():
+    page = paginator.parse({"fields": "views"})
+    assert page.fields == ("id", "views")
+    assert page.limit == 20 and page.after is None
+    query, params = paginator.build("posts", page)
+    assert query == "SELECT id, views, votes, views, id FROM posts ORDER BY votes DESC, views DESC, id DESC LIMIT %s"
+    assert params == [21]
+
+
+def test_cursor_round_trip():
+    token = encode_cursor("votes", [3, 0, 17])
+    assert "=" not in token
+    assert decode_cursor(token, "votes", 3) == [3, 0, 17]
+    with pytest.raises(PaginationError):
+        decode_cursor(token, "newest", 1)
+    with pytest.raises(PaginationError):
+        decode_cursor("not a cursor", "votes", 3)
+
+
+@pytest.mark.parametrize("args", [{"limit": "0"}, {"limit": "101"}, {"limit": "x"}, {"sort": "oldest"},
+                                  {"fields": "id,secret"}])
+def test_parse_rejects_bad_arguments(args):
+    with pytest.raises(PaginationError):
+        paginator.parse(args)
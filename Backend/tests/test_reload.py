@@ -0,0 +1,78 @@
+import threading
+
+from app import reload
+from app.reload import Reloader
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_builds_once_then_reloads_after_the_interval(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(reload.time, "monotonic", clock)
+    reloader = Reloader(interval=60)
+    builds = []
+
+    assert reloader.due()
+    reloader.ensure(lambda: builds.append(clock.now))
+    reloader.ensure(lambda: builds.append(clock.now))
+    assert builds == [1000.0]
+    assert not reloader.due()
+
+    clock.now += 60
+    assert reloader.due()
+    reloader.ensure(lambda: builds.append(clock.now))
+    assert builds == [1000.0, 1060.0]
+    assert reloader.reloads == 1
+
+
+def test_zero_interval_never_reloads(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(reload.time, "monotonic", clock)
+    reloader = Reloader(interval=0)
+    builds = []
+    reloader.ensure(lambda: builds.append(1))
+    clock.now += 10 ** 6
+    reloader.ensure(lambda: builds.append(2))
+    assert builds == [1]
+
+
+def test_reload_in_progress_does_not_block_readers(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(reload.time, "monotonic", clock)
+    reloader = Reloader(interval=60)
+    reloader.ensure(lambda: None)
+    clock.now += 60
+
+    started, release = threading.Event(), threading.Event()
+
+    def slow_build():
+        started.set()
+        release.wait(5)
+
+    reloading = threading.Thread(target=reloader.ensure, args=(slow_build,))
+    reloading.start()
+    started.wait(5)
+    # Another request finds the index due but returns at once with the current contents.
+    reloader.ensure(lambda: (_ for _ in ()).throw(AssertionError("second reload")))
+    release.set()
+    reloading.join()
+    assert not reloader.due()
+
+
+def test_failed_build_leaves_the_index_due():
+    reloader = Reloader(interval=60)
+
+    def failing_build():
+        raise RuntimeError("db down")
+
+    try:
+        reloader.ensure(failing_build)
+    except RuntimeError:
+        pass
+    assert reloader.due()
@@ -0,0 +1,161 @@
+import random
+
+import pytest
+
+from app import revisions
+from app.revisions import (RevisionError, RevisionStore, apply_delta, make_delta, parse_diff_args,
+                           side_by_side_diff, unified_diff)
+
+WORDS = ["def", "return", "x", "y = 1", "", "    pass", "# note", "print(x)", "}", "{"]
+
+
+def random_text(rng):
+    if rng.random() < 0.05:
+        return None
+    lines = [rng.choice(WORDS) for _ in range(rng.randint(0, 30))]
+    newline = rng.choice(["\n", "\r\n"])
+    text = newline.join(lines)
+    if lines and rng.random() < 0.5:
+        text += newline
+    return text
+
+
+def edit(rng, text):
+    lines = (text or "").splitlines(keepends=True)
+    for _ in range(rng.randint(0, 5)):
+        op = rng.randrange(3)
+        i = rng.randint(0, len(lines))
+        if op == 0:
+            lines.insert(i, rng.choice(WORDS) + "\n")
+        elif lines and op == 1:
+            del lines[min(i, len(lines) - 1)]
+        elif lines:
+            lines[min(i, len(lines) - 1)] = rng.choice(WORDS) + rng.choice(["\n", ""])
+    return "".join(lines)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_delta_round_trip(seed):
+    rng = random.Random(seed)
+    for _ in range(50):
+        old = random_text(rng)
+        new = edit(rng, old) if rng.random() < 0.8 else random_text(rng)
+        assert apply_delta(old, make_delta(old, new)) == new
+
+
+def test_delta_edge_cases():
+    assert make_delta("a\n", None) is None
+    assert apply_delta("a\n", None) is None
+    assert apply_delta(None, make_delta(None, "a\nb")) == "a\nb"
+    assert apply_delta("a\nb", make_delta("a\nb", "")) == ""
+    assert make_delta("a\nb\n", "a\nb\n") == [2]
+
+
+class FakeRevisionDB:
+    """The revisions table and the queries RevisionStore runs against it."""
+
+    def __init__(self):
+        self.rows = {}
+
+    def cursor(self):
+        return FakeCursor(self)
+
+
+class FakeCursor:
+    def __init__(self, db):
+        self.db = db
+        self.result = []
+
+    def execute(self, query, params):
+        db = self.db
+        if query == revisions.LATEST_REVISIONS_QUERY:
+            target = tuple(params)
+            numbers = [n for (t, i, n) in db.rows if (t, i) == target]
+            snapshots = [n for (t, i, n), row in db.rows.items() if (t, i) == target and row[1] == "snapshot"]
+            self.result = [(max(numbers, default=None), max(snapshots, default=None))]
+        elif query == revisions.target_query(revisions.FIRST_REVISION_QUERY, params[0]):
+            target_type, target_id, data, _ = params
+            db.rows[(target_type, target_id, 1)] = (None, "snapshot", data)
+        elif query == revisions.INSERT_REVISION_QUERY:
+            target_type, target_id, number, user_id, kind, data = params
+            db.rows[(target_type, target_id, number)] = (user_id, kind, data)
+        elif query == revisions.RECONSTRUCT_QUERY:
+            target_type, target_id, number = params[:3]
+            mine = {n: row for (t, i, n), row in db.rows.items() if (t, i) == (target_type, target_id)}
+            snapshot = max((n for n, row in mine.items() if n <= number and row[1] == "snapshot"), default=None)
+            self.result = [] if snapshot is None else [
+                (n, mine[n][1], mine[n][2]) for n in sorted(mine) if snapshot <= n <= number]
+        else:
+            raise AssertionError("unexpected query: %s" % query)
+
+    def fetchone(self):
+        return self.result[0] if self.result else None
+
+    def fetchall(self):
+        return self.result
+
+
+@pytest.mark.parametrize("interval", [1, 3, 10])
+def test_every_recorded_revision_reconstructs(interval):
+    rng = random.Random(interval)
+    store = RevisionStore()
+    store.snapshot_interval = interval
+    db = FakeRevisionDB()
+    cursor = db.cursor()
+
+    history = [{"body": "first\n", "code": None}]
+    for _ in range(40):
+        new = {"body": edit(rng, history[-1]["body"]), "code": edit(rng, history[-1]["code"])}
+        number = store.record(cursor, "question", 7, 1, history[-1], new)
+        if number is None:
+            assert new == history[-1]
+            continue
+        history.append(new)
+        assert number == len(history)
+
+    for number, expected in enumerate(history, 1):
+        assert store.content(cursor, "question", 7, number) == expected
+    assert store.content(cursor, "question", 7, len(history) + 1) is None
+    # Reading any revision starts from a snapshot at most `interval` revisions back.
+    assert store.deltas_applied <= len(history) * (interval - 1)
+
+
+def test_unchanged_edit_is_not_recorded():
+    store = RevisionStore()
+    db = FakeRevisionDB()
+    assert store.record(db.cursor(), "answer", 1, 1, {"body": "a", "code": None}, {"body": "a", "code": None}) is None
+    assert db.rows == {}
+
+
+def test_side_by_side_rows_rebuild_both_sides():
+    rng = random.Random(0)
+    for _ in range(100):
+        old = random_text(rng) or ""
+        new = edit(rng, old)
+        old_lines, new_lines = [], []
+        for rows in side_by_side_diff(old, new, context=10 ** 6):
+            for tag, old_no, old_line, new_no, new_line in rows:
+                if old_no is not None:
+                    assert old_no == len(old_lines) + 1
+                    old_lines.append(old_line)
+                if new_no is not None:
+                    assert new_no == len(new_lines) + 1
+                    new_lines.append(new_line)
+        if old.splitlines() != new.splitlines():
+            assert old_lines == old.splitlines()
+            assert new_lines == new.splitlines()
+
+
+def test_unified_diff_headers_name_revisions():
+    diff = unified_diff("a\n", "b\n", 1, 2, "body", 3)
+    assert diff.splitlines()[:2] == ["--- r1/body", "+++ r2/body"]
+    assert unified_diff("a\n", "a\n", 1, 2, "body", 3) == ""
+
+
+def test_parse_diff_args():
+    assert parse_diff_args({}) == (None, None, "unified", 3)
+    assert parse_diff_args({"from": "2", "to": "5", "format": "side-by-side", "context": "0"}) == (
+        2, 5, "side-by-side", 0)
+    for bad in ({"from": "x"}, {"to": "0"}, {"format": "html"}, {"context": "-1"}, {"context": "51"}):
+        with pytest.raises(RevisionError):
+            parse_diff_args(bad)
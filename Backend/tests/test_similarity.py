@@ -0,0 +1,61 @@
+from app.similarity import (BANDS, NUM_PERM, ROWS, SimilarityIndex, _band_keys, estimate_similarity,
+                            signature)
+
+TITLE = "How do I merge two dictionaries in a single expression"
+BODY = ("I have two Python dictionaries and I want to write a single expression that returns "
+        "these two dictionaries merged, keeping the values of the second one for shared keys.")
+CODE = "x = {'a': 1, 'b': 2}\ny = {'b': 3, 'c': 4}\nz = merge(x, y)"
+
+
+def test_bands_cover_the_signature():
+    assert BANDS * ROWS == NUM_PERM
+    sig = signature(TITLE, BODY, CODE)
+    assert len(sig) == NUM_PERM
+    assert len(_band_keys(sig)) == BANDS
+
+
+def test_identical_text_matches_exactly():
+    a, b = signature(TITLE, BODY, CODE), signature(TITLE, BODY, CODE)
+    assert estimate_similarity(a, b) == 1
+    assert _band_keys(a) == _band_keys(b)
+
+
+def test_empty_text_has_no_signature():
+    assert signature("", "", "") is None
+    assert SimilarityIndex().similar("", None, None) == []
+
+
+def index_of(questions):
+    index = SimilarityIndex()
+    for question_id, (title, body, code) in questions.items():
+        index._add(question_id, title, signature(title, body, code))
+    return index
+
+
+def test_finds_near_duplicate():
+    index = index_of({
+        1: (TITLE, BODY, CODE),
+        2: ("Why is my SQL join slow", "The query scans the whole orders table even though "
+            "customer_id has an index and the planner ignores it.", "SELECT * FROM orders"),
+    })
+    reworded = BODY.replace("keeping the values", "keeping the value")
+    found = index.similar(TITLE, reworded, CODE)
+    assert [item["question_id"] for item in found] == [1]
+    assert found[0]["title"] == TITLE
+    assert index.min_score <= found[0]["score"] < 1
+
+    assert index.similar(TITLE, reworded, CODE, exclude=1) == []
+
+
+def test_unrelated_text_is_not_reported():
+    index = index_of({1: (TITLE, BODY, CODE)})
+    assert index.similar("Centering a div with flexbox", "The element stays on the left of the "
+                         "page no matter which justify-content value I try.", "") == []
+
+
+def test_readding_replaces_bands():
+    index = index_of({1: (TITLE, BODY, CODE)})
+    index._add(1, "Unrelated", signature("Unrelated", "a completely different question body here", ""))
+    assert index.similar(TITLE, BODY, CODE) == []
+    index._remove(1)
+    assert not any(index._bands)
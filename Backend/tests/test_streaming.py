@@ -0,0 +1,111 @@
+import json
+import threading
+
+from flask import Flask
+
+from app.db import MySQLPool
+from app.pagination import KeysetPaginator
+from app.streaming import stream_page
+
+POOL_SIZE = 4
+ROWS = [(i, "question %d" % i, i) for i in range(1200, 0, -1)]
+
+paginator = KeysetPaginator(
+    {"question_id": "q.question_id", "title": "q.title"},
+    {"newest": ("q.question_id",)},
+    default_fields=("question_id", "title"),
+)
+
+
+class FakeCursor:
+    def __init__(self):
+        self._rows = []
+
+    def execute(self, query, params=()):
+        self._rows = list(ROWS)
+
+    def fetchone(self):
+        return (len(self._rows),)
+
+    def fetchmany(self, size):
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+    def close(self):
+        pass
+
+
+class FakeConnection:
+    open = True
+
+    def cursor(self, cursor_class=None):
+        return FakeCursor()
+
+    def ping(self, reconnect=False):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        self.open = False
+
+
+def make_app():
+    app = Flask(__name__)
+    app.config['MYSQL_POOL_SIZE'] = POOL_SIZE
+    app.config['MYSQL_POOL_TIMEOUT'] = 2.0
+    mysql = MySQLPool(app)
+    mysql.pool._connect = lambda **kwargs: FakeConnection()
+    return app, mysql
+
+
+def test_pool_size_concurrent_streams_do_not_exhaust_the_pool():
+    app, mysql = make_app()
+    page = paginator.parse({}, streaming=True)
+    query, params = paginator.build("questions q", page)
+    # Every request holds its version-check connection before any stream starts.
+    versions_checked = threading.Barrier(POOL_SIZE)
+    bodies, errors = [], []
+
+    def stream():
+        try:
+            with app.test_request_context("/api/questions?stream=json"):
+                with mysql.cursor() as cursor:
+                    cursor.execute("SELECT COUNT(*) FROM questions")
+                versions_checked.wait()
+                response = stream_page(paginator, page, mysql, query, params, "json", "questions")
+                bodies.append("".join(response.response))
+                response.close()
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=stream) for _ in range(POOL_SIZE)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len(bodies) == POOL_SIZE
+    for body in bodies:
+        data = json.loads(body)
+        assert [q["question_id"] for q in data["questions"]] == [row[0] for row in ROWS]
+        assert data["next_cursor"] is None
+    status = mysql.status()
+    assert status["in_use"] == 0
+    assert status["exhausted"] == 0
+
+
+def test_limited_stream_returns_next_cursor():
+    app, mysql = make_app()
+    page = paginator.parse({"limit": "700"}, streaming=True)
+    query, params = paginator.build("questions q", page)
+    with app.test_request_context("/api/questions?stream=json&limit=700"):
+        response = stream_page(paginator, page, mysql, query, params, "json", "questions")
+        data = json.loads("".join(response.response))
+        response.close()
+
+    assert len(data["questions"]) == 700
+    assert data["next_cursor"] == paginator.paginate(page, ROWS[:701])[1]
+    assert mysql.status()["in_use"] == 0
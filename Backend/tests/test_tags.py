@@ -0,0 +1,101 @@
+import random
+
+import pytest
+
+from app.tags import PostingList, TagTrie, intersect, union
+
+
+def check(posting, model):
+    assert len(posting) == len(model)
+    assert list(posting) == sorted(model)
+    assert (posting.ids is None) != (posting.bits is None)
+    assert posting.as_int() == sum(1 << question_id for question_id in model)
+
+
+def random_posting(rng):
+    """A posting list that is sparse or dense depending on the id range."""
+    high = rng.choice([64, 1000, 100000])
+    model = set(rng.sample(range(high), rng.randint(0, min(high, 200))))
+    return PostingList(sorted(model)), model
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_matches_set_across_representations(seed):
+    rng = random.Random(seed)
+    posting, model = PostingList(), set()
+    for _ in range(2000):
+        # Mostly a dense range, with the occasional far-out id making the list sparse again.
+        question_id = rng.randrange(200) if rng.random() < 0.95 else rng.randrange(10000)
+        if rng.random() < 0.6:
+            assert posting.add(question_id) == (question_id not in model)
+            model.add(question_id)
+        else:
+            assert posting.remove(question_id) == (question_id in model)
+            model.discard(question_id)
+        assert (question_id in posting) == (question_id in model)
+    check(posting, model)
+
+
+def test_switches_representation_both_ways():
+    posting = PostingList(range(0, 200, 100))
+    assert posting.bits is None
+    for question_id in range(200):
+        posting.add(question_id)
+    assert posting.ids is None
+    posting.add(100000)
+    assert posting.bits is None
+    posting.remove(100000)
+    assert posting.ids is None
+    for question_id in range(199):
+        posting.remove(question_id)
+    assert posting.bits is None
+    check(posting, {199})
+
+
+def test_representation_follows_density():
+    assert PostingList([1, 5, 100000]).bits is None
+    assert PostingList(range(0, 64)).ids is None
+    posting = PostingList.from_int((1 << 3) | (1 << 100000))
+    assert posting.bits is None
+    check(posting, {3, 100000})
+    check(PostingList.from_int(0), set())
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_intersect_and_union_match_sets(seed):
+    rng = random.Random(seed)
+    lists = [random_posting(rng) for _ in range(rng.randint(1, 4))]
+    postings = [posting for posting, _ in lists]
+    models = [model for _, model in lists]
+    check(intersect(postings), set.intersection(*models))
+    check(union(postings), set.union(*models))
+
+
+def test_empty_inputs():
+    check(intersect([]), set())
+    check(union([]), set())
+    check(intersect([PostingList(), PostingList([1, 2])]), set())
+    check(union([PostingList(), PostingList([1, 2])]), {1, 2})
+
+
+def test_where():
+    assert PostingList().where("q.question_id") == ("1 = 0", [])
+    assert PostingList([2, 7]).where("q.question_id") == ("q.question_id IN (%s, %s)", [2, 7])
+
+
+def test_trie_prefixes():
+    trie = TagTrie()
+    names = {"python": 1, "Python3": 2, "pandas": 3, "java": 4, "javascript": 5}
+    for name, tag_id in names.items():
+        trie.insert(name, tag_id)
+    assert sorted(trie.with_prefix("py")) == [1, 2]
+    assert sorted(trie.with_prefix("PYTHON")) == [1, 2]
+    assert sorted(trie.with_prefix("")) == [1, 2, 3, 4, 5]
+    assert list(trie.with_prefix("rust")) == []
+
+    trie.remove("java")
+    assert sorted(trie.with_prefix("java")) == [5]
+    trie.remove("javascript")
+    assert "j" not in trie.root.children
+    trie.remove("missing")
+    assert sorted(trie.with_prefix("p")) == [1, 2, 3]
@@ -0,0 +1,10 @@
+"""WSGI entry point and ``flask`` CLI target.
+
+The ``app`` package shadows ``app.py`` on import, so the configured
+application is loaded from the file here. ``flask`` finds this module
+without ``--app``, e.g. ``flask db-migrate``.
+"""
+import os
+import runpy
+
+app = runpy.run_path(os.path.join(os.path.dirname(os.path.abspath(__file__)), "app.py"))["app"]
@@ -1,3 +1,6 @@
+-- Schema as of Backend/migrations/0007. After loading this file, run
+-- `flask db-migrate --baseline 7` so the migration runner starts from there.
+-- Keep it in step with new migrations.
 CREATE DATABASE QuestionAnswerPlatform;
 
 USE QuestionAnswerPlatform;
@@ -66,6 +69,97 @@ CREATE TABLE comments (
     FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
 );
 
+-- One row per user and voted item; the aggregate lives in questions/answers.upvotes
+CREATE TABLE votes (
+    user_id INT NOT NULL,
+    target_type ENUM('question', 'answer') NOT NULL,
+    target_id INT NOT NULL,
+    value TINYINT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (user_id, target_type, target_id),
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE CASCADE
+);
+
+-- Indexes for the queries issued by Backend/app/routes.py and Backend/app/models.py (migration 0003)
+-- Question and answer comments: WHERE parent_type = ? AND parent_id IN (...)
+CREATE INDEX idx_comments_parent ON comments (parent_type, parent_id, comment_id);
+
+-- get_questions_by_tag: tag -> questions
+CREATE INDEX idx_question_tags_tag ON question_tags (tag_id, question_id);
+
+-- Keyset listings: sort=newest and sort=top
+CREATE INDEX idx_questions_created ON questions (created_at, question_id);
+CREATE INDEX idx_questions_top ON questions (upvotes, views, question_id);
+
+-- /api/user/myquestions
+CREATE INDEX idx_questions_user_created ON questions (user_id, created_at, question_id);
+
+-- Conditional GET version of the question list: MAX(updated_at)
+CREATE INDEX idx_questions_updated ON questions (updated_at);
+
+-- Question detail: answers of a question in id order
+CREATE INDEX idx_answers_question ON answers (question_id, answer_id);
+
+-- /api/my-answered-questions
+CREATE INDEX idx_answers_user_created ON answers (user_id, created_at, answer_id);
+
+-- Per-question summary maintained by the write routes, so list pages can show
+-- answer and comment counts, last activity and tags without extra queries.
+-- `flask reconcile-question-stats` recomputes it in batches to repair drift.
+CREATE TABLE question_stats (
+    question_id INT PRIMARY KEY,
+    answer_count INT NOT NULL DEFAULT 0,
+    comment_count INT NOT NULL DEFAULT 0,
+    last_activity_at TIMESTAMP NULL,
+    tags VARCHAR(1024) NOT NULL DEFAULT '',
+    FOREIGN KEY (question_id) REFERENCES questions(question_id) ON DELETE CASCADE
+);
+
+-- Conditional GET version of the question list: MAX(last_activity_at)
+CREATE INDEX idx_question_stats_activity ON question_stats (last_activity_at);
+
+-- Highlighted code snippets keyed by the SHA-256 of the code, so a snippet
+-- used by many questions and answers is rendered and stored once.
+-- `flask render-code` fills in rows for existing snippets.
+CREATE TABLE code_renderings (
+    code_hash BINARY(32) PRIMARY KEY,
+    renderer_version SMALLINT NOT NULL,
+    language VARCHAR(64) NOT NULL,
+    html MEDIUMTEXT NOT NULL,
+    tokens MEDIUMTEXT NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Edit history of question and answer body/code. Each edit is stored as a
+-- zlib-compressed line delta against the previous revision, with a full
+-- snapshot at least every REVISIONS_SNAPSHOT_INTERVAL revisions so reading
+-- any revision applies a bounded number of deltas. Revision 1 is the text
+-- as it was before the first recorded edit.
+CREATE TABLE revisions (
+    target_type ENUM('question', 'answer') NOT NULL,
+    target_id INT NOT NULL,
+    revision INT NOT NULL,
+    user_id INT NULL,
+    kind ENUM('snapshot', 'delta') NOT NULL,
+    data MEDIUMBLOB NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (target_type, target_id, revision),
+    -- Deleting an editor must not drop a delta out of someone else's chain.
+    FOREIGN KEY (user_id) REFERENCES users(user_id) ON DELETE SET NULL
+);
+
+-- MinHash signatures of question title, body and code for near-duplicate
+-- detection. The in-memory LSH index is loaded from this table, so workers
+-- start without re-shingling every question. `flask rebuild-similarity-index`
+-- computes signatures for existing questions.
+CREATE TABLE question_signatures (
+    question_id INT PRIMARY KEY,
+    signature_version SMALLINT NOT NULL,
+    signature VARBINARY(1024) NOT NULL,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP,
+    FOREIGN KEY (question_id) REFERENCES questions(question_id) ON DELETE CASCADE
+);
+
 INSERT INTO users (username, email, password_hash, profile_picture, bio, last_login)
 VALUES
 ('Alice', 'alice@example.com', 'hashedpassword1', 'https://example.com/alice.jpg', 'Software Developer', NOW()),
@@ -99,3 +193,22 @@ VALUES
 (2, 1, 'question', 'Have you tried using a doubly linked list?'),
 (3, 1, 'answer', 'Good explanation, but you missed error handling.');
 
+-- question_stats for the sample data; comment_count includes comments on the question's answers.
+INSERT INTO question_stats (question_id, answer_count, comment_count, last_activity_at, tags)
+SELECT q.question_id,
+    (SELECT COUNT(*) FROM answers a WHERE a.question_id = q.question_id),
+    (SELECT COUNT(*) FROM comments c WHERE c.parent_type = 'question' AND c.parent_id = q.question_id)
+        + (SELECT COUNT(*) FROM answers a JOIN comments c ON c.parent_type = 'answer' AND c.parent_id = a.answer_id
+           WHERE a.question_id = q.question_id),
+    GREATEST(
+        q.updated_at,
+        COALESCE((SELECT MAX(a.updated_at) FROM answers a WHERE a.question_id = q.question_id), q.updated_at),
+        COALESCE((SELECT MAX(c.updated_at) FROM comments c
+                  WHERE c.parent_type = 'question' AND c.parent_id = q.question_id), q.updated_at),
+        COALESCE((SELECT MAX(c.updated_at) FROM answers a JOIN comments c
+                  ON c.parent_type = 'answer' AND c.parent_id = a.answer_id
+                  WHERE a.question_id = q.question_id), q.updated_at)),
+    COALESCE((SELECT GROUP_CONCAT(t.tag_name ORDER BY t.tag_name SEPARATOR ',')
+              FROM question_tags qt JOIN tags t ON t.tag_id = qt.tag_id
+              WHERE qt.question_id = q.question_id), '')
+FROM questions q;
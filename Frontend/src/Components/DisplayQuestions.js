@@ -3,28 +3,40 @@ import { Link } from "react-router-dom";
 
 const DisplayQuestions = ({ search }) => {
   const [questions, setQuestions] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
   const [loading, setLoading] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [error, setError] = useState(null);
 
+  // Fetches one page; `cursor` is the next_cursor of the previous page.
+  const fetchPage = async (cursor) => {
+    let url = "http://localhost:5000/api/questions?fields=question_id,title,excerpt";
+    if (cursor) {
+      url += `&cursor=${encodeURIComponent(cursor)}`;
+    }
+    const response = await fetch(url, {
+      method: "GET",
+      headers: {
+        "Content-Type": "application/json",
+      },
+    });
+
+    if (!response.ok) {
+      throw new Error("Failed to fetch questions");
+    }
+
+    return response.json();
+  };
+
   useEffect(() => {
     const fetchQuestions = async () => {
       setLoading(true);
       setError(null);
 
       try {
-        const response = await fetch("http://localhost:5000/api/questions", {
-          method: "GET",
-          headers: {
-            "Content-Type": "application/json",
-          },
-        });
-
-        if (!response.ok) {
-          throw new Error("Failed to fetch questions");
-        }
-
-        const data = await response.json();
+        const data = await fetchPage(null);
         setQuestions(data.questions || []);
+        setNextCursor(data.next_cursor || null);
       } catch (err) {
         setError(err.message || "Failed to fetch questions");
       } finally {
@@ -35,6 +47,24 @@ const DisplayQuestions = ({ search }) => {
     fetchQuestions();
   }, [search]);
 
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) {
+      return;
+    }
+    setLoadingMore(true);
+    setError(null);
+
+    try {
+      const data = await fetchPage(nextCursor);
+      setQuestions((prev) => [...prev, ...(data.questions || [])]);
+      setNextCursor(data.next_cursor || null);
+    } catch (err) {
+      setError(err.message || "Failed to fetch questions");
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   return (
     <div className="container my-4">
       <h2 className="text-light text-center mb-4">Questions</h2>
@@ -59,7 +89,7 @@ const DisplayQuestions = ({ search }) => {
                 <div className="card-body">
                   <h5 className="card-title text-warning">{question.title}</h5>
                   <p className="card-text text-light">
-                    {question.body?.slice(0, 100) || "No description available..."}...
+                    {question.excerpt?.slice(0, 100) || "No description available..."}...
                   </p>
                   <Link
                     to={`/Question/${question.question_id}`}
@@ -73,6 +103,18 @@ const DisplayQuestions = ({ search }) => {
           ))}
         </div>
       )}
+
+      {!loading && nextCursor && (
+        <div className="text-center">
+          <button
+            className="btn btn-outline-light"
+            onClick={loadMore}
+            disabled={loadingMore}
+          >
+            {loadingMore ? "Loading..." : "Load more"}
+          </button>
+        </div>
+      )}
     </div>
   );
 };
@@ -58,6 +58,71 @@ const QuestionDisplay = () => {
     fetchQuestionData();
   }, [id]);
 
+  useEffect(() => {
+    // Live answers and edits; the browser resumes with Last-Event-ID after a drop.
+    const source = new EventSource(
+      `http://localhost:5000/api/questions/${id}/events`
+    );
+    const on = (type, apply) =>
+      source.addEventListener(type, (event) => {
+        const data = JSON.parse(event.data);
+        setQuestion((prev) => (prev ? apply(prev, data) : prev));
+      });
+
+    on("answer_created", (prev, answer) =>
+      prev.answers.some((a) => a.answer_id === answer.answer_id)
+        ? prev
+        : { ...prev, answers: [...prev.answers, { ...answer, comments: [] }] }
+    );
+    on("answer_updated", (prev, change) => ({
+      ...prev,
+      answers: prev.answers.map((a) =>
+        a.answer_id === change.answer_id ? { ...a, ...change } : a
+      ),
+    }));
+    on("question_updated", (prev, change) => ({
+      ...prev,
+      question: { ...prev.question, ...change },
+    }));
+    // Applies `update` to the comment list a comment event belongs to.
+    const withComments = (prev, comment, update) =>
+      comment.parent_type === "question"
+        ? { ...prev, comments: update(prev.comments) }
+        : {
+            ...prev,
+            answers: prev.answers.map((a) =>
+              a.answer_id === comment.parent_id
+                ? { ...a, comments: update(a.comments) }
+                : a
+            ),
+          };
+    on("comment_created", (prev, comment) =>
+      withComments(prev, comment, (comments) =>
+        comments.some((c) => c.comment_id === comment.comment_id)
+          ? comments
+          : [...comments, comment]
+      )
+    );
+    on("comment_updated", (prev, change) =>
+      withComments(prev, change, (comments) =>
+        comments.map((c) =>
+          c.comment_id === change.comment_id ? { ...c, ...change } : c
+        )
+      )
+    );
+    source.addEventListener("question_deleted", () => {
+      source.close();
+      setError("This question has been deleted");
+    });
+    source.addEventListener("reset", async () => {
+      // Too much was missed to patch the page; load it again.
+      const response = await fetch(`http://localhost:5000/api/questions/${id}`);
+      if (response.ok) setQuestion(await response.json());
+    });
+
+    return () => source.close();
+  }, [id]);
+
   const handleEdit = (type, item) => {
     setEditingItem({ type, item });
     setUpdatedContent(
@@ -124,11 +189,7 @@ const QuestionDisplay = () => {
 
       if (!response.ok) throw new Error("Failed to submit answer");
 
-      const newAnswer = await response.json();
-      setQuestion((prev) => ({
-        ...prev,
-        answers: [...prev.answers, newAnswer],
-      }));
+      // The new answer arrives through the event stream.
       setAnswerBody("");
       setAnswerCode("");
     } catch (err) {
@@ -1,4 +1,4 @@
-import React, { useState } from "react";
+import React, { useEffect, useState } from "react";
 import "bootstrap/dist/css/bootstrap.min.css";
 import { useAuth } from "../Services/AuthContext";
 import { Link } from "react-router-dom";
@@ -9,9 +9,43 @@ function QuestionForm() {
   const [question, setQuestion] = useState("");
   const [description, setDescription] = useState("");
   const [codeSnippet, setCodeSnippet] = useState("");
+  const [tags, setTags] = useState("");
+  const [suggestions, setSuggestions] = useState([]);
   const [error, setError] = useState(null);
   const [success, setSuccess] = useState(false);
 
+  // Suggest tags for the name being typed after the last comma.
+  const typedTag = tags.split(",").pop().trim();
+
+  useEffect(() => {
+    if (!typedTag) {
+      setSuggestions([]);
+      return;
+    }
+    const controller = new AbortController();
+    const timer = setTimeout(async () => {
+      try {
+        const response = await fetch(
+          `http://localhost:5000/api/tags/autocomplete?prefix=${encodeURIComponent(typedTag)}`,
+          { signal: controller.signal }
+        );
+        if (response.ok) setSuggestions((await response.json()).tags);
+      } catch (err) {
+        if (err.name !== "AbortError") setSuggestions([]);
+      }
+    }, 150);
+    return () => {
+      clearTimeout(timer);
+      controller.abort();
+    };
+  }, [typedTag]);
+
+  const pickTag = (name) => {
+    const chosen = tags.split(",").slice(0, -1).map((t) => t.trim()).filter(Boolean);
+    setTags([...chosen, name].join(", ") + ", ");
+    setSuggestions([]);
+  };
+
   const handleSubmit = async (e) => {
     e.preventDefault(); // Prevent default form submission
     setError(null);
@@ -23,6 +57,7 @@ function QuestionForm() {
         title: question,
         description: description,
         code: codeSnippet,
+        tags: tags.split(",").map((t) => t.trim()).filter(Boolean),
       };
 
       // Send the POST request to the backend
@@ -44,6 +79,7 @@ function QuestionForm() {
       setQuestion("");
       setDescription("");
       setCodeSnippet("");
+      setTags("");
     } catch (err) {
       setError(err.message);
     }
@@ -98,6 +134,36 @@ function QuestionForm() {
             />
           </div>
 
+          <div className="mb-3">
+            <label htmlFor="tags" className="form-label">
+              Tags (comma-separated, up to 5)
+            </label>
+            <input
+              type="text"
+              id="tags"
+              className="form-control"
+              value={tags}
+              onChange={(e) => setTags(e.target.value)}
+              placeholder="e.g. python, flask"
+              autoComplete="off"
+            />
+            {suggestions.length > 0 && (
+              <ul className="list-group mt-1">
+                {suggestions.map((tag) => (
+                  <li
+                    key={tag.tag_id}
+                    className="list-group-item list-group-item-action bg-dark text-light d-flex justify-content-between"
+                    style={{ cursor: "pointer" }}
+                    onClick={() => pickTag(tag.tag_name)}
+                  >
+                    <span>{tag.tag_name}</span>
+                    <span className="badge bg-secondary">{tag.question_count}</span>
+                  </li>
+                ))}
+              </ul>
+            )}
+          </div>
+
           <button type="submit" className="btn btn-primary w-100">
             Submit Question
           </button>
@@ -24,7 +24,7 @@ function MyAnsweredQuestions() {
           throw new Error("Failed to fetch answered questions");
         }
         const data = await response.json();
-        setAnsweredQuestions(data);
+        setAnsweredQuestions(data.questions || []);
       } catch (err) {
         setError(err.message);
       } finally {